@@ -0,0 +1,423 @@
+'''!
+@file       blender.py
+@brief      Look-ahead path planner which keeps the pen moving through corners
+@details    Holds a small buffer of upcoming positions. Each corner between two
+            buffered lines is replaced by a circular arc which cuts the corner
+            by no more than a tolerance, and is taken at the speed at which the
+            sideways acceleration stays within the acceleration limit. A
+            backward pass over the buffer finds the fastest speed at each
+            corner from which the pen can still slow down in time for every
+            corner after it, stopping at the last buffered position. Every
+            control period, step() moves along the path as fast as the speed
+            limit, the acceleration limit, and the upcoming corners allow, and
+            gives the position to solve the joint angles of.
+
+            Corners where the pen is raised or lowered are not blended: the
+            platform stops there so the pen can move. New positions can be
+            added while moving; the corner at the end of the current line is
+            blended as long as there is still room to do so.
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+import array
+import math
+
+## Default number of buffered positions
+BUFFER_SIZE = 8
+
+## Default distance in inches a blended corner may be cut
+TOLERANCE = 0.02
+
+## Default speed limit of the platform in [inch/s]
+MAX_SPEED = 3.0
+
+## Default acceleration limit of the platform in [inch/s^2]
+MAX_ACCEL = 20.0
+
+## Turns smaller than this many radians are treated as straight
+MIN_TURN = 1e-4
+
+
+class LookAhead:
+    '''!
+    @brief This class implements a look-ahead buffer with corner blending
+    '''
+
+    def __init__ (self, dt, size=BUFFER_SIZE, tolerance=TOLERANCE,
+                  speed=MAX_SPEED, accel=MAX_ACCEL):
+        '''!
+        @brief              Creates a LookAhead object with an empty buffer
+        @param dt           The control period step() is called at in seconds
+        @param size         The number of positions which can be buffered
+        @param tolerance    The distance in inches a corner may be cut
+        @param speed        The speed limit in [inch/s]
+        @param accel        The acceleration limit in [inch/s^2]
+        '''
+        self.dt = dt
+        self.size = size
+        self.tolerance = tolerance
+        self.speed = speed
+        self.accel = accel
+
+        # Buffered positions, pen states, and corner data: distance from the
+        # corner to where its arc starts and ends, arc radius, signed turn
+        # angle, and the planned speed through the corner
+        self.px = array.array('f', [0]*size)
+        self.py = array.array('f', [0]*size)
+        self.pen_at = bytearray(size)
+        self.cut = array.array('f', [0]*size)
+        self.radius = array.array('f', [0]*size)
+        self.turn = array.array('f', [0]*size)
+        self.limit = array.array('f', [0]*size)
+        self.plan = array.array('f', [0]*size)
+
+        # Index of the first buffered position, which ends the current line,
+        # and the number of buffered positions
+        self.head = 0
+        self.count = 0
+
+        # The position before the head, and how far past it the current line starts
+        self.start_x = 0
+        self.start_y = 0
+        self.offset = 0
+        self.placed = False
+
+        # Distance moved along the current line or arc, current speed, and
+        # whether the pen is on the arc of the head corner
+        self.s = 0
+        self.v = 0
+        self.on_arc = False
+
+        # Position and pen state found by step()
+        self.x = 0
+        self.y = 0
+        self.pen = 0
+
+    def full(self):
+        '''!
+        @brief      Checks if the buffer can take another position
+        @return     True if the buffer is full
+        '''
+        return self.count == self.size
+
+    def idle(self):
+        '''!
+        @brief      Checks if the planner has nowhere left to go
+        @return     True if the buffer is empty
+        '''
+        return self.count == 0
+
+    def add(self, x, y, pen=1):
+        '''!
+        @brief      Adds a position to the end of the buffer
+        @details    The first position ever added is taken as where the
+                    platform already is.
+        @param x    The x-coordinate in inches
+        @param y    The y-coordinate in inches
+        @param pen  The pen state on the way to the position, 1 for down
+        @return     False if the buffer is full and the position was not added
+        '''
+        if not self.placed:
+            self.placed = True
+            self.start_x = self.x = x
+            self.start_y = self.y = y
+            self.pen = pen
+            return True
+        if self.count == self.size:
+            return False
+
+        k = (self.head + self.count) % self.size
+        if self.count > 0:
+            last = (k - 1) % self.size
+            if x == self.px[last] and y == self.py[last] and pen == self.pen_at[last]:
+                return True
+        elif x == self.start_x and y == self.start_y and pen == self.pen:
+            return True
+
+        self.px[k] = x
+        self.py[k] = y
+        self.pen_at[k] = pen
+        self.cut[k] = 0
+        self.turn[k] = 0
+        self.limit[k] = 0
+        self.count += 1
+
+        # The corner before the new position can now be blended
+        if self.count > 1:
+            self._corner((k - 1) % self.size)
+        self._replan()
+        return True
+
+    def _point(self, n):
+        '''!
+        @brief      Finds the n-th position from the one before the head
+        @return     A tuple (x, y), where n = 0 is the start of the current line
+        '''
+        if n == 0:
+            return self.start_x, self.start_y
+        k = (self.head + n - 1) % self.size
+        return self.px[k], self.py[k]
+
+    def _corner(self, k):
+        '''!
+        @brief      Finds the blending arc of a corner
+        @param k    The buffer index of the corner, which must have a
+                    position before and after it
+        '''
+        n = (k - self.head) % self.size + 1
+        ax, ay = self._point(n - 1)
+        bx, by = self._point(n)
+        cx, cy = self._point(n + 1)
+        nxt = (k + 1) % self.size
+
+        len_in = math.sqrt((bx - ax)**2 + (by - ay)**2)
+        len_out = math.sqrt((cx - bx)**2 + (cy - by)**2)
+        if len_in == 0 or len_out == 0:
+            # A move which only changes the pen state stops at its position
+            self.turn[k] = 0
+            self.cut[k] = 0
+            self.limit[k] = 0
+            return
+        ux = (bx - ax)/len_in
+        uy = (by - ay)/len_in
+        wx = (cx - bx)/len_out
+        wy = (cy - by)/len_out
+        turn = math.atan2(ux*wy - uy*wx, ux*wx + uy*wy)
+        half = abs(turn)/2
+
+        self.turn[k] = turn
+        if self.pen_at[k] != self.pen_at[nxt] or half > 1.55:
+            # Stop to move the pen or to reverse
+            self.cut[k] = 0
+            self.limit[k] = 0
+            return
+        if half < MIN_TURN:
+            self.cut[k] = 0
+            self.limit[k] = self.speed
+            return
+
+        # Largest arc which stays within the tolerance of the corner, and
+        # doesn't use more than half of either line
+        radius = self.tolerance*math.cos(half)/(1 - math.cos(half))
+        cut = radius*math.tan(half)
+        room = min(len_in, len_out)/2
+        if n == 1:
+            # The arc must start ahead of where the pen is on the current line
+            room = min(room, len_in - self.s - self.offset)
+        if cut > room:
+            cut = max(room, 0)
+            radius = cut/math.tan(half)
+        self.cut[k] = cut
+        self.radius[k] = radius
+        self.limit[k] = min(self.speed, math.sqrt(self.accel*radius))
+
+    def _arc(self, k):
+        '''!
+        @brief      Finds the length of the blending arc of a corner in inches
+        '''
+        if self.cut[k] > 0:
+            return self.radius[k]*abs(self.turn[k])
+        return 0
+
+    def _line(self, n):
+        '''!
+        @brief      Finds the length of the line from the n-th position after
+                    the one before the head to the next, between their arcs
+        '''
+        k = (self.head + n - 1) % self.size
+        bx, by = self._point(n)
+        cx, cy = self._point(n + 1)
+        length = math.sqrt((cx - bx)**2 + (cy - by)**2)
+        return max(length - self.cut[k] - self.cut[(k + 1) % self.size], 0)
+
+    def _replan(self):
+        '''!
+        @brief      Finds the fastest speed at the start of each corner which
+                    still lets the pen slow down for every corner after it
+        '''
+        v = 0
+        for n in range(self.count, 0, -1):
+            k = (self.head + n - 1) % self.size
+            if n == self.count:
+                v = 0
+            else:
+                room = self._arc(k) + self._line(n)
+                v = min(self.limit[k], math.sqrt(v*v + 2*self.accel*room))
+            self.plan[k] = v
+
+    def step(self):
+        '''!
+        @brief      Moves along the path for one control period
+        @return     True if the position changed, in which case the new
+                    position and pen state are held in the x, y, and pen
+                    attributes
+        '''
+        if self.count == 0:
+            self.v = 0
+            return False
+
+        k = self.head
+        ax, ay = self.start_x, self.start_y
+        bx, by = self.px[k], self.py[k]
+        length = math.sqrt((bx - ax)**2 + (by - ay)**2)
+        end = length - self.offset - self.cut[k]
+
+        # Speed for this period, slowing down in time for the next corner
+        if self.on_arc:
+            cap = self.limit[k]
+            left = max(self._arc(k) - self.s, 0) + self._line(1)
+            exit_v = self.plan[(k + 1) % self.size]
+        else:
+            cap = self.speed
+            left = max(end - self.s, 0)
+            exit_v = self.plan[k]
+        v = min(cap, self.v + self.accel*self.dt,
+                math.sqrt(exit_v*exit_v + 2*self.accel*left))
+        ds = 0.5*(self.v + v)*self.dt
+        self.v = v
+        if ds <= 0:
+            # Starting from rest, take the first small step
+            ds = 0.5*self.accel*self.dt*self.dt
+        self.pen = self.pen_at[k]
+
+        while ds > 0 and self.count > 0:
+            k = self.head
+            ax, ay = self.start_x, self.start_y
+            bx, by = self.px[k], self.py[k]
+            length = math.sqrt((bx - ax)**2 + (by - ay)**2)
+            if length == 0:
+                # Nothing to move along, only the pen state changes
+                self._advance(0)
+                if self.count > 0 and self.pen_at[self.head] != self.pen:
+                    break
+                continue
+            ux = (bx - ax)/length
+            uy = (by - ay)/length
+            cut = self.cut[k]
+            end = length - self.offset - cut
+
+            if not self.on_arc:
+                if self.s + ds < end:
+                    self.s += ds
+                    ds = 0
+                    d = self.offset + self.s
+                    self.x = ax + d*ux
+                    self.y = ay + d*uy
+                    break
+                ds -= max(end - self.s, 0)
+                self.s = 0
+                self.on_arc = True
+                if self.count == 1:
+                    # The end of the buffered path
+                    self.x = bx
+                    self.y = by
+                    self.v = 0
+                    self._advance(0)
+                    break
+
+            arc = self._arc(k)
+            if self.s + ds < arc:
+                self.s += ds
+                ds = 0
+                # Rotate the arc's starting point around its center
+                side = 1 if self.turn[k] > 0 else -1
+                r = self.radius[k]
+                tx = bx - cut*ux
+                ty = by - cut*uy
+                ox = tx - side*r*uy
+                oy = ty + side*r*ux
+                angle = side*self.s/r
+                c = math.cos(angle)
+                s = math.sin(angle)
+                self.x = ox + c*(tx - ox) - s*(ty - oy)
+                self.y = oy + s*(tx - ox) + c*(ty - oy)
+                break
+            ds -= max(arc - self.s, 0)
+            self.x = bx
+            self.y = by
+            self._advance(cut)
+            if self.count > 0 and self.pen_at[self.head] != self.pen:
+                # Stop at the corner so the pen can move
+                break
+
+        self.pen = self.pen_at[self.head] if self.count > 0 else self.pen
+        return True
+
+    def _advance(self, cut):
+        '''!
+        @brief      Moves on from the head corner to the next line
+        @param cut  How far past the corner the next line starts
+        '''
+        k = self.head
+        self.start_x = self.px[k]
+        self.start_y = self.py[k]
+        self.offset = cut
+        self.s = 0
+        self.on_arc = False
+        self.head = (k + 1) % self.size
+        self.count -= 1
+        if cut > 0:
+            # Leave the arc on the next line
+            bx, by = self._point(1)
+            length = math.sqrt((bx - self.start_x)**2 + (by - self.start_y)**2)
+            self.x = self.start_x + cut*(bx - self.start_x)/length
+            self.y = self.start_y + cut*(by - self.start_y)/length
+
+
+def stop_and_go_time(points, speed=MAX_SPEED, accel=MAX_ACCEL):
+    '''!
+    @brief          Finds how long a path takes stopping at every position
+    @param points   A list of (x, y) positions
+    @param speed    The speed limit in [inch/s]
+    @param accel    The acceleration limit in [inch/s^2]
+    @return         The time in seconds
+    '''
+    total = 0
+    for (ax, ay), (bx, by) in zip(points, points[1:]):
+        length = math.sqrt((bx - ax)**2 + (by - ay)**2)
+        if length*accel >= speed*speed:
+            total += length/speed + speed/accel
+        else:
+            total += 2*math.sqrt(length/accel)
+    return total
+
+
+if __name__ == "__main__":
+    # A dense star, the kind of path traced on the touchpad
+    points = []
+    for n in range(121):
+        t = 2*math.pi*n/120
+        r = 2 + 0.5*math.cos(5*t)
+        points.append((8.875 + r*math.cos(t), 5.124 + r*math.sin(t)))
+
+    dt = 0.05
+    planner = LookAhead(dt)
+    planner.add(*points[0])
+    path = []
+    n = 1
+    ticks = 0
+    while n < len(points) or not planner.idle():
+        while n < len(points) and not planner.full():
+            planner.add(*points[n])
+            n += 1
+        if planner.step():
+            path.append((planner.x, planner.y))
+        ticks += 1
+
+    # Largest distance of a sample from the drawn polyline
+    worst = 0
+    for x, y in path:
+        best = None
+        for (ax, ay), (bx, by) in zip(points, points[1:]):
+            dx = bx - ax
+            dy = by - ay
+            f = max(0, min(1, ((x - ax)*dx + (y - ay)*dy)/(dx*dx + dy*dy)))
+            d = math.sqrt((ax + f*dx - x)**2 + (ay + f*dy - y)**2)
+            best = d if best is None else min(best, d)
+        worst = max(worst, best)
+
+    print("Stop and go: {:.2f} s".format(stop_and_go_time(points)))
+    print("Blended:     {:.2f} s, largest deviation {:.4f} in".format(ticks*dt, worst))
@@ -18,7 +18,7 @@ class ClosedLoop:
     @brief This class implements a closed loop PI controller
     '''
     
-    def __init__ (self, kp, ki, setpoint):
+    def __init__ (self, kp, ki, setpoint, clock=utime):
         '''! 
         @brief          Creates a ClosedLoop Controller object
         @details        Creates a ClosedLoop Controller object with the given
@@ -26,6 +26,10 @@ class ClosedLoop:
         @param kp       Controller proportional gain in [% duty cycle/degree]
         @param ki       Controller integral gain [% duty cycle-s/degree]
         @param setpoint Reference value in degrees for the system
+        @param clock    The clock used to time the integral, an object with the
+                        ticks_ms() and ticks_diff() functions of utime. A
+                        HostShim.VirtualClock can be given to run the
+                        controller in simulated time on a PC
         '''
         # Set controller proportional gain and setpoint
         self.kp = kp
@@ -33,6 +37,7 @@ class ClosedLoop:
         self.setpoint = setpoint
         self.total_error = 0
         self.last_time = 0
+        self.clock = clock
         
     def update(self, measured):
         '''!
@@ -55,15 +60,15 @@ class ClosedLoop:
         pro = self.kp*error
         
         if self.last_time==0:
-            self.last_time = utime.ticks_ms()
+            self.last_time = self.clock.ticks_ms()
             
         # Calculate integral control signal
-        delta_t = (utime.ticks_diff(utime.ticks_ms(), self.last_time))/1000
+        delta_t = (self.clock.ticks_diff(self.clock.ticks_ms(), self.last_time))/1000
         #print(delta_t)
         self.total_error += error*delta_t
         integ = self.ki*self.total_error
         
-        self.last_time = utime.ticks_ms()
+        self.last_time = self.clock.ticks_ms()
         
         # Return control signal
         return pro + integ
@@ -0,0 +1,104 @@
+'''!
+@file       drawingFile.py
+@brief      Reads drawings stored as a small subset of G-code
+@details    A drawing file holds one move per line. @c G0 moves to a point with
+            the pen up and @c G1 draws a line to a point with the pen down.
+            Coordinates are given in inches in the robot's coordinate system.
+            A line without a G word repeats the last one, and a missing X or Y
+            keeps the last value. Text after a semicolon is a comment:
+            @code
+            ; a 1 inch square
+            G0 X8.375 Y4.624
+            G1 X9.375
+            Y5.624
+            X8.375
+            Y4.624
+            @endcode
+            The file is read one line at a time, so drawings larger than the
+            board's memory can be played back.
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+## Pen state of a move with the pen lifted
+PEN_UP = 0
+## Pen state of a move with the pen drawing
+PEN_DOWN = 1
+
+
+def parse_line(line, last):
+    '''!
+    @brief          Reads one line of a drawing file
+    @param line     The line of text
+    @param last     A tuple (pen, x, y) of the previous move
+    @return         A tuple (pen, x, y) of the move, or None if the line holds
+                    no move
+    @throws ValueError  If the line holds a word which can't be read
+    '''
+    end = line.find(';')
+    if end >= 0:
+        line = line[:end]
+    words = line.split()
+    if not words:
+        return None
+
+    pen, x, y = last
+    moved = False
+    for word in words:
+        letter = word[0].upper()
+        value = word[1:]
+        if letter == 'G':
+            code = int(value)
+            if code == 0:
+                pen = PEN_UP
+            elif code == 1:
+                pen = PEN_DOWN
+            else:
+                raise ValueError("unsupported code " + word)
+        elif letter == 'X':
+            x = float(value)
+            moved = True
+        elif letter == 'Y':
+            y = float(value)
+            moved = True
+        else:
+            raise ValueError("unsupported word " + word)
+
+    if not moved:
+        return None
+    return pen, x, y
+
+
+def read_moves(filename, start=(PEN_UP, 0, 0)):
+    '''!
+    @brief          Generator which reads the moves of a drawing file
+    @param filename The name of the drawing file
+    @param start    A tuple (pen, x, y) used as the previous move for the first line
+    @return         A generator yielding a tuple (pen, x, y) for each move
+    @throws ValueError  If a line can't be read; the message gives the line number
+    '''
+    last = start
+    number = 0
+    with open(filename, 'r') as f:
+        for line in f:
+            number += 1
+            try:
+                move = parse_line(line, last)
+            except ValueError as err:
+                raise ValueError("line {:d}: {:s}".format(number, str(err)))
+            if move is not None:
+                last = move
+                yield move
+
+
+if __name__ == "__main__":
+    import sys
+    filename = sys.argv[1] if len(sys.argv) > 1 else "drawing.gcode"
+    count = 0
+    drawn = 0
+    for pen, x, y in read_moves(filename):
+        count += 1
+        drawn += pen
+    print("{:d} moves, {:d} with the pen down".format(count, drawn))
@@ -0,0 +1,482 @@
+'''!
+@file       hostShim.py
+@brief      Stand-ins for MicroPython modules so board code can run on a PC
+@details    Host side tools (table builders, conformance checks, benchmarks)
+            import the same modules that run on the board. Calling install()
+            before importing them registers simple stand-ins for the MicroPython
+            only modules which aren't available under CPython. Nothing is
+            replaced if the real module can be imported.
+
+            VirtualClock stands in for the board's time when a set of tasks
+            is run in simulation: given to cotask.set_clock(), it lets the
+            tasks run faster than real time, with the same timing every run.
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+import builtins
+import math
+import sys
+import time
+import types
+
+
+def _identity(f):
+    '''!
+    @brief      Stand-in for the MicroPython code emitter decorators
+    '''
+    return f
+
+
+def _make_micropython():
+    '''!
+    @brief      Creates a stand-in for the micropython module
+    '''
+    mod = types.ModuleType('micropython')
+    mod.native = _identity
+    mod.viper = _identity
+    mod.const = lambda x: x
+    mod.alloc_emergency_exception_buf = lambda size: None
+    mod.schedule = lambda f, arg: f(arg)
+    return mod
+
+
+def _make_utime():
+    '''!
+    @brief      Creates a stand-in for the utime module using the PC's clock
+    @details    Tick counts wrap around like they do on the board, so code using
+                ticks_diff() and ticks_add() behaves the same.
+    '''
+    mod = types.ModuleType('utime')
+    period = 1 << 30
+
+    def ticks_diff(end, start):
+        return ((end - start + period//2) % period) - period//2
+
+    mod.ticks_us = lambda: (time.perf_counter_ns()//1000) % period
+    mod.ticks_ms = lambda: (time.perf_counter_ns()//1000000) % period
+    mod.ticks_cpu = mod.ticks_us
+    mod.ticks_diff = ticks_diff
+    mod.ticks_add = lambda ticks, delta: (ticks + delta) % period
+    mod.sleep = time.sleep
+    mod.sleep_ms = lambda ms: time.sleep(ms/1000)
+    mod.sleep_us = lambda us: time.sleep(us/1000000)
+    mod.time = time.time
+    return mod
+
+
+class SimTimer:
+    '''!
+    @brief      Stand-in for a pyb.Timer used to run an interrupt callback
+    @details    There are no interrupts on a PC, so the callback is run either
+                directly with tick(), for tests which step time by hand, or
+                by poll(), which runs the callback once for every period
+                which has passed on the PC's clock. The machine.idle()
+                stand-in polls every SimTimer, the way an interrupt would wake
+                the board. A SimTimer made by VirtualClock.timer() counts
+                periods of the virtual clock instead, and is run by the
+                virtual clock as time moves forward.
+
+                SimTimer is also the Timer of the pyb stand-in, so drivers
+                which set up PWM channels and encoder counters can be created
+                on a PC. The channels only remember their duty cycle and the
+                counter only changes when it is set.
+    '''
+
+    ## Channel modes of pyb.Timer, only kept by the channels
+    PWM = 'PWM'
+    ENC_A = 'ENC_A'
+    ENC_B = 'ENC_B'
+    ENC_AB = 'ENC_AB'
+
+    ## SimTimers with a callback set, polled by the machine.idle() stand-in
+    active = []
+
+    def __init__ (self, number=0, freq=1000, clock=None, **kwargs):
+        '''!
+        @brief          Creates a SimTimer
+        @param number   The timer number, kept only for printing
+        @param freq     The interrupt frequency in Hz
+        @param clock    The VirtualClock which times the interrupts, or None
+                        to use the PC's clock
+        @param kwargs   Other pyb.Timer settings, such as prescaler and period,
+                        which are ignored
+        '''
+        self.number = number
+        self._freq = freq
+        self._clock = clock
+        self._callback = None
+        self._next = 0
+        self._counter = 0
+        self._channels = {}
+        self.count = 0
+
+    def _now(self):
+        '''!
+        @brief      Returns the time in microseconds on the timer's clock
+        '''
+        if self._clock is None:
+            return time.perf_counter_ns()//1000
+        return self._clock.now
+
+    def freq(self):
+        '''!
+        @brief      Returns the interrupt frequency in Hz
+        '''
+        return self._freq
+
+    def callback(self, fun):
+        '''!
+        @brief      Sets the function run at each interrupt, or None to stop
+        '''
+        self._callback = fun
+        if fun is None:
+            if self in SimTimer.active:
+                SimTimer.active.remove(self)
+        else:
+            self._next = self._now() + 1000000/self._freq
+            if self not in SimTimer.active:
+                SimTimer.active.append(self)
+
+    def deinit(self):
+        '''!
+        @brief      Stops the timer
+        '''
+        self.callback(None)
+
+    def channel(self, number, mode=None, pin=None, **kwargs):
+        '''!
+        @brief          Returns one of the timer's channels, making it if needed
+        @param number   The channel number
+        @param mode     The channel mode, such as SimTimer.PWM
+        @param pin      The pin the channel drives
+        '''
+        if number not in self._channels:
+            self._channels[number] = SimChannel(mode, pin)
+        return self._channels[number]
+
+    def counter(self, value=None):
+        '''!
+        @brief          Returns the counter, or sets it if a value is given
+        '''
+        if value is None:
+            return self._counter
+        self._counter = value
+
+    def tick(self, count=1):
+        '''!
+        @brief          Runs the callback as if the timer had interrupted
+        @param count    The number of interrupts to run
+        '''
+        for _ in range(count):
+            self.count += 1
+            if self._callback is not None:
+                self._callback(self)
+
+    def poll(self):
+        '''!
+        @brief      Runs the callback once for each period that has passed
+        '''
+        now = self._now()
+        while self._callback is not None and now >= self._next:
+            self._next += 1000000/self._freq
+            self.tick()
+
+    def __repr__(self):
+        return "SimTimer({:d}, freq={:g})".format(self.number, self._freq)
+
+
+class SimChannel:
+    '''!
+    @brief      Stand-in for a channel of a pyb.Timer
+    '''
+
+    def __init__ (self, mode, pin):
+        '''!
+        @brief      Creates a SimChannel
+        @param mode The channel mode
+        @param pin  The pin the channel drives
+        '''
+        self.mode = mode
+        self.pin = pin
+        self.percent = 0
+
+    def pulse_width_percent(self, value=None):
+        '''!
+        @brief      Returns the duty cycle in percent, or sets it if a value is given
+        '''
+        if value is None:
+            return self.percent
+        self.percent = value
+
+
+class SimPin:
+    '''!
+    @brief      Stand-in for a pyb.Pin which remembers the level it was set to
+    '''
+
+    ## Pin modes and pulls of pyb.Pin, only kept by the pins
+    IN = 'IN'
+    OUT_PP = 'OUT_PP'
+    OUT_OD = 'OUT_OD'
+    ANALOG = 'ANALOG'
+    PULL_NONE = None
+    PULL_UP = 'PULL_UP'
+    PULL_DOWN = 'PULL_DOWN'
+
+    def __init__ (self, name, mode=None, pull=None, **kwargs):
+        '''!
+        @brief      Creates a SimPin
+        @param name The pin name, such as Pin.board.PA8
+        @param mode The pin mode
+        @param pull The pull resistor setting
+        '''
+        self.name = name
+        self.mode = mode
+        self.pull = pull
+        self.level = 0
+
+    def value(self, level=None):
+        '''!
+        @brief      Returns the pin level, or sets it if a level is given
+        '''
+        if level is None:
+            return self.level
+        self.level = 1 if level else 0
+
+    def high(self):
+        '''!
+        @brief      Sets the pin high
+        '''
+        self.level = 1
+
+    def low(self):
+        '''!
+        @brief      Sets the pin low
+        '''
+        self.level = 0
+
+    def __repr__(self):
+        return "SimPin({:s})".format(str(self.name))
+
+
+class SimADC:
+    '''!
+    @brief      Stand-in for a pyb.ADC, which reads a level it is given
+    '''
+
+    def __init__ (self, pin):
+        '''!
+        @brief      Creates a SimADC
+        @param pin  The pin the converter reads
+        '''
+        self.pin = pin
+        self.level = 0
+
+    def read(self):
+        '''!
+        @brief      Returns the level, a 12 bit count
+        '''
+        return self.level
+
+
+class _PinNames:
+    '''!
+    @brief      Stand-in for pyb.Pin.board and pyb.Pin.cpu, which name every pin
+    '''
+
+    def __getattr__(self, name):
+        return name
+
+
+SimPin.board = _PinNames()
+SimPin.cpu = _PinNames()
+
+
+class VirtualClock:
+    '''!
+    @brief      A clock which only moves forward when it is told to
+    @details    Has the ticks functions of utime and an idle() function in place
+                of machine.idle(), so it can be given to cotask.set_clock() and
+                to the controllers. Time stands still while tasks run and jumps
+                forward when the scheduler sleeps, so a set of tasks runs as
+                fast as the PC can run their code, and runs the same way every
+                time. Tick counts wrap around like they do on the board.
+    '''
+
+    ## Period of the tick counts, the same as the board's
+    PERIOD = 1 << 30
+
+    def __init__ (self, start=0, quantum=100):
+        '''!
+        @brief          Creates a VirtualClock
+        @param start    The starting time in microseconds
+        @param quantum  How far idle() moves time forward in microseconds when
+                        no timer interrupts sooner
+        '''
+        ## The time in microseconds since the clock was created, which
+        #  doesn't wrap around
+        self.now = start
+        self.quantum = quantum
+        self.timers = []
+
+    def ticks_us(self):
+        '''!
+        @brief      Returns the time in microseconds, wrapping like utime.ticks_us()
+        '''
+        return self.now % VirtualClock.PERIOD
+
+    def ticks_ms(self):
+        '''!
+        @brief      Returns the time in milliseconds, wrapping like utime.ticks_ms()
+        '''
+        return (self.now//1000) % VirtualClock.PERIOD
+
+    ticks_cpu = ticks_us
+
+    def ticks_diff(self, end, start):
+        '''!
+        @brief      Finds the signed difference between two tick counts
+        '''
+        period = VirtualClock.PERIOD
+        return ((end - start + period//2) % period) - period//2
+
+    def ticks_add(self, ticks, delta):
+        '''!
+        @brief      Adds a time to a tick count, wrapping like utime.ticks_add()
+        '''
+        return (ticks + delta) % VirtualClock.PERIOD
+
+    def timer(self, number=0, freq=1000):
+        '''!
+        @brief          Creates a SimTimer which interrupts on this clock
+        @param number   The timer number, kept only for printing
+        @param freq     The interrupt frequency in Hz
+        @return         The SimTimer
+        '''
+        timer = SimTimer(number, freq, clock = self)
+        self.timers.append(timer)
+        return timer
+
+    def advance(self, us):
+        '''!
+        @brief      Moves time forward, running timer callbacks when they are due
+        @param us   The time to move forward in microseconds
+        '''
+        end = self.now + us
+        while True:
+            timer = self._next_timer()
+            if timer is None or timer._next > end:
+                break
+            self.now = max(self.now, math.ceil(timer._next))
+            timer.poll()
+        self.now = end
+
+    def idle(self):
+        '''!
+        @brief      Stand-in for machine.idle() which moves time forward
+        @details    Time moves to the next timer interrupt, or forward by the
+                    quantum if no timer interrupts sooner.
+        '''
+        timer = self._next_timer()
+        if timer is not None and timer._next < self.now + self.quantum:
+            self.advance(max(0, math.ceil(timer._next) - self.now))
+        else:
+            self.advance(self.quantum)
+
+    def sleep_us(self, us):
+        '''!
+        @brief      Stand-in for utime.sleep_us() which moves time forward
+        '''
+        self.advance(us)
+
+    def sleep_ms(self, ms):
+        '''!
+        @brief      Stand-in for utime.sleep_ms() which moves time forward
+        '''
+        self.advance(ms*1000)
+
+    def _next_timer(self):
+        '''!
+        @brief      Finds the running timer which interrupts next, or None
+        '''
+        best = None
+        for timer in self.timers:
+            if timer._callback is not None and (best is None or timer._next < best._next):
+                best = timer
+        return best
+
+    def __repr__(self):
+        return "VirtualClock({:.6f} s)".format(self.now/1000000)
+
+
+def _idle():
+    '''!
+    @brief      Stand-in for machine.idle()
+    @details    Sleeps for a tenth of a millisecond and then runs the callback
+                of any SimTimer which is due.
+    '''
+    time.sleep(0.0001)
+    for timer in list(SimTimer.active):
+        timer.poll()
+
+
+def _make_machine():
+    '''!
+    @brief      Creates a stand-in for the machine module
+    '''
+    mod = types.ModuleType('machine')
+    mod.idle = _idle
+    mod.freq = lambda: 80000000
+    mod.disable_irq = lambda: True
+    mod.enable_irq = lambda state=True: None
+    return mod
+
+
+def _make_pyb():
+    '''!
+    @brief      Creates a stand-in for the pyb module
+    @details    Pins and timers can be created and set, so drivers can be
+                created on a PC, but nothing is connected to them.
+    '''
+    mod = types.ModuleType('pyb')
+    mod.Pin = SimPin
+    mod.Timer = SimTimer
+    mod.ADC = SimADC
+    mod.disable_irq = lambda: True
+    mod.enable_irq = lambda state=True: None
+    mod.delay = lambda ms: time.sleep(ms/1000)
+    mod.udelay = lambda us: time.sleep(us/1000000)
+    mod.millis = lambda: time.perf_counter_ns()//1000000
+    mod.micros = lambda: time.perf_counter_ns()//1000
+    return mod
+
+
+def install():
+    '''!
+    @brief      Registers stand-ins for missing MicroPython modules
+    @details    Also defines the viper pointer and integer type names so that
+                the annotations of viper functions can be evaluated.
+    '''
+    try:
+        import micropython
+    except ImportError:
+        sys.modules['micropython'] = _make_micropython()
+    try:
+        import utime
+    except ImportError:
+        sys.modules['utime'] = _make_utime()
+    try:
+        import machine
+    except ImportError:
+        sys.modules['machine'] = _make_machine()
+    try:
+        import pyb
+    except ImportError:
+        sys.modules['pyb'] = _make_pyb()
+
+    for name in ('ptr8', 'ptr16', 'ptr32', 'uint'):
+        if not hasattr(builtins, name):
+            setattr(builtins, name, object)
@@ -0,0 +1,200 @@
+'''!
+@file       jobCompiler.py
+@brief      Compiles a drawing file into joint angle frames on a PC
+@details    Reads a drawing file in the format of drawingFile.py and solves the
+            inverse kinematics for the whole drawing ahead of time, using a
+            RoboBrain with the geometry of main.py. The job starts with a pen
+            up move of the joints from where calibration leaves them to the
+            start of the drawing. Each move after that is a straight line of
+            the platform, timed with a trapezoidal profile from trajectory.py.
+            The speed and acceleration along the line are chosen so that no
+            joint goes faster than the limits the trajectory task uses. The
+            move is sampled once per control period and the joint angles of
+            every sample are written to a job file, in the format read by
+            taskPlayback.py.
+
+            To compile a drawing, run this file:
+            @code
+            python jobCompiler.py drawing.gcode [job.bin]
+            @endcode
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+import math
+import struct
+import sys
+
+import HostShim
+HostShim.install()
+
+import DrawingFile
+import JointTask
+import RoboGeometry
+import TaskPlayback
+import TaskSet
+import Trajectory
+
+## Frame period in milliseconds, the period taskSet.py runs the joint tasks
+#  and job playback at
+PERIOD = TaskSet.JOINT_PERIOD
+
+## Spacing in inches of the points used to find how fast the joints turn
+#  along a move
+PROBE_STEP = 0.05
+
+## File the job is written to unless another is given
+JOB_FILE = "job.bin"
+
+
+def _solve(brain, x, y):
+    '''!
+    @brief      Solves the joint angles of a position
+    @return     A tuple of the three joint angles in degrees
+    @throws ValueError  If the position can't be reached
+    '''
+    brain.update_joints(x, y, 0)
+    return (brain.alpha1, brain.alpha2, brain.alpha3)
+
+
+def joint_gain(brain, start, end):
+    '''!
+    @brief          Finds the fastest rate any joint turns along a line
+    @param brain    A RoboBrain object, left at the end of the line
+    @param start    The (x, y) starting point of the line in inches
+    @param end      The (x, y) ending point of the line in inches
+    @return         The largest joint turn per inch of platform motion, in
+                    [degree/inch]
+    '''
+    length = math.hypot(end[0] - start[0], end[1] - start[1])
+    steps = max(1, int(math.ceil(length/PROBE_STEP)))
+    gain = 0
+    last = _solve(brain, start[0], start[1])
+    for n in range(1, steps + 1):
+        f = n/steps
+        alphas = _solve(brain, start[0] + f*(end[0] - start[0]),
+                        start[1] + f*(end[1] - start[1]))
+        for a, b in zip(last, alphas):
+            gain = max(gain, abs(Trajectory.wrap_delta(a, b))*steps/length)
+        last = alphas
+    return gain
+
+
+def _ramp(frames, start, end, period, speed, accel):
+    '''!
+    @brief          Adds the frames of a pen up joint move to a list
+    @details        The joints move together with a trapezoidal profile, as
+                    the trajectory task moves them, starting with a frame at
+                    time 0 and sampled once per period.
+    @param frames   The list the frames are added to
+    @param start    The three starting joint angles in degrees
+    @param end      The three ending joint angles in degrees
+    @param period   The frame period in milliseconds
+    @param speed    The joint speed limit in [degree/s]
+    @param accel    The joint acceleration limit in [degree/s^2]
+    @return         The time of the last frame in milliseconds
+    '''
+    profile = Trajectory.Trapezoid(speed, accel)
+    duration = profile.plan(start, end)
+    frames.append((0,) + tuple(start) + (DrawingFile.PEN_UP,))
+    steps = max(1, int(math.ceil(1000*duration/period)))
+    angles = [0, 0, 0]
+    for n in range(1, steps + 1):
+        profile.sample(n*duration/steps, angles)
+        frames.append((n*period,) + tuple(angles) + (DrawingFile.PEN_UP,))
+    return steps*period
+
+
+def compile_moves(moves, brain=None, period=PERIOD, speed=None, accel=Trajectory.MAX_ACCEL,
+                  home=JointTask.HOME):
+    '''!
+    @brief          Turns drawing moves into timed joint angle frames
+    @param moves    An iterable of (pen, x, y) moves, as from DrawingFile.read_moves()
+    @param brain    A RoboBrain object with the robot geometry. Defaults to one
+                    from roboGeometry.py
+    @param period   The frame period in milliseconds
+    @param speed    The joint speed limit in [degree/s]. Defaults to
+                    Trajectory.max_speed()
+    @param accel    The joint acceleration limit in [degree/s^2]
+    @param home     The joint angles in degrees the robot starts from. The job
+                    begins with a pen up move of the joints from there to the
+                    start of the drawing. If None, the job starts at the start
+                    of the drawing
+    @return         A list of (time, alpha1, alpha2, alpha3, pen) frames, with
+                    times in milliseconds and angles in degrees
+    @throws ValueError  If a move passes through a position that can't be reached
+    '''
+    if brain is None:
+        brain = RoboGeometry.make_brain()
+    if speed is None:
+        speed = Trajectory.max_speed()
+
+    profile = Trajectory.Trapezoid(speed, accel)
+    frames = []
+    t = 0
+    position = None
+
+    for pen, x, y in moves:
+        if position is None:
+            # The first move starts where the drawing does, with the pen up
+            position = (x, y)
+            alphas = _solve(brain, x, y)
+            if home is None:
+                frames.append((0,) + alphas + (DrawingFile.PEN_UP,))
+            else:
+                t = _ramp(frames, home, alphas, period, speed, accel)
+        length = math.hypot(x - position[0], y - position[1])
+        if length == 0:
+            continue
+
+        # Scale the joint limits to limits along the line
+        try:
+            gain = joint_gain(brain, position, (x, y))
+        except ValueError:
+            raise ValueError("move to ({:.3f}, {:.3f}) leaves the workspace".format(x, y))
+        profile.speed = speed/gain
+        profile.accel = accel/gain
+        duration = profile.plan_length(length)
+
+        # Sample the move once per period, ending exactly on the target
+        brain.update_joints(position[0], position[1], 0)
+        steps = max(1, int(math.ceil(1000*duration/period)))
+        for n in range(1, steps + 1):
+            f = profile.fraction(n*duration/steps)
+            alphas = _solve(brain, position[0] + f*(x - position[0]),
+                            position[1] + f*(y - position[1]))
+            frames.append((t + n*period,) + alphas + (pen,))
+        t += steps*period
+        position = (x, y)
+
+    return frames
+
+
+def write_job(filename, frames, period=PERIOD):
+    '''!
+    @brief          Writes joint angle frames to a job file
+    @param filename The name of the file to write
+    @param frames   A list of (time, alpha1, alpha2, alpha3, pen) frames
+    @param period   The frame period in milliseconds
+    '''
+    scale = TaskPlayback.ANGLE_SCALE
+    with open(filename, 'wb') as f:
+        f.write(struct.pack(TaskPlayback.HEADER, TaskPlayback.MAGIC, len(frames), period))
+        for t, a1, a2, a3, pen in frames:
+            f.write(struct.pack(TaskPlayback.RECORD, int(t),
+                                int(round(a1*scale)) & 0xFFFF,
+                                int(round(a2*scale)) & 0xFFFF,
+                                int(round(a3*scale)) & 0xFFFF, pen))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python jobCompiler.py drawing.gcode [job.bin]")
+        sys.exit(1)
+    filename = sys.argv[2] if len(sys.argv) > 2 else JOB_FILE
+    frames = compile_moves(DrawingFile.read_moves(sys.argv[1]))
+    write_job(filename, frames)
+    print("{:d} frames, {:.1f} s, written to {:s}".format(
+          len(frames), frames[-1][0]/1000 if frames else 0, filename))
@@ -12,16 +12,27 @@
 
 import pyb
 import utime
+import cotask
 import RoboMotorDriver
 import RoboEncoderDriver
 import ClosedLoop
+import Trajectory
+
+## Duty cycle in percent used by JointTask.measure_speed()
+SPEED_TEST_DUTY = 30
+## Time in seconds the joint is driven each way by JointTask.measure_speed()
+SPEED_TEST_TIME = 0.3
+## Joint angles in degrees where the joints rest after calibration, between
+#  the two angles calibrate() sets at each limit switch
+HOME = (5, 123, 242.5)
 
 class JointTask:
     '''! 
     This class implements a motor, encoder, and control task to control robot joints. 
     '''
     
-    def __init__ (self, ready, motor_const, encoder_const, kp, ki, setpoint, queue_theta):
+    def __init__ (self, ready, motor_const, encoder_const, kp, ki, setpoint, theta_box,
+                  speed_box=None):
         '''! 
         @brief                  Creates a JointTask object
         @details                Creates RoboMotorDriver, RoboEncoderDriver, and ClosedLoop
@@ -43,7 +54,9 @@ class JointTask:
         @param ki               The integral gain constatn used for the closed loop controller
                                 The constant should be given in units of [% duty cycle * sec/degree]
         @param setpoint         The setpoint in degrees for the closed loop controller
-        @param queue_theta      The task_share.Queue corresponding to this joint's theta value
+        @param theta_box        The task_share.Mailbox holding this joint's newest setpoint
+        @param speed_box        An optional task_share.Mailbox holding the joint speed in
+                                [degree/s] along the planned move, which is fed forward
         '''
         
         self.motor_const = motor_const
@@ -81,11 +94,14 @@ class JointTask:
         elif encoder_const==3:
             self.encoder = RoboEncoderDriver.RoboEncoderDriver(pyb.Pin(pyb.Pin.board.PA0), pyb.Pin(pyb.Pin.board.PA1), 5)
             
-        # Create closed loop controller
-        self.controller = ClosedLoop.ClosedLoop(kp, ki, setpoint)
+        # Create closed loop controller, timed by the scheduler's clock
+        self.controller = ClosedLoop.ClosedLoop(kp, ki, setpoint, clock=cotask.clock)
+        
+        # Create variable to access the mailbox of setpoints
+        self.theta_box = theta_box
         
-        # Create variable to access queue of position values
-        self.theta_queue = queue_theta
+        # Create variable to access the mailbox of planned joint speeds
+        self.speed_box = speed_box
         
         # Create joint angle value
         self.theta = 0
@@ -97,8 +113,10 @@ class JointTask:
     def run(self):
         '''!
         @brief      Generator which continuously updates the joint
-        @details    Pulls the desired position from a shared queue, and updates
-                    the joint motor, encoder, and controller accordingly
+        @details    Reads the newest desired position from a shared mailbox, and updates
+                    the joint motor, encoder, and controller accordingly. The duty cycle
+                    which would turn the joint at the planned speed is added to the
+                    controller's, so the controller only corrects the error
         '''
         
         while True:
@@ -109,17 +127,17 @@ class JointTask:
                 print("Motor Off")
                 
             else:
-                if self.theta_queue.any():
-                    newTheta = self.theta_queue.get()
-                else:
-                    newTheta = self.theta
-                if self.theta != newTheta:
+                newTheta, new, skipped = self.theta_box.read()
+                if new and self.theta != newTheta:
                     self.theta = newTheta
                     self.controller.change_setpoint(self.theta)
                 
                 # Update encoder and change control signal
                 self.encoder.update()
-                self.motor.set_duty_cycle(self.controller.update(self.encoder.read()))
+                duty = self.controller.update(self.encoder.read())
+                if self.speed_box is not None:
+                    duty += self.speed_box.get()*100/Trajectory.FULL_DUTY_SPEED
+                self.motor.set_duty_cycle(duty)
             yield(0)
 
     def calibrate(self):
@@ -169,7 +187,48 @@ class JointTask:
                         self.encoder.setTheta((theta1+theta2)/2)
                     print("calibration complete")
                     break
-                
+
+    def measure_speed(self, duty=SPEED_TEST_DUTY, seconds=SPEED_TEST_TIME):
+        '''!
+        @brief          Measures the speed of the joint at full duty cycle
+        @details        Drives the joint one way and then back at a fixed duty
+                        cycle, reading the encoder every millisecond. The speed
+                        is measured over the second half of each run, once the
+                        motor has sped up, and the two directions are averaged.
+                        The joint ends up about where it started, so the run is
+                        short enough to stay clear of the other links. Run by
+                        speedCal.py with the scheduler stopped, after the
+                        encoder has been calibrated.
+        @param duty     The duty cycle in percent to drive the joint at
+        @param seconds  The time in seconds to drive the joint each way
+        @return         The joint speed scaled to 100% duty cycle in [degree/s]
+        '''
+        clock = cotask.clock
+        speeds = []
+        for sign in (1, -1):
+            self.motor.set_duty_cycle(sign*duty)
+            start = clock.ticks_us()
+            angle = 0
+            half_angle = 0
+            half_time = None
+            self.encoder.update()
+            last = self.encoder.read()
+            while True:
+                clock.sleep_ms(1)
+                self.encoder.update()
+                now = self.encoder.read()
+                angle += Trajectory.wrap_delta(last, now)
+                last = now
+                t = clock.ticks_diff(clock.ticks_us(), start)/1000000
+                if half_time is None and t >= seconds/2:
+                    half_time = t
+                    half_angle = angle
+                if t >= seconds:
+                    break
+            speeds.append(sign*(angle - half_angle)/(t - half_time))
+        self.motor.set_duty_cycle(0)
+        return (speeds[0] + speeds[1])/2*100/duty
+        
         
 if __name__ == "__main__":
     pass
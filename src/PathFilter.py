@@ -0,0 +1,199 @@
+'''!
+@file       pathFilter.py
+@brief      Drops touchpad points that don't change the shape of the drawing
+@details    A streaming tolerance band filter. The first point of a stroke is
+            always kept and becomes the anchor. Following points are held back
+            as long as every point since the anchor lies within the tolerance
+            of the segment from the anchor to the newest point, so a stroke
+            which turns back keeps its turning point. When a point
+            breaks out of the band, the last point that fit is kept and becomes
+            the new anchor. Points closer than the tolerance to the anchor,
+            such as a finger resting in one place, never start a new segment.
+
+            Held back points are stored in a small buffer allocated when the
+            filter is created, so no memory is allocated while drawing. If the
+            buffer fills up, the newest point that fit is kept early. When the
+            finger is lifted, flush() returns the last point of the stroke.
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+import array
+
+## Default number of held back points
+BUFFER_SIZE = 16
+
+
+class PathFilter:
+    '''!
+    @brief This class implements a streaming polyline simplifier
+    '''
+
+    def __init__ (self, tolerance, size=BUFFER_SIZE):
+        '''!
+        @brief              Creates a PathFilter object
+        @param tolerance    The largest distance in inches a dropped point may
+                            be from the simplified path
+        @param size         The number of points which can be held back
+        '''
+        self.tolerance = tolerance
+        self.size = size
+
+        # Points held back since the anchor
+        self.buf_x = array.array('f', [0]*size)
+        self.buf_y = array.array('f', [0]*size)
+        self.count = 0
+
+        # Last point kept, and whether a stroke is in progress
+        self.anchor_x = 0
+        self.anchor_y = 0
+        self.drawing = False
+
+        # Point to be put into the queues when add() or flush() returns True
+        self.x = 0
+        self.y = 0
+
+        # Number of points given to the filter and number dropped
+        self.points = 0
+        self.dropped = 0
+
+    def add(self, x, y):
+        '''!
+        @brief      Adds a touchpad point to the current stroke
+        @param x    The x-coordinate of the point in inches
+        @param y    The y-coordinate of the point in inches
+        @return     True if a point should be sent on, in which case it is
+                    held in the x and y attributes
+        '''
+        self.points += 1
+
+        # The first point of a stroke is always kept
+        if not self.drawing:
+            self.drawing = True
+            self.count = 0
+            return self._keep(x, y)
+
+        dx = x - self.anchor_x
+        dy = y - self.anchor_y
+        length_sq = dx*dx + dy*dy
+        tol = self.tolerance
+
+        # Points near the anchor don't set a direction yet
+        if length_sq <= tol*tol:
+            if self.count == 0:
+                self.dropped += 1
+                return False
+            # Held back points must also be near the anchor, or the stroke has
+            # turned back on itself
+            fits = True
+            for n in range(self.count):
+                ex = self.buf_x[n] - self.anchor_x
+                ey = self.buf_y[n] - self.anchor_y
+                if ex*ex + ey*ey > tol*tol:
+                    fits = False
+                    break
+        else:
+            # Check every held back point against the segment from the anchor
+            # to the newest point: across the segment, and along it past
+            # either end, which happens when the stroke turns back
+            limit = tol*tol*length_sq
+            fits = True
+            for n in range(self.count):
+                ex = self.buf_x[n] - self.anchor_x
+                ey = self.buf_y[n] - self.anchor_y
+                cross = ex*dy - ey*dx
+                dot = ex*dx + ey*dy
+                if dot > length_sq:
+                    dot -= length_sq
+                elif dot > 0:
+                    dot = 0
+                if cross*cross > limit or dot*dot > limit:
+                    fits = False
+                    break
+
+        if fits and self.count < self.size:
+            self.buf_x[self.count] = x
+            self.buf_y[self.count] = y
+            self.count += 1
+            return False
+
+        # Keep the last point which fit and start a new segment from it
+        last = self.count - 1
+        self.dropped += last
+        self._keep(self.buf_x[last], self.buf_y[last])
+        self.buf_x[0] = x
+        self.buf_y[0] = y
+        self.count = 1
+        return True
+
+    def flush(self):
+        '''!
+        @brief      Ends the current stroke
+        @details    Called when the finger is lifted from the touchpad.
+        @return     True if the last point of the stroke should be sent on, in
+                    which case it is held in the x and y attributes
+        '''
+        self.drawing = False
+        if self.count == 0:
+            return False
+        last = self.count - 1
+        self.dropped += last
+        self.count = 0
+        return self._keep(self.buf_x[last], self.buf_y[last])
+
+    def _keep(self, x, y):
+        '''!
+        @brief      Makes a point the new anchor and the point to send on
+        @return     True
+        '''
+        self.anchor_x = x
+        self.anchor_y = y
+        self.x = x
+        self.y = y
+        return True
+
+    def __repr__(self):
+        '''!
+        @brief      Describes how many points the filter has dropped
+        '''
+        return "PathFilter: {:d} of {:d} points dropped".format(self.dropped, self.points)
+
+
+if __name__ == "__main__":
+    import math
+
+    # A square traced with a little noise, then a circle
+    myFilter = PathFilter(0.02)
+    path = []
+    for n in range(200):
+        side = n // 50
+        s = (n % 50)/50
+        corners = ((0, 0), (2, 0), (2, 2), (0, 2), (0, 0))
+        x = corners[side][0] + s*(corners[side + 1][0] - corners[side][0])
+        y = corners[side][1] + s*(corners[side + 1][1] - corners[side][1])
+        path.append((x + 0.005*math.sin(7*n), y + 0.005*math.cos(5*n)))
+    for n in range(200):
+        t = 2*math.pi*n/200
+        path.append((4 + math.cos(t), 1 + math.sin(t)))
+
+    kept = []
+    for x, y in path:
+        if myFilter.add(x, y):
+            kept.append((myFilter.x, myFilter.y))
+    if myFilter.flush():
+        kept.append((myFilter.x, myFilter.y))
+    print(myFilter)
+    print("{:d} points kept".format(len(kept)))
+
+    # A stroke which turns back on itself must keep its turning point
+    myFilter = PathFilter(0.02)
+    kept = []
+    for x in (0, 0.5, 1, 1.5, 2, 1.5, 1, 0.5):
+        if myFilter.add(x, 0):
+            kept.append((myFilter.x, myFilter.y))
+    if myFilter.flush():
+        kept.append((myFilter.x, myFilter.y))
+    print(myFilter)
+    assert kept == [(0, 0), (2, 0), (0.5, 0)], kept
@@ -0,0 +1,326 @@
+'''!
+@file       roboBench.py
+@brief      Benchmarks the kinematics backends of RoboBrain on a PC
+@details    Sweeps the drawing area back and forth, the way a drawing moves,
+            with the robot geometry used by main.py, and runs every kinematics
+            backend over the same points:
+            - @c reference, @c native, and @c viper: update_joints with each
+              kernel from roboKernels.py
+            - @c table: update_joints with a joint angle table from roboTable.py
+            - @c solve_many: the batched solver, one row of the sweep at a time
+            - @c forward: the forward kinematics solver, fed the joint angles of
+              the reference solution with the commanded pose set to the point
+
+            For each backend and grid step the benchmark reports the time per
+            solve measured with utime.ticks_us() (the fastest of a few
+            passes), the memory allocated while sweeping (traced with
+            tracemalloc, as a stand-in for the board's heap), and the error
+            against a reference solution polished with Newton's method to full
+            double precision. Joint errors are in degrees and forward
+            kinematics errors in inches. Failures count points where a
+            different joint option was chosen, or where forward kinematics
+            didn't converge. Points the workspace index of roboWorkspace.py
+            would reject are left out.
+
+            Results are printed, and written as JSON if a file is given so
+            runs can be compared:
+            @code
+            python roboBench.py [results.json]
+            @endcode
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+import json
+import math
+import sys
+import time
+import tracemalloc
+
+import HostShim
+HostShim.install()
+
+import utime
+import RoboBrain
+import RoboGeometry
+import RoboTable
+import RoboWorkspace
+
+## Grid steps of the sweeps in inches
+STEPS = (0.2, 0.1, 0.05)
+
+## Number of timed passes over each sweep, of which the fastest is reported
+REPEATS = 3
+
+## Grid step of the joint angle table used by the table backend, in inches
+TABLE_STEP = 0.3
+
+## Joint errors above this many degrees count as a different joint option
+MISMATCH_DEG = 1.0
+
+
+def sweep_points(step):
+    '''!
+    @brief      Lists the points of a back and forth sweep of the drawing area
+    @details    Leaves out points near singular poses, using the same limits
+                as roboWorkspace.py.
+    @param step The grid step in inches
+    @return     A list of rows, each a list of (x, y) points
+    '''
+    brain = RoboGeometry.make_brain()
+    cx, cy = RoboGeometry.DRAW_CENTER
+    hx, hy = RoboGeometry.DRAW_HALF_SIZE
+    nx = int(round(2*hx/step)) + 1
+    ny = int(round(2*hy/step)) + 1
+
+    rows = []
+    for j in range(ny):
+        columns = range(nx) if j % 2 == 0 else range(nx - 1, -1, -1)
+        row = []
+        for i in columns:
+            x = cx - hx + i*step
+            y = cy - hy + j*step
+            margin, q_min = RoboWorkspace.reach_margin(brain, x, y)
+            if margin <= RoboWorkspace.MIN_MARGIN or q_min <= RoboWorkspace.MIN_Q:
+                continue
+            brain.update_joints(x, y, 0)
+            kappa = RoboWorkspace.condition_number(brain, x, y, 0,
+                    (brain.alpha1, brain.alpha2, brain.alpha3))
+            if kappa < RoboWorkspace.MAX_COND:
+                row.append((x, y))
+        rows.append(row)
+    return rows
+
+
+def polish(brain, x, y, theta, alphas):
+    '''!
+    @brief          Refines joint angles with Newton's method
+    @details        Solves each joint's loop closure equation
+                    |P + R(theta)c - l - a(cos(alpha), sin(alpha))|^2 = b^2
+                    starting from the given angle, summing terms with
+                    math.fsum, until the step is below double precision.
+    @param brain    A RoboBrain object with the robot geometry
+    @param x        The x-coordinate of the platform
+    @param y        The y-coordinate of the platform
+    @param theta    The orientation of the platform in degrees
+    @param alphas   A tuple of the three joint angles in degrees
+    @return         A tuple of the three refined joint angles in degrees
+    '''
+    rad = math.radians(theta)
+    cos_th = math.cos(rad)
+    sin_th = math.sin(rad)
+    refined = []
+    for l, c, a, b, alpha in ((brain.l1, brain.c1, brain.a1, brain.b1, alphas[0]),
+                              (brain.l2, brain.c2, brain.a2, brain.b2, alphas[1]),
+                              (brain.l3, brain.c3, brain.a3, brain.b3, alphas[2])):
+        al = math.radians(alpha)
+        for _ in range(10):
+            dx = math.fsum((x, c[0]*cos_th, -c[1]*sin_th, -l[0], -a*math.cos(al)))
+            dy = math.fsum((y, c[0]*sin_th, c[1]*cos_th, -l[1], -a*math.sin(al)))
+            f = math.fsum((dx*dx, dy*dy, -b*b))
+            df = 2*a*(dx*math.sin(al) - dy*math.cos(al))
+            step = f/df
+            al -= step
+            if abs(step) < 1e-16:
+                break
+        refined.append(math.degrees(al) % 360)
+    return tuple(refined)
+
+
+def _angle_diff(a, b):
+    '''!
+    @brief      Finds the smallest difference between two angles in degrees
+    '''
+    diff = abs(a - b) % 360
+    return min(diff, 360 - diff)
+
+
+def _make_runner(backend, table, ref_alphas):
+    '''!
+    @brief              Creates a function which runs one backend over a sweep
+    @param backend      The name of the backend
+    @param table        The joint angle table used by the table backend
+    @param ref_alphas   The joint angles of every point, used by the forward
+                        kinematics backend
+    @return             A tuple (run, brain) where run(rows, record) solves every
+                        point and, if record is a list, appends each result to it
+    '''
+    if backend == 'table':
+        brain = RoboGeometry.make_brain(table = table, kernel = 'native')
+    elif backend in ('reference', 'native', 'viper'):
+        brain = RoboGeometry.make_brain(kernel = backend)
+    else:
+        brain = RoboGeometry.make_brain()
+
+    def run_update(rows, record):
+        for row in rows:
+            for x, y in row:
+                brain.update_joints(x, y, 0)
+                if record is not None:
+                    record.append((brain.alpha1, brain.alpha2, brain.alpha3))
+
+    def run_many(rows, record):
+        for row in rows:
+            if not row:
+                continue
+            xs = [p[0] for p in row]
+            ys = [p[1] for p in row]
+            alphas1, alphas2, alphas3 = brain.solve_many(xs, ys, 0)
+            if record is not None:
+                record.extend(zip(alphas1, alphas2, alphas3))
+
+    def run_forward(rows, record):
+        # The commanded pose is set first, as it is while drawing
+        n = 0
+        for row in rows:
+            for x, y in row:
+                brain.set_position(x, y)
+                alpha1, alpha2, alpha3 = ref_alphas[n]
+                n += 1
+                pose = brain.forward(alpha1, alpha2, alpha3)
+                if record is not None:
+                    record.append(pose)
+
+    if backend == 'solve_many':
+        return run_many, brain
+    if backend == 'forward':
+        return run_forward, brain
+    return run_update, brain
+
+
+def run_backend(backend, rows, ref_alphas, table):
+    '''!
+    @brief              Times one backend over a sweep and measures its error
+    @param backend      The name of the backend
+    @param rows         The rows of points from sweep_points()
+    @param ref_alphas   The polished reference joint angles of every point
+    @param table        The joint angle table used by the table backend
+    @return             A dictionary of results
+    '''
+    points = [p for row in rows for p in row]
+
+    def fresh():
+        return _make_runner(backend, table, ref_alphas)
+
+    # Timed passes
+    elapsed = None
+    for _ in range(REPEATS):
+        run, brain = fresh()
+        start = utime.ticks_us()
+        run(rows, None)
+        duration = utime.ticks_diff(utime.ticks_us(), start)
+        if elapsed is None or duration < elapsed:
+            elapsed = duration
+
+    # Allocation pass
+    run, brain = fresh()
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    run(rows, None)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Accuracy pass
+    table.hits = 0
+    table.misses = 0
+    run, brain = fresh()
+    record = []
+    run(rows, record)
+
+    # Points where a different joint option was chosen, or where forward
+    # kinematics didn't converge
+    errors = []
+    failures = 0
+    if backend == 'forward':
+        for (x, y), pose in zip(points, record):
+            if not pose[3]:
+                failures += 1
+                continue
+            errors.append(max(abs(pose[0] - x), abs(pose[1] - y)))
+        unit = 'in'
+    else:
+        for ref, alphas in zip(ref_alphas, record):
+            err = max(_angle_diff(a, b) for a, b in zip(ref, alphas))
+            if err > MISMATCH_DEG:
+                failures += 1
+            errors.append(err)
+        unit = 'deg'
+
+    count = len(points)
+    result = {'backend': backend,
+              'points': count,
+              'us_per_solve': elapsed/count,
+              'solves_per_s': 1e6*count/elapsed if elapsed > 0 else None,
+              'peak_bytes': peak - base,
+              'retained_bytes': current - base,
+              'max_err': max(errors) if errors else None,
+              'mean_err': sum(errors)/len(errors) if errors else None,
+              'err_unit': unit,
+              'failures': failures}
+    if backend == 'table':
+        result['table_hits'] = table.hits
+        result['table_misses'] = table.misses
+    return result
+
+
+def run_all(steps=STEPS):
+    '''!
+    @brief          Runs every backend over sweeps of each grid step
+    @param steps    The grid steps in inches
+    @return         A dictionary holding the run information and results
+    '''
+    cx, cy = RoboGeometry.DRAW_CENTER
+    hx, hy = RoboGeometry.DRAW_HALF_SIZE
+    table = RoboTable.build_table(RoboGeometry.make_brain(), cx - hx, cy - hy,
+                                  cx + hx, cy + hy, TABLE_STEP)
+
+    backends = ['reference', 'native', 'viper', 'table']
+    if RoboBrain.np is not None:
+        backends.append('solve_many')
+    backends.append('forward')
+
+    results = []
+    for step in steps:
+        rows = sweep_points(step)
+
+        # Reference joint options along the sweep, polished to full precision
+        brain = RoboGeometry.make_brain()
+        ref_alphas = []
+        for row in rows:
+            for x, y in row:
+                brain.update_joints(x, y, 0)
+                ref_alphas.append(polish(brain, x, y, 0, (brain.alpha1,
+                                  brain.alpha2, brain.alpha3)))
+
+        for backend in backends:
+            result = run_backend(backend, rows, ref_alphas, table)
+            result['step'] = step
+            results.append(result)
+
+    return {'python': sys.version.split()[0],
+            'platform': sys.platform,
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'table_step': TABLE_STEP,
+            'results': results}
+
+
+if __name__ == "__main__":
+    filename = sys.argv[1] if len(sys.argv) > 1 else None
+    report = run_all()
+
+    print("{:<12s}{:>6s}{:>8s}{:>10s}{:>11s}{:>11s}{:>13s}{:>6s}".format(
+          'backend', 'step', 'points', 'us/solve', 'solves/s', 'peak B',
+          'max err', 'fail'))
+    for r in report['results']:
+        print("{:<12s}{:>6.2f}{:>8d}{:>10.2f}{:>11.0f}{:>11d}{:>9.2e} {:<3s}{:>6d}".format(
+              r['backend'], r['step'], r['points'], r['us_per_solve'],
+              r['solves_per_s'] or 0, r['peak_bytes'],
+              float('nan') if r['max_err'] is None else r['max_err'],
+              r['err_unit'], r['failures']))
+
+    if filename is not None:
+        with open(filename, 'w') as f:
+            json.dump(report, f, indent = 2)
+        print("Results written to " + filename)
@@ -10,6 +10,16 @@
 '''
 
 import math
+import RoboKernels
+
+# Array math for batched solves: ulab on the board, NumPy on a PC
+try:
+    from ulab import numpy as np
+except ImportError:
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
 
 class RoboBrain:
     '''! 
@@ -17,7 +27,7 @@ class RoboBrain:
     '''
     
     def __init__ (self, joint1loc, joint2loc, joint3loc, alength, blength,
-                  c1, c2, c3, dbg_Flag=False):
+                  c1, c2, c3, dbg_Flag=False, table=None, kernel='reference'):
         '''! 
         @brief              Creates a RoboBrain object
         @details            Creates a RoboBrain object by saving relevant geometric
@@ -55,6 +65,12 @@ class RoboBrain:
                             to the center of the moving platform P when the robot
                             is in the reset position. Units are expected in inches
         @param dbg_Flag     A flag used to turn on/off debug mode
+        @param table        An optional RoboTable.IKTable used to look up joint
+                            values at orientation 0 instead of solving. Positions
+                            the table can't answer use the closed form solution
+        @param kernel       The name of the kernel from roboKernels.py used to
+                            solve the inverse kinematics: 'reference' (default),
+                            'native', or 'viper'
         '''
         
         # Save joint locations
@@ -92,6 +108,12 @@ class RoboBrain:
         
         self.dbg_Flag = dbg_Flag
         
+        # Optional joint angle lookup table
+        self.table = table
+        
+        # Kernel which computes the joint options
+        self.kernel = RoboKernels.KERNELS[kernel]
+        
         # Joints angles
         self.alpha1 = 0.0
         self.alpha2 = 0.0
@@ -105,6 +127,16 @@ class RoboBrain:
         self.prevAlpha2 = 0
         self.prevAlpha3 = 0
         
+        # Last pose found by forward kinematics, used as the next first guess
+        self.fkP = None
+        self.fkTheta = 0
+        
+        # Newton steps taken by the last forward kinematics solve, and how far
+        # in inches the last solution may be from the commanded pose to be used
+        # as the first guess
+        self.fkIterations = 0
+        self.fkRestart = 0.25
+        
     
     def reset(self):
         '''!
@@ -150,7 +182,8 @@ class RoboBrain:
         @param newY The new y-coordinate of the position
         '''
         
-        self.prevP = self.P
+        self.prevP[0] = self.P[0]
+        self.prevP[1] = self.P[1]
         self.P[0] = newX
         self.P[1] = newY
         
@@ -160,7 +193,8 @@ class RoboBrain:
         @param newX The new x-coordinate of the position
         '''
         
-        self.prevP = self.P
+        self.prevP[0] = self.P[0]
+        self.prevP[1] = self.P[1]
         self.P[0] = newX
     
     def set_y(self, newY):
@@ -169,7 +203,8 @@ class RoboBrain:
         @param newY The new y-coordinate of the position
         '''
         
-        self.prevP = self.P
+        self.prevP[0] = self.P[0]
+        self.prevP[1] = self.P[1]
         self.P[1] = newY
     
     def set_theta(self, newTheta):
@@ -187,7 +222,11 @@ class RoboBrain:
         @details        Uses inverse kinematic equations derived from Introduction
                         to Robotics: Analysis, Control, Application 3rd Ed by
                         Saeed B. Niku to calculate the necessary angles alpha1,
-                        alpha2, and alpha3 for the given position and orientation
+                        alpha2, and alpha3 for the given position and orientation.
+                        The equations are evaluated by the kernel chosen when
+                        the RoboBrain was created. If a lookup table was given
+                        and the orientation is 0, the joint options are
+                        interpolated from the table instead.
         @param newX     The desired x-coordinate to move the robot to
         @param newY     The desired y-coordinate to move the robot to
         @param newTheta The desired orientation to move the robot to
@@ -202,188 +241,365 @@ class RoboBrain:
         self.prevAlpha2 = self.alpha2
         self.prevAlpha3 = self.alpha3
         
-        # Calculate alpha values for each joint
-        
-        # Joint 1
-        q1x = self.l1[0] -self.P[0] - self.c1[0]*math.cos(math.radians(self.theta))\
-              + self.c1[1]*math.sin(math.radians(self.theta))
-        
-        q1y = self.l1[1] -self.P[1] - self.c1[0]*math.sin(math.radians(self.theta))\
-              - self.c1[1]*math.cos(math.radians(self.theta))
-        
-        Q1 = (self.b1**2 - self.a1**2 - q1x**2 -q1y**2)/(2*self.a1)
-        
-        denom = (q1x**2 + q1y**2)**0.5
-        
-        if self.dbg_Flag:
-            print("q1x = ", q1x)
-            print("q1y = ", q1y)
-            print("Q1 = ", Q1)
-            
-        omega = math.degrees(math.atan2(q1x/denom, q1y/denom))
-        
-        if self.dbg_Flag:
-            print("Omega = ", omega)
-            
-        alf = math.degrees(math.asin(Q1/denom))
-        
-        alpha1_1 = alf - omega
-        alpha1_2 = (180-alf) - omega
-        
-        # Adjust joint options so angle is always between 0 and 360
-        while (alpha1_1 < 0) or (alpha1_1 >= 360):
-            if alpha1_1 < 0:
-                alpha1_1 += 360
-            elif alpha1_1 >= 360:
-                alpha1_1 -= 360
-        
-        while (alpha1_2 < 0) or (alpha1_2 >= 360):
-            if alpha1_2 < 0:
-                alpha1_2 += 360
-            elif alpha1_2 >= 360:
-                alpha1_2 -= 360
-                
-        if self.dbg_Flag:
-            print("Alpha1, option 1 = ", alpha1_1)
-            print("Alpha1, option 2 = ", alpha1_2)
-            
-        # Determine correct 'delta' values
-        delta1_1 = abs(alpha1_1-self.prevAlpha1)
+        # Use the lookup table where it has an answer, otherwise solve
+        options = None
+        if self.table is not None and newTheta == 0:
+            options = self.table.lookup(newX, newY)
+        if options is None:
+            options = self.kernel(self, newX, newY, newTheta)
         
-        if delta1_1 > 180:
-            delta1_1 = abs(alpha1_1-self.prevAlpha1-360)
-        
-        delta1_2 = abs(alpha1_2-self.prevAlpha1)
-        
-        if delta1_2 > 180:
-            delta1_2 = abs(alpha1_2-self.prevAlpha1-360)
-        
-        # Set alpha 1 to joint value that is closest to previous
-        if(delta1_1 < delta1_2) and ((alpha1_1 > 315) or (alpha1_1 < 60)):
+        # Set each joint to the option that is closest to previous
+        self._select_options(options)
+
+    def solve_many(self, xs, ys, thetas):
+        '''!
+        @brief          Solves the inverse kinematics for a whole stroke at once
+        @details        Computes both joint options for every pose of a stroke with
+                        array math (ulab numpy on the board, NumPy on a PC), then
+                        picks the option for each joint with the same rules used
+                        by update_joints, also with array math. The solve
+                        starts from the current joint values and leaves the
+                        RoboBrain in the same state as if update_joints had been
+                        called for each pose in turn. Poses outside of the
+                        workspace give nan instead of raising an error.
+        @param xs       An array (or list) of desired x-coordinates
+        @param ys       An array (or list) of desired y-coordinates
+        @param thetas   An array (or list) of desired orientations in degrees,
+                        or a single orientation used for every pose
+        @return         A tuple of three arrays (alpha1, alpha2, alpha3) holding
+                        the joint angles in degrees for each pose
+        @throws ImportError If neither ulab nor NumPy is available
+        '''
+
+        if np is None:
+            raise ImportError("solve_many needs ulab or NumPy; use update_joints")
+
+        xs = np.array(xs)
+        ys = np.array(ys)
+        n = len(xs)
+
+        # Allow a single orientation for the whole stroke
+        if isinstance(thetas, (int, float)):
+            thetas = np.zeros(n) + thetas
+        else:
+            thetas = np.array(thetas)
+
+        rad = thetas*(math.pi/180)
+        cos_th = np.cos(rad)
+        sin_th = np.sin(rad)
+
+        # Both joint options for every pose, already wrapped to [0, 360)
+        opt1_1, opt1_2 = self._options_many(self.l1, self.a1, self.b1, self.c1,
+                                            xs, ys, cos_th, sin_th)
+        opt2_1, opt2_2 = self._options_many(self.l2, self.a2, self.b2, self.c2,
+                                            xs, ys, cos_th, sin_th)
+        opt3_1, opt3_2 = self._options_many(self.l3, self.a3, self.b3, self.c3,
+                                            xs, ys, cos_th, sin_th)
+
+        # Pick the option of each joint with the rules of _select_options
+        alphas1 = self._pick_many(opt1_1, opt1_2, ((opt1_1 > 315) + (opt1_1 < 60)) > 0,
+                                  self.alpha1)
+        alphas2 = self._pick_many(opt2_1, opt2_2, (opt2_1 > 60)*(opt2_1 < 150),
+                                  self.alpha2)
+        alphas3 = self._pick_many(opt3_1, opt3_2, (opt3_1 > 180)*(opt3_2 < 270),
+                                  self.alpha3)
+
+        # Leave the robot state as update_joints would have
+        if n > 0:
+            self.set_position(float(xs[n-1]), float(ys[n-1]))
+            self.set_theta(float(thetas[n-1]))
+            if n > 1:
+                self.prevAlpha1 = float(alphas1[n-2])
+                self.prevAlpha2 = float(alphas2[n-2])
+                self.prevAlpha3 = float(alphas3[n-2])
+            else:
+                self.prevAlpha1 = self.alpha1
+                self.prevAlpha2 = self.alpha2
+                self.prevAlpha3 = self.alpha3
+            self.alpha1 = float(alphas1[n-1])
+            self.alpha2 = float(alphas2[n-1])
+            self.alpha3 = float(alphas3[n-1])
+
+        return alphas1, alphas2, alphas3
+
+    def joint_options(self, newX, newY, newTheta):
+        '''!
+        @brief          Computes both options for each joint without choosing one
+        @details        Uses the same kernel as update_joints but leaves the
+                        robot state alone. Used to build lookup tables.
+        @param newX     The x-coordinate of the platform
+        @param newY     The y-coordinate of the platform
+        @param newTheta The orientation of the platform in degrees
+        @return         A tuple (alpha1_1, alpha1_2, alpha2_1, alpha2_2, alpha3_1,
+                        alpha3_2) of joint options in degrees, each in [0, 360)
+        '''
+
+        return self.kernel(self, newX, newY, newTheta)
+
+    def forward(self, alpha1, alpha2, alpha3, max_iter=4, tol=1e-4):
+        '''!
+        @brief          Finds the platform pose from the three joint angles
+        @details        Solves the three loop closure equations
+                        |P + R(theta)c - l - a(cos(alpha), sin(alpha))|^2 = b^2
+                        for the platform position and orientation with Newton's
+                        method. Each solve starts from the pose found by the
+                        previous one, so while the robot is moving it usually
+                        converges after one or two Newton steps. If that pose is
+                        more than fkRestart inches from the last pose given to
+                        update_joints, or there is none yet, the solve starts
+                        from the commanded pose instead, so it can't keep
+                        following another assembly mode of the robot. The
+                        number of steps is capped at max_iter so the cost of a
+                        call is bounded.
+        @param alpha1   The angle of joint 1 in degrees
+        @param alpha2   The angle of joint 2 in degrees
+        @param alpha3   The angle of joint 3 in degrees
+        @param max_iter The largest number of Newton steps to take
+        @param tol      The largest loop closure error in square inches for
+                        which the solve has converged. The default is about a
+                        hundred thousandth of an inch for 7 inch arms
+        @return         A tuple (x, y, theta, converged) with the platform
+                        position, its orientation in degrees, and a flag which
+                        is True if the solve converged
+        '''
+
+        x, y = self.P
+        th = math.radians(self.theta)
+        if self.fkP is not None and abs(self.fkP[0] - x) < self.fkRestart \
+            and abs(self.fkP[1] - y) < self.fkRestart:
+            x, y = self.fkP
+            th = math.radians(self.fkTheta)
+
+        # Location of each passive joint (B) doesn't change during the solve
+        a1 = math.radians(alpha1)
+        a2 = math.radians(alpha2)
+        a3 = math.radians(alpha3)
+        b1x = self.l1[0] + self.a1*math.cos(a1)
+        b1y = self.l1[1] + self.a1*math.sin(a1)
+        b2x = self.l2[0] + self.a2*math.cos(a2)
+        b2y = self.l2[1] + self.a2*math.sin(a2)
+        b3x = self.l3[0] + self.a3*math.cos(a3)
+        b3y = self.l3[1] + self.a3*math.sin(a3)
+
+        converged = False
+        iterations = 0
+        while True:
+            cos_th = math.cos(th)
+            sin_th = math.sin(th)
+
+            # Rotated attachment points and the passive link vectors B -> C
+            r1x = self.c1[0]*cos_th - self.c1[1]*sin_th
+            r1y = self.c1[0]*sin_th + self.c1[1]*cos_th
+            r2x = self.c2[0]*cos_th - self.c2[1]*sin_th
+            r2y = self.c2[0]*sin_th + self.c2[1]*cos_th
+            r3x = self.c3[0]*cos_th - self.c3[1]*sin_th
+            r3y = self.c3[0]*sin_th + self.c3[1]*cos_th
+            d1x = x + r1x - b1x
+            d1y = y + r1y - b1y
+            d2x = x + r2x - b2x
+            d2y = y + r2y - b2y
+            d3x = x + r3x - b3x
+            d3y = y + r3y - b3y
+
+            # Residuals and Jacobian rows (d/dx, d/dy, d/dtheta)
+            f1 = d1x*d1x + d1y*d1y - self.b1*self.b1
+            f2 = d2x*d2x + d2y*d2y - self.b2*self.b2
+            f3 = d3x*d3x + d3y*d3y - self.b3*self.b3
+            if abs(f1) < tol and abs(f2) < tol and abs(f3) < tol:
+                converged = True
+                break
+            if iterations == max_iter:
+                break
+            iterations += 1
+
+            j13 = 2*(d1y*r1x - d1x*r1y)
+            j23 = 2*(d2y*r2x - d2x*r2y)
+            j33 = 2*(d3y*r3x - d3x*r3y)
+            j11 = 2*d1x
+            j12 = 2*d1y
+            j21 = 2*d2x
+            j22 = 2*d2y
+            j31 = 2*d3x
+            j32 = 2*d3y
+
+            # Solve J*step = -f with Cramer's rule
+            det = (j11*(j22*j33 - j23*j32) - j12*(j21*j33 - j23*j31)
+                   + j13*(j21*j32 - j22*j31))
+            if det == 0:
+                break
+            dx = -(f1*(j22*j33 - j23*j32) - j12*(f2*j33 - j23*f3)
+                   + j13*(f2*j32 - j22*f3))/det
+            dy = -(j11*(f2*j33 - j23*f3) - f1*(j21*j33 - j23*j31)
+                   + j13*(j21*f3 - f2*j31))/det
+            dth = -(j11*(j22*f3 - f2*j32) - j12*(j21*f3 - f2*j31)
+                    + f1*(j21*j32 - j22*j31))/det
+            x += dx
+            y += dy
+            th += dth
+
+        self.fkIterations = iterations
+        theta = math.degrees(th)
+        if converged:
+            self.fkP = [x, y]
+            self.fkTheta = theta
+        return x, y, theta, converged
+
+    def _select_options(self, options):
+        '''!
+        @brief          Chooses the joint values from both options of each joint
+        @details        Applies the same rules as update_joints, comparing each
+                        option against the previous joint values prevAlpha1,
+                        prevAlpha2, and prevAlpha3
+        @param options  A tuple (alpha1_1, alpha1_2, alpha2_1, alpha2_2, alpha3_1,
+                        alpha3_2) of joint options in degrees
+        '''
+
+        alpha1_1, alpha1_2, alpha2_1, alpha2_2, alpha3_1, alpha3_2 = options
+
+        if (self._delta(alpha1_1, self.prevAlpha1) < self._delta(alpha1_2, self.prevAlpha1)) \
+            and ((alpha1_1 > 315) or (alpha1_1 < 60)):
             self.alpha1 = alpha1_1
         else:
             self.alpha1 = alpha1_2
-        
-        # Joint 2
-        q2x = self.l2[0] -self.P[0] - self.c2[0]*math.cos(math.radians(self.theta))\
-              + self.c2[1]*math.sin(math.radians(self.theta))
-        
-        q2y = self.l2[1] -self.P[1] - self.c2[0]*math.sin(math.radians(self.theta))\
-              - self.c2[1]*math.cos(math.radians(self.theta))
-        
-        Q2 = (self.b2**2 - self.a2**2 - q2x**2 -q2y**2)/(2*self.a2)
-        
-        denom2 = (q2x**2 + q2y**2)**0.5
-        
-        if self.dbg_Flag:
-            print("q2x = ", q2x)
-            print("q2y = ", q2y)
-            print("Q2 = ", Q2)
-            
-        omega2 = math.degrees(math.atan2(q2x/denom2, q2y/denom2))
-        
-        if self.dbg_Flag:
-            print("Omega2 = ", omega2)
-            
-        alf2 = math.degrees(math.asin(Q2/denom2))
-        
-        alpha2_1 = alf2 - omega2
-        alpha2_2 = (180-alf2) - omega2
-        
-        # Adjust joint options so angle is always between 0 and 360
-        while (alpha2_1 < 0) or (alpha2_1 >= 360):
-            if alpha2_1 < 0:
-                alpha2_1 += 360
-            elif alpha2_1 >= 360:
-                alpha2_1 -= 360
-        
-        while (alpha2_2 < 0) or (alpha2_2 >= 360):
-            if alpha2_2 < 0:
-                alpha2_2 += 360
-            elif alpha2_2 >= 360:
-                alpha2_2 -= 360
-                
-        if self.dbg_Flag:
-            print("Alpha2, option 1 = ", alpha2_1)
-            print("Alpha2, option 2 = ", alpha2_2)
-            
-        # Determine correct 'delta' values
-        delta2_1 = abs(alpha2_1-self.prevAlpha2)
-        
-        if delta2_1 > 180:
-            delta2_1 = abs(alpha2_1-self.prevAlpha2-360)
-        
-        delta2_2 = abs(alpha2_2-self.prevAlpha2)
-        
-        if delta2_2 > 180:
-            delta2_2 = abs(alpha2_2-self.prevAlpha2-360)
-        
-        # Set alpha 2 to joint value that is closest to previous
-        if(delta2_1 < delta2_2) and ((alpha2_1 > 60) and (alpha2_1 < 150)):
+
+        if (self._delta(alpha2_1, self.prevAlpha2) < self._delta(alpha2_2, self.prevAlpha2)) \
+            and ((alpha2_1 > 60) and (alpha2_1 < 150)):
             self.alpha2 = alpha2_1
         else:
             self.alpha2 = alpha2_2
-        
-        # Joint 3
-        q3x = self.l3[0] -self.P[0] - self.c3[0]*math.cos(math.radians(self.theta))\
-              + self.c3[1]*math.sin(math.radians(self.theta))
-        
-        q3y = self.l3[1] -self.P[1] - self.c3[0]*math.sin(math.radians(self.theta))\
-              - self.c3[1]*math.cos(math.radians(self.theta))
-        
-        Q3 = (self.b3**2 - self.a3**2 - q3x**2 -q3y**2)/(2*self.a3)
-        
-        denom3 = (q3x**2 + q3y**2)**0.5
-        
-        if self.dbg_Flag:
-            print("q3x = ", q3x)
-            print("q3y = ", q3y)
-            print("Q3 = ", Q3)
-            
-        omega3 = math.degrees(math.atan2(q3x/denom3, q3y/denom3))
-        
-        if self.dbg_Flag:
-            print("Omega3 = ", omega3)
-            
-        alf3 = math.degrees(math.asin(Q3/denom3))
-        
-        alpha3_1 = alf3 - omega3
-        alpha3_2 = (180-alf3) - omega3
-        
-        # Adjust joint options so angle is always between 0 and 360
-        while (alpha3_1 < 0) or (alpha3_1 >= 360):
-            if alpha3_1 < 0:
-                alpha3_1 += 360
-            elif alpha3_1 >= 360:
-                alpha3_1 -= 360
-        
-        while (alpha3_2 < 0) or (alpha3_2 >= 360):
-            if alpha3_2 < 0:
-                alpha3_2 += 360
-            elif alpha3_2 >= 360:
-                alpha3_2 -= 360
-                
-        if self.dbg_Flag:
-            print("Alpha3, option 1 = ", alpha3_1)
-            print("Alpha3, option 2 = ", alpha3_2)
-            
-        # Determine correct 'delta' values
-        delta3_1 = abs(alpha3_1-self.prevAlpha3)
-        
-        if delta3_1 > 180:
-            delta3_1 = abs(alpha3_1-self.prevAlpha3-360)
-        
-        delta3_2 = abs(alpha3_2-self.prevAlpha3)
-        
-        if delta3_2 > 180:
-            delta3_2 = abs(alpha3_2-self.prevAlpha3-360)
-        
-        # Set alpha 2 to joint value that is closest to previous
-        if(delta3_1 < delta3_2) and ((alpha3_1 > 180) and (alpha3_2 < 270)):
+
+        if (self._delta(alpha3_1, self.prevAlpha3) < self._delta(alpha3_2, self.prevAlpha3)) \
+            and ((alpha3_1 > 180) and (alpha3_2 < 270)):
             self.alpha3 = alpha3_1
         else:
             self.alpha3 = alpha3_2
-        
+
+    def _options_many(self, l, a, b, c, xs, ys, cos_th, sin_th):
+        '''!
+        @brief          Computes both joint options of one leg for many poses
+        @param l        The (x, y) location of the leg's driven joint
+        @param a        The length of the leg's driven arm
+        @param b        The length of the leg's passive arm
+        @param c        The (x, y) location of the leg's platform attachment point
+        @param xs       An array of platform x-coordinates
+        @param ys       An array of platform y-coordinates
+        @param cos_th   An array holding the cosine of each platform orientation
+        @param sin_th   An array holding the sine of each platform orientation
+        @return         A tuple of two arrays with both joint options in degrees,
+                        each wrapped to [0, 360)
+        '''
+
+        qx = l[0] - xs - c[0]*cos_th + c[1]*sin_th
+        qy = l[1] - ys - c[0]*sin_th - c[1]*cos_th
+
+        q_sq = qx*qx + qy*qy
+        Q = (b**2 - a**2 - q_sq)/(2*a)
+
+        omega = np.arctan2(qx, qy)*(180/math.pi)
+        alf = np.arcsin(Q/np.sqrt(q_sq))*(180/math.pi)
+
+        option1 = alf - omega
+        option2 = (180 - alf) - omega
+
+        # Adjust joint options so angle is always between 0 and 360. Rounding
+        # makes the remainder of a tiny negative angle 360, which is 0
+        option1 = np.mod(option1, 360.0)
+        option2 = np.mod(option2, 360.0)
+        option1 = np.where(option1 >= 360.0, 0.0, option1)
+        option2 = np.where(option2 >= 360.0, 0.0, option2)
+
+        return option1, option2
+
+    def _pick_many(self, option1, option2, in_range, prev):
+        '''!
+        @brief          Chooses one of two joint options for every pose of a stroke
+        @details        Applies the rule of _select_options to each pose: option 1
+                        is chosen if it is closer to the previous joint value and
+                        in_range, otherwise option 2. The previous joint value is
+                        one of the two options of the pose before, so the choice
+                        of each pose is found for both of them with array math.
+                        That makes each pose a map from the choice before to its
+                        own choice, and the maps are chained along the stroke by
+                        doubling the span they cover on each pass, so the whole
+                        stroke takes log2(n) passes of array math. Unreachable
+                        poses are skipped over by first filling them with the
+                        options of the pose before in the same way.
+        @param option1  An array of the first option of the joint in degrees
+        @param option2  An array of the second option of the joint in degrees
+        @param in_range An array which is true where option 1 may be chosen
+        @param prev     The joint value before the first pose in degrees
+        @return         An array of the chosen joint values in degrees, nan for
+                        poses that can't be reached
+        '''
+
+        n = len(option1)
+        if n == 0:
+            return np.zeros(0)
+
+        # Options of each pose, after the previous joint value as pose -1.
+        # Unreachable options are nan, which is not equal to itself
+        before1 = np.zeros(n + 1) + prev
+        before2 = np.zeros(n + 1) + prev
+        before1[1:] = option1
+        before2[1:] = option2
+        reach = before1[1:] == before1[1:]
+
+        # Fill unreachable poses with the options of the last reachable one
+        step = 1
+        while step <= n:
+            gap = before1[step:] != before1[step:]
+            before1[step:] = np.where(gap, before1[:-step], before1[step:])
+            before2[step:] = np.where(gap, before2[:-step], before2[step:])
+            step *= 2
+
+        # 1 where each pose chooses option 1 if the pose before chose option 1
+        # (if_first) or option 2 (if_second). Unreachable poses keep the choice
+        # of the pose before
+        if_first = np.where(in_range * (self._delta_many(option1, before1[:-1])
+                                        < self._delta_many(option2, before1[:-1])), 1.0, 0.0)
+        if_second = np.where(in_range * (self._delta_many(option1, before2[:-1])
+                                         < self._delta_many(option2, before2[:-1])), 1.0, 0.0)
+        if_first = np.where(reach, if_first, 1.0)
+        if_second = np.where(reach, if_second, 0.0)
+
+        # Chain the choices. After each pass every pose holds its choice given
+        # the choice before a span twice as long as before. The first pose
+        # doesn't depend on the pose before, so in the end neither does any
+        step = 1
+        while step < n:
+            chained_first = np.where(if_first[:-step] == 1.0, if_first[step:], if_second[step:])
+            chained_second = np.where(if_second[:-step] == 1.0, if_first[step:], if_second[step:])
+            if_first[step:] = chained_first
+            if_second[step:] = chained_second
+            step *= 2
+
+        return np.where(if_first == 1.0, option1, option2)
+
+    @staticmethod
+    def _delta_many(alpha, prev):
+        '''!
+        @brief          Returns _delta() of arrays of joint options
+        @param alpha    An array of joint options in degrees
+        @param prev     An array of previous joint values in degrees
+        '''
+
+        delta = abs(alpha - prev)
+        return np.where(delta > 180, abs(alpha - prev - 360), delta)
+
+    @staticmethod
+    def _delta(alpha, prev):
+        '''!
+        @brief          Returns the angular distance between a joint option and
+                        the previous joint value, as used for option selection
+        @param alpha    A joint option in degrees
+        @param prev     The previous joint value in degrees
+        '''
+
+        delta = abs(alpha - prev)
+        if delta > 180:
+            delta = abs(alpha - prev - 360)
+        return delta
+
     def get_alpha1(self):
         '''!
         @brief Returns the value (in degrees) of alpha1 (angle of joint 1)
@@ -421,6 +637,31 @@ if __name__ == "__main__":
     print("Alpha 2 = ", myRoboBrain.get_alpha2())
     print("Alpha 3 = ", myRoboBrain.get_alpha3())
     
+    myRoboBrain.dbg_Flag = False
+    alphas1, alphas2, alphas3 = myRoboBrain.solve_many([7, 7.5, 8], [5, 5, 5], 0)
+    print("After solving the stroke (7, 5) -> (8, 5) at theta = 0 degrees")
+    print("Alpha 1 = ", alphas1)
+    print("Alpha 2 = ", alphas2)
+    print("Alpha 3 = ", alphas3)
     
+    x, y, theta, converged = myRoboBrain.forward(myRoboBrain.get_alpha1(),
+                                                 myRoboBrain.get_alpha2(),
+                                                 myRoboBrain.get_alpha3())
+    print("Forward kinematics of the last joint angles:", x, y, theta, converged)
     
-    
\ No newline at end of file
+    # Time forward kinematics while following a stroke, as at the control rate
+    import utime
+    worst = 0
+    total = 0
+    count = 0
+    for n in range(100):
+        myRoboBrain.update_joints(7 + 0.01*n, 5, 0)
+        start = utime.ticks_us()
+        myRoboBrain.forward(myRoboBrain.alpha1, myRoboBrain.alpha2,
+                            myRoboBrain.alpha3)
+        duration = utime.ticks_diff(utime.ticks_us(), start)
+        worst = max(worst, duration)
+        total += duration
+        count += 1
+    print("Forward kinematics: {:d} us average, {:d} us worst".format(
+          total//count, worst))
@@ -0,0 +1,46 @@
+'''!
+@file       roboGeometry.py
+@brief      Holds the measured geometry of the 3 RRR robot
+@details    Keeps the joint locations, link lengths, and platform attachment
+            points in one place so the board code and the tools run on a PC
+            build their RoboBrain objects from the same numbers
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+import RoboBrain
+
+## Location (x, y) of joint 1 in inches
+JOINT1 = [0, 0]
+## Location (x, y) of joint 2 in inches
+JOINT2 = [17.75, 0]
+## Location (x, y) of joint 3 in inches
+JOINT3 = [8.875, 15.375]
+
+## Length of the driven arms in inches
+A_LENGTH = 7.25
+## Length of the passive arms in inches
+B_LENGTH = 7.25
+
+## Platform attachment points relative to the platform center in inches
+C1 = [-1.985, -1.089]
+C2 = [1.829, -1.089]
+C3 = [-0.244, 2.144]
+
+## Center of the touchpad drawing area in robot coordinates, inches
+DRAW_CENTER = [8.875, 5.124]
+## Half width and half height of the touchpad drawing area in inches
+DRAW_HALF_SIZE = [5.75, 4.0]
+
+
+def make_brain(**kwargs):
+    '''!
+    @brief          Creates a RoboBrain object with the robot geometry
+    @param kwargs   Extra keyword arguments passed on to the RoboBrain constructor
+    @return         A new RoboBrain object
+    '''
+    return RoboBrain.RoboBrain(list(JOINT1), list(JOINT2), list(JOINT3),
+                               A_LENGTH, B_LENGTH, list(C1), list(C2), list(C3),
+                               **kwargs)
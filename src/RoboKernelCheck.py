@@ -0,0 +1,170 @@
+'''!
+@file       roboKernelCheck.py
+@brief      Checks the inverse kinematics kernels against the reference on a PC
+@details    Sweeps a grid of platform poses covering the workspace and compares
+            the joint options from each kernel in roboKernels.py with the
+            original closed form solution. Every kernel must agree on which
+            poses can be reached. The viper kernel works in fixed point, so its
+            angles are only compared where the solution is well conditioned:
+            away from poses where an arm is nearly straight or a platform
+            attachment point sits almost on top of its driven joint. A drawing
+            path is then run through a RoboBrain using each kernel to make sure
+            they all pick the same joint options. The script exits with a
+            nonzero status if any check fails.
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+import math
+import sys
+
+import HostShim
+HostShim.install()
+
+import RoboGeometry
+import RoboKernels
+import RoboWorkspace
+
+## Allowed angular error of each kernel in degrees
+TOLERANCE = {'native' : 1e-9,
+             'viper'  : 0.1}
+
+## Kernels compared only where the solution is well conditioned
+FIXED_POINT = ('viper',)
+
+## Smallest allowed 1 - |sin(alf)| for a pose to count as well conditioned
+MIN_REACH_MARGIN = RoboWorkspace.MIN_MARGIN
+
+## Smallest allowed distance in inches between an attachment point and its joint
+MIN_Q = RoboWorkspace.MIN_Q
+
+## Platform orientations swept, in degrees
+THETAS = (-20, 0, 20)
+
+## Grid spacing of the sweep in inches
+STEP = 0.2
+
+
+def _angle_diff(a, b):
+    '''!
+    @brief      Finds the smallest difference between two angles
+    @param a    The first angle in degrees
+    @param b    The second angle in degrees
+    @return     The absolute difference in degrees, between 0 and 180
+    '''
+    diff = abs(a - b) % 360
+    return min(diff, 360 - diff)
+
+
+def _solve(kernel, brain, x, y, theta):
+    '''!
+    @brief      Runs a kernel, returning None for poses that can't be reached
+    '''
+    try:
+        return kernel(brain, x, y, theta)
+    except ValueError:
+        return None
+
+
+def check_sweep(brain, name):
+    '''!
+    @brief          Compares one kernel with the reference over the workspace
+    @param brain    The RoboBrain object holding the robot geometry
+    @param name     The name of the kernel to check
+    @return         A tuple (worst, failures, checked) of the worst angular
+                    error in degrees, the number of failed poses, and the
+                    number of poses compared
+    '''
+    kernel = RoboKernels.KERNELS[name]
+    tol = TOLERANCE[name]
+    worst = 0
+    failures = 0
+    checked = 0
+
+    for theta in THETAS:
+        for i in range(int(17.75/STEP) + 1):
+            for j in range(int(15.375/STEP) + 1):
+                x = i*STEP
+                y = j*STEP
+                margin, q_min = RoboWorkspace.reach_margin(brain, x, y, theta)
+                conditioned = margin > MIN_REACH_MARGIN and q_min > MIN_Q
+
+                ref = _solve(RoboKernels.reference, brain, x, y, theta)
+                options = _solve(kernel, brain, x, y, theta)
+
+                if (ref is None) != (options is None):
+                    # Rounding can only move the edge of the workspace a hair
+                    if name in FIXED_POINT and margin < 1e-3:
+                        continue
+                    print("{:s}: reach differs at ({:.2f}, {:.2f}, {:d})".format(
+                          name, x, y, theta))
+                    failures += 1
+                    continue
+                if ref is None:
+                    continue
+                if name in FIXED_POINT and not conditioned:
+                    continue
+
+                err = max(_angle_diff(a, b) for a, b in zip(ref, options))
+                worst = max(worst, err)
+                checked += 1
+                if err > tol:
+                    print("{:s}: {:.4f} deg off at ({:.2f}, {:.2f}, {:d})".format(
+                          name, err, x, y, theta))
+                    failures += 1
+
+    return worst, failures, checked
+
+
+def check_path(name):
+    '''!
+    @brief          Runs a drawing path through RoboBrains using the reference
+                    and another kernel and compares the chosen joint angles
+    @param name     The name of the kernel to check
+    @return         A tuple (worst, flips) of the worst angular difference in
+                    degrees and the number of poses where a different option
+                    was chosen
+    '''
+    ref = RoboGeometry.make_brain()
+    other = RoboGeometry.make_brain(kernel = name)
+    cx, cy = RoboGeometry.DRAW_CENTER
+    hx, hy = RoboGeometry.DRAW_HALF_SIZE
+    worst = 0
+    flips = 0
+
+    for n in range(720):
+        t = n*math.pi/180
+        x = cx + 0.8*hx*math.sin(3*t)
+        y = cy + 0.8*hy*math.sin(2*t)
+        ref.update_joints(x, y, 0)
+        other.update_joints(x, y, 0)
+        err = max(_angle_diff(ref.alpha1, other.alpha1),
+                  _angle_diff(ref.alpha2, other.alpha2),
+                  _angle_diff(ref.alpha3, other.alpha3))
+        worst = max(worst, err)
+        if err > 1:
+            flips += 1
+
+    return worst, flips
+
+
+if __name__ == "__main__":
+    myRoboBrain = RoboGeometry.make_brain()
+    failed = False
+
+    for name in TOLERANCE:
+        worst, failures, checked = check_sweep(myRoboBrain, name)
+        print("{:s}: {:d} poses, worst error {:.6f} deg, {:d} failures".format(
+              name, checked, worst, failures))
+        worst, flips = check_path(name)
+        print("{:s}: path worst difference {:.6f} deg, {:d} option flips".format(
+              name, worst, flips))
+        if failures or flips or worst > TOLERANCE[name]:
+            failed = True
+
+    if failed:
+        print("Kernel check FAILED")
+        sys.exit(1)
+    print("Kernel check passed")
@@ -0,0 +1,475 @@
+'''!
+@file       roboKernels.py
+@brief      Interchangeable inverse kinematics kernels for the RoboBrain
+@details    Each kernel computes both options for each of the three joints of
+            the 3 RRR robot for one pose of the platform. RoboBrain then picks
+            one option for each joint, so every kernel gives the same joint
+            choices. Three kernels are available:
+            - @c reference is the original closed form solution, one joint at a
+              time, which prints every step when the RoboBrain's dbg_Flag is set
+            - @c native computes the orientation terms once for all three
+              joints and is compiled with the MicroPython native emitter
+            - @c viper solves each joint in fixed point integer math (CORDIC
+              arctangents and integer square roots) with the viper emitter
+
+            With dbg_Flag set, the other kernels print the joint options they
+            found in the same form as the reference.
+
+            Kernels are chosen by name when a RoboBrain is created:
+            @code
+            myRoboBrain = RoboBrain.RoboBrain(..., kernel = 'native')
+            @endcode
+            The kernels are checked against the reference on a PC with
+            roboKernelCheck.py.
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+import array
+import math
+import micropython
+
+
+def reference(brain, x, y, theta):
+    '''!
+    @brief          Computes the joint options with the original equations
+    @details        Uses inverse kinematic equations derived from Introduction
+                    to Robotics: Analysis, Control, Application 3rd Ed by
+                    Saeed B. Niku. Raises a ValueError if the pose can't be
+                    reached.
+    @param brain    The RoboBrain object holding the robot geometry
+    @param x        The x-coordinate of the platform
+    @param y        The y-coordinate of the platform
+    @param theta    The orientation of the platform in degrees
+    @return         A tuple (alpha1_1, alpha1_2, alpha2_1, alpha2_2, alpha3_1,
+                    alpha3_2) of joint options in degrees, each in [0, 360)
+    '''
+
+    # Joint 1
+    q1x = brain.l1[0] - x - brain.c1[0]*math.cos(math.radians(theta))\
+          + brain.c1[1]*math.sin(math.radians(theta))
+
+    q1y = brain.l1[1] - y - brain.c1[0]*math.sin(math.radians(theta))\
+          - brain.c1[1]*math.cos(math.radians(theta))
+
+    Q1 = (brain.b1**2 - brain.a1**2 - q1x**2 -q1y**2)/(2*brain.a1)
+
+    denom = (q1x**2 + q1y**2)**0.5
+
+    if brain.dbg_Flag:
+        print("q1x = ", q1x)
+        print("q1y = ", q1y)
+        print("Q1 = ", Q1)
+
+    omega = math.degrees(math.atan2(q1x/denom, q1y/denom))
+
+    if brain.dbg_Flag:
+        print("Omega = ", omega)
+
+    alf = math.degrees(math.asin(Q1/denom))
+
+    alpha1_1 = alf - omega
+    alpha1_2 = (180-alf) - omega
+
+    # Adjust joint options so angle is always between 0 and 360
+    while (alpha1_1 < 0) or (alpha1_1 >= 360):
+        if alpha1_1 < 0:
+            alpha1_1 += 360
+        elif alpha1_1 >= 360:
+            alpha1_1 -= 360
+
+    while (alpha1_2 < 0) or (alpha1_2 >= 360):
+        if alpha1_2 < 0:
+            alpha1_2 += 360
+        elif alpha1_2 >= 360:
+            alpha1_2 -= 360
+
+    if brain.dbg_Flag:
+        print("Alpha1, option 1 = ", alpha1_1)
+        print("Alpha1, option 2 = ", alpha1_2)
+
+    # Joint 2
+    q2x = brain.l2[0] - x - brain.c2[0]*math.cos(math.radians(theta))\
+          + brain.c2[1]*math.sin(math.radians(theta))
+
+    q2y = brain.l2[1] - y - brain.c2[0]*math.sin(math.radians(theta))\
+          - brain.c2[1]*math.cos(math.radians(theta))
+
+    Q2 = (brain.b2**2 - brain.a2**2 - q2x**2 -q2y**2)/(2*brain.a2)
+
+    denom2 = (q2x**2 + q2y**2)**0.5
+
+    if brain.dbg_Flag:
+        print("q2x = ", q2x)
+        print("q2y = ", q2y)
+        print("Q2 = ", Q2)
+
+    omega2 = math.degrees(math.atan2(q2x/denom2, q2y/denom2))
+
+    if brain.dbg_Flag:
+        print("Omega2 = ", omega2)
+
+    alf2 = math.degrees(math.asin(Q2/denom2))
+
+    alpha2_1 = alf2 - omega2
+    alpha2_2 = (180-alf2) - omega2
+
+    # Adjust joint options so angle is always between 0 and 360
+    while (alpha2_1 < 0) or (alpha2_1 >= 360):
+        if alpha2_1 < 0:
+            alpha2_1 += 360
+        elif alpha2_1 >= 360:
+            alpha2_1 -= 360
+
+    while (alpha2_2 < 0) or (alpha2_2 >= 360):
+        if alpha2_2 < 0:
+            alpha2_2 += 360
+        elif alpha2_2 >= 360:
+            alpha2_2 -= 360
+
+    if brain.dbg_Flag:
+        print("Alpha2, option 1 = ", alpha2_1)
+        print("Alpha2, option 2 = ", alpha2_2)
+
+    # Joint 3
+    q3x = brain.l3[0] - x - brain.c3[0]*math.cos(math.radians(theta))\
+          + brain.c3[1]*math.sin(math.radians(theta))
+
+    q3y = brain.l3[1] - y - brain.c3[0]*math.sin(math.radians(theta))\
+          - brain.c3[1]*math.cos(math.radians(theta))
+
+    Q3 = (brain.b3**2 - brain.a3**2 - q3x**2 -q3y**2)/(2*brain.a3)
+
+    denom3 = (q3x**2 + q3y**2)**0.5
+
+    if brain.dbg_Flag:
+        print("q3x = ", q3x)
+        print("q3y = ", q3y)
+        print("Q3 = ", Q3)
+
+    omega3 = math.degrees(math.atan2(q3x/denom3, q3y/denom3))
+
+    if brain.dbg_Flag:
+        print("Omega3 = ", omega3)
+
+    alf3 = math.degrees(math.asin(Q3/denom3))
+
+    alpha3_1 = alf3 - omega3
+    alpha3_2 = (180-alf3) - omega3
+
+    # Adjust joint options so angle is always between 0 and 360
+    while (alpha3_1 < 0) or (alpha3_1 >= 360):
+        if alpha3_1 < 0:
+            alpha3_1 += 360
+        elif alpha3_1 >= 360:
+            alpha3_1 -= 360
+
+    while (alpha3_2 < 0) or (alpha3_2 >= 360):
+        if alpha3_2 < 0:
+            alpha3_2 += 360
+        elif alpha3_2 >= 360:
+            alpha3_2 -= 360
+
+    if brain.dbg_Flag:
+        print("Alpha3, option 1 = ", alpha3_1)
+        print("Alpha3, option 2 = ", alpha3_2)
+
+    return (alpha1_1, alpha1_2, alpha2_1, alpha2_2, alpha3_1, alpha3_2)
+
+
+@micropython.native
+def native(brain, x, y, theta):
+    '''!
+    @brief          Computes the joint options with shared terms computed once
+    @details        The sine and cosine of the orientation are found once for all
+                    three joints, the atan2() and asin() arguments aren't
+                    normalized (atan2() doesn't need it), and angles are wrapped
+                    with a single test instead of a loop. Raises a ValueError if
+                    the pose can't be reached.
+    @param brain    The RoboBrain object holding the robot geometry
+    @param x        The x-coordinate of the platform
+    @param y        The y-coordinate of the platform
+    @param theta    The orientation of the platform in degrees
+    @return         A tuple (alpha1_1, alpha1_2, alpha2_1, alpha2_2, alpha3_1,
+                    alpha3_2) of joint options in degrees, each in [0, 360)
+    '''
+    rad = theta*0.017453292519943295
+    cos_th = math.cos(rad)
+    sin_th = math.sin(rad)
+
+    # Joint 1
+    cx = brain.c1[0]
+    cy = brain.c1[1]
+    qx = brain.l1[0] - x - cx*cos_th + cy*sin_th
+    qy = brain.l1[1] - y - cx*sin_th - cy*cos_th
+    q_sq = qx*qx + qy*qy
+    a = brain.a1
+    b = brain.b1
+    omega = math.atan2(qx, qy)*57.29577951308232
+    alf = math.asin((b*b - a*a - q_sq)/(2*a*math.sqrt(q_sq)))*57.29577951308232
+
+    alpha1_1 = alf - omega
+    if alpha1_1 < 0:
+        alpha1_1 += 360
+    alpha1_2 = 180 - alf - omega
+    if alpha1_2 < 0:
+        alpha1_2 += 360
+    elif alpha1_2 >= 360:
+        alpha1_2 -= 360
+
+    # Joint 2
+    cx = brain.c2[0]
+    cy = brain.c2[1]
+    qx = brain.l2[0] - x - cx*cos_th + cy*sin_th
+    qy = brain.l2[1] - y - cx*sin_th - cy*cos_th
+    q_sq = qx*qx + qy*qy
+    a = brain.a2
+    b = brain.b2
+    omega = math.atan2(qx, qy)*57.29577951308232
+    alf = math.asin((b*b - a*a - q_sq)/(2*a*math.sqrt(q_sq)))*57.29577951308232
+
+    alpha2_1 = alf - omega
+    if alpha2_1 < 0:
+        alpha2_1 += 360
+    alpha2_2 = 180 - alf - omega
+    if alpha2_2 < 0:
+        alpha2_2 += 360
+    elif alpha2_2 >= 360:
+        alpha2_2 -= 360
+
+    # Joint 3
+    cx = brain.c3[0]
+    cy = brain.c3[1]
+    qx = brain.l3[0] - x - cx*cos_th + cy*sin_th
+    qy = brain.l3[1] - y - cx*sin_th - cy*cos_th
+    q_sq = qx*qx + qy*qy
+    a = brain.a3
+    b = brain.b3
+    omega = math.atan2(qx, qy)*57.29577951308232
+    alf = math.asin((b*b - a*a - q_sq)/(2*a*math.sqrt(q_sq)))*57.29577951308232
+
+    alpha3_1 = alf - omega
+    if alpha3_1 < 0:
+        alpha3_1 += 360
+    alpha3_2 = 180 - alf - omega
+    if alpha3_2 < 0:
+        alpha3_2 += 360
+    elif alpha3_2 >= 360:
+        alpha3_2 -= 360
+
+    options = (alpha1_1, alpha1_2, alpha2_1, alpha2_2, alpha3_1, alpha3_2)
+    if brain.dbg_Flag:
+        _print_options(options)
+    return options
+
+
+def _print_options(options):
+    '''!
+    @brief          Prints joint options as the reference kernel does in debug mode
+    @param options  A tuple (alpha1_1, alpha1_2, alpha2_1, alpha2_2, alpha3_1,
+                    alpha3_2) of joint options in degrees
+    '''
+    for n in range(3):
+        print("Alpha" + str(n + 1) + ", option 1 = ", options[2*n])
+        print("Alpha" + str(n + 1) + ", option 2 = ", options[2*n + 1])
+
+
+## Fixed point scale of lengths, 1/1024 inch
+_LEN_ONE = 1024
+
+## Fixed point scale of angles, 1/65536 degree
+_DEG_ONE = 65536
+
+## Number of CORDIC iterations used for each arctangent
+_CORDIC_STEPS = 20
+
+## Arctangents of 2^-i in fixed point degrees, used by the CORDIC iterations
+_atan_tab = array.array('i', [int(round(math.degrees(math.atan(2.0**-i))*_DEG_ONE))
+                              for i in range(_CORDIC_STEPS)])
+
+## Preallocated exchange buffer for the viper kernel. For each joint: qx, qy,
+#  b^2 - a^2, and 2a in, then both options out
+_io = array.array('i', [0]*18)
+
+
+@micropython.viper
+def _cordic_atan2(y: int, x: int, tab: ptr32) -> int:
+    '''!
+    @brief      Fixed point arctangent of y/x with CORDIC vectoring
+    @param y    The y component of the vector
+    @param x    The x component of the vector
+    @param tab  The table of arctangents of 2^-i in fixed point degrees
+    @return     The angle of the vector in 1/65536 degree, between -180 and 180
+    '''
+    z = 0
+
+    # Rotate into the right half plane first
+    if x < 0:
+        if y < 0:
+            z = -180*65536
+        else:
+            z = 180*65536
+        x = -x
+        y = -y
+
+    if x == 0 and y == 0:
+        return 0
+
+    # Scale small vectors up so the iterations keep their resolution
+    while x < 4194304 and y < 4194304 and y > -4194304:
+        x = x << 1
+        y = y << 1
+
+    i = 0
+    while i < 20:
+        if y > 0:
+            x_new = x + (y >> i)
+            y = y - (x >> i)
+            z = z + tab[i]
+        else:
+            x_new = x - (y >> i)
+            y = y + (x >> i)
+            z = z - tab[i]
+        x = x_new
+        i += 1
+    return z
+
+
+@micropython.viper
+def _isqrt(n: int) -> int:
+    '''!
+    @brief      Integer square root, rounded down
+    @param n    An integer below 2^30, treated as 0 if negative
+    '''
+    if n <= 0:
+        return 0
+    root = 0
+    bit = 1 << 28
+    while bit > n:
+        bit = bit >> 2
+    while bit != 0:
+        if n >= root + bit:
+            n = n - (root + bit)
+            root = (root >> 1) + bit
+        else:
+            root = root >> 1
+        bit = bit >> 2
+    return root
+
+
+@micropython.viper
+def _viper_legs(io: ptr32) -> int:
+    '''!
+    @brief      Solves both options of each joint in fixed point
+    @details    Reads qx, qy (1/1024 inch), b^2 - a^2 (1/2^20 square inch), and
+                2a (1/1024 inch) for each joint from the exchange buffer and
+                writes both joint options back in 1/65536 degree, in [0, 360).
+    @param io   The exchange buffer
+    @return     0 if every joint was solved or 1 if the pose can't be reached
+    '''
+    full = 360*65536
+    leg = 0
+    while leg < 3:
+        base = leg*6
+        qx = io[base]
+        qy = io[base + 1]
+
+        # Both arms together are far shorter than 16 inches, so anything
+        # longer can't be reached and would overflow the squares below
+        if qx >= 16384 or qx <= -16384 or qy >= 16384 or qy <= -16384:
+            return 1
+
+        # sin(alf) = num/den with both in 1/2^20 square inch
+        q_sq = qx*qx + qy*qy
+        num = io[base + 2] - q_sq
+        den = io[base + 3]*int(_isqrt(q_sq))
+        if num > den or num < -den or den == 0:
+            return 1
+
+        # cos(alf) from the difference of squares, scaled to avoid overflow
+        while den >= 32768:
+            den = den >> 1
+            num = num >> 1
+        cos_alf = int(_isqrt((den - num)*(den + num)))
+
+        alf = int(_cordic_atan2(num, cos_alf, _atan_tab))
+        omega = int(_cordic_atan2(qx, qy, _atan_tab))
+
+        option1 = alf - omega
+        if option1 < 0:
+            option1 += full
+        elif option1 >= full:
+            option1 -= full
+        option2 = 180*65536 - alf - omega
+        if option2 < 0:
+            option2 += full
+        elif option2 >= full:
+            option2 -= full
+
+        io[base + 4] = option1
+        io[base + 5] = option2
+        leg += 1
+    return 0
+
+
+@micropython.native
+def viper(brain, x, y, theta):
+    '''!
+    @brief          Computes the joint options in fixed point
+    @details        Finds the vector from each platform attachment point to its
+                    driven joint in floating point, then hands the rest of the
+                    solution to a viper function working in integers. Results
+                    are within a tenth of a degree of the reference unless an
+                    arm is nearly straight or a platform attachment point is
+                    within half an inch of its driven joint. Raises a
+                    ValueError if the pose can't be reached.
+    @param brain    The RoboBrain object holding the robot geometry
+    @param x        The x-coordinate of the platform
+    @param y        The y-coordinate of the platform
+    @param theta    The orientation of the platform in degrees
+    @return         A tuple (alpha1_1, alpha1_2, alpha2_1, alpha2_2, alpha3_1,
+                    alpha3_2) of joint options in degrees, each in [0, 360)
+    '''
+    io = _io
+    rad = theta*0.017453292519943295
+    cos_th = math.cos(rad)
+    sin_th = math.sin(rad)
+
+    l = brain.l1
+    c = brain.c1
+    io[0] = round((l[0] - x - c[0]*cos_th + c[1]*sin_th)*_LEN_ONE)
+    io[1] = round((l[1] - y - c[0]*sin_th - c[1]*cos_th)*_LEN_ONE)
+    io[2] = int((brain.b1*brain.b1 - brain.a1*brain.a1)*_LEN_ONE*_LEN_ONE)
+    io[3] = int(2*brain.a1*_LEN_ONE)
+
+    l = brain.l2
+    c = brain.c2
+    io[6] = round((l[0] - x - c[0]*cos_th + c[1]*sin_th)*_LEN_ONE)
+    io[7] = round((l[1] - y - c[0]*sin_th - c[1]*cos_th)*_LEN_ONE)
+    io[8] = int((brain.b2*brain.b2 - brain.a2*brain.a2)*_LEN_ONE*_LEN_ONE)
+    io[9] = int(2*brain.a2*_LEN_ONE)
+
+    l = brain.l3
+    c = brain.c3
+    io[12] = round((l[0] - x - c[0]*cos_th + c[1]*sin_th)*_LEN_ONE)
+    io[13] = round((l[1] - y - c[0]*sin_th - c[1]*cos_th)*_LEN_ONE)
+    io[14] = int((brain.b3*brain.b3 - brain.a3*brain.a3)*_LEN_ONE*_LEN_ONE)
+    io[15] = int(2*brain.a3*_LEN_ONE)
+
+    if _viper_legs(io):
+        raise ValueError("pose out of reach")
+
+    scale = 1/_DEG_ONE
+    options = (io[4]*scale, io[5]*scale, io[10]*scale, io[11]*scale,
+               io[16]*scale, io[17]*scale)
+    if brain.dbg_Flag:
+        _print_options(options)
+    return options
+
+
+## Kernels by name, as accepted by the RoboBrain constructor
+KERNELS = {'reference' : reference,
+           'native'    : native,
+           'viper'     : viper}
@@ -0,0 +1,407 @@
+'''!
+@file       roboTable.py
+@brief      Table based inverse kinematics for the 3 RRR robot
+@details    Samples the drawing area once on a grid with the orientation fixed
+            at 0 degrees (as used by RoboTask) and saves both options of each
+            joint to a file. On the board, the table is loaded into compact
+            float arrays and queries are answered by bilinear interpolation.
+            RoboBrain then chooses between the options with the same rules it
+            uses for the closed form solution, so the table follows the same
+            joint options while drawing. Cells which cross an option seam, leave
+            the workspace, or interpolate poorly are flagged so RoboBrain falls
+            back on the closed form solution there. On a PC the table is no
+            faster than the native kernel (see roboBench.py), so main.py only
+            loads it when USE_IK_TABLE is set.
+
+            To build a table on a PC, run this file. It prints the worst
+            angular error of the interpolation found on a grid much finer
+            than the table, which is saved with the table:
+            @code
+            python roboTable.py
+            @endcode
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+import array
+import struct
+
+## Identifies a joint angle table file
+MAGIC = b'IKT2'
+
+## Header layout: magic, grid size in x and y, grid origin, grid step, and
+#  worst angular error of the table measured by measure_error() in degrees
+HEADER = '<4sHHffff'
+
+## Number of float blocks in a table, two options for each of three joints
+BLOCKS = 6
+
+## Cells whose corners differ by more than this many degrees (after unwrapping
+#  across 0/360) are treated as crossing a joint option seam
+SEAM_DEG = 20.0
+
+## Angles at which RoboBrain's option selection rules change their answer, for
+#  each block. Cells whose options come within EDGE_DEG of one of these are
+#  left to the closed form solver so the table never picks a different option.
+RULE_EDGES = ((0, 60, 315), (0,), (0, 60, 150), (0,), (0, 180), (0, 270))
+
+## Margin around the option selection rule edges in degrees
+EDGE_DEG = 0.5
+
+## Cells whose interpolation error is larger than this many degrees (near the
+#  edges of the workspace, where the joint angles curve sharply) are also left
+#  to the closed form solver
+TOL_DEG = 0.1
+
+## Number of parts each cell is split into in x and y when checking it against
+#  the closed form solution. Every corner of the parts is checked, so a cell
+#  is only used if it is within TOL_DEG everywhere it was sampled
+CELL_SAMPLES = 8
+
+## Spacing in inches of the grid on which the error of a finished table is
+#  measured. It is not a divisor of the table step, so the points fall at
+#  different places in each cell
+CHECK_STEP = 0.047
+
+
+class IKTable:
+    '''!
+    This class holds a grid of joint options and interpolates between them.
+    '''
+
+    def __init__ (self, nx, ny, x0, y0, step, blocks, flags, max_err=0.0):
+        '''!
+        @brief          Creates an IKTable object from grid data
+        @details        Usually created by IKTable.load() on the board or by
+                        build_table() on a PC rather than directly
+        @param nx       The number of grid points in the x direction
+        @param ny       The number of grid points in the y direction
+        @param x0       The x-coordinate of the first grid point in inches
+        @param y0       The y-coordinate of the first grid point in inches
+        @param step     The grid spacing in inches
+        @param blocks   A list of six array('f') objects holding alpha1_1,
+                        alpha1_2, alpha2_1, alpha2_2, alpha3_1, and alpha3_2 in
+                        degrees, row by row
+        @param flags    A bytearray with one entry per cell which is nonzero if
+                        the cell must be solved with the closed form solution
+        @param max_err  The worst angular error of the table in degrees, as
+                        measured by measure_error()
+        '''
+        self.nx = nx
+        self.ny = ny
+        self.x0 = x0
+        self.y0 = y0
+        self.step = step
+        self.blocks = blocks
+        self.flags = flags
+        self.max_err = max_err
+
+        # Number of lookups answered by the table and handed back to the solver
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def load(filename):
+        '''!
+        @brief          Loads a joint angle table from a file
+        @param filename The name of the table file on the board
+        @return         A new IKTable object
+        '''
+        with open(filename, 'rb') as f:
+            magic, nx, ny, x0, y0, step, max_err = struct.unpack(
+                HEADER, f.read(struct.calcsize(HEADER)))
+            if magic != MAGIC:
+                raise ValueError("Not a joint angle table: " + filename)
+
+            flags = bytearray((nx - 1)*(ny - 1))
+            f.readinto(flags)
+
+            # Read each block straight into a preallocated float array
+            blocks = []
+            for _ in range(BLOCKS):
+                block = array.array('f', bytes(4*nx*ny))
+                f.readinto(block)
+                blocks.append(block)
+
+        return IKTable(nx, ny, x0, y0, step, blocks, flags, max_err)
+
+    def save(self, filename):
+        '''!
+        @brief          Saves the joint angle table to a file
+        @param filename The name of the file to write
+        '''
+        with open(filename, 'wb') as f:
+            f.write(struct.pack(HEADER, MAGIC, self.nx, self.ny, self.x0,
+                                self.y0, self.step, self.max_err))
+            f.write(self.flags)
+            for block in self.blocks:
+                f.write(block)
+
+    def lookup(self, x, y):
+        '''!
+        @brief      Interpolates the joint options for a position
+        @details    Returns None if the position is outside of the table or
+                    inside a cell which is flagged for the closed form solver.
+        @param x    The desired x-coordinate in inches
+        @param y    The desired y-coordinate in inches
+        @return     A tuple (alpha1_1, alpha1_2, alpha2_1, alpha2_2, alpha3_1,
+                    alpha3_2) in degrees, or None
+        '''
+        fx = (x - self.x0)/self.step
+        fy = (y - self.y0)/self.step
+        i = int(fx)
+        j = int(fy)
+
+        if fx < 0 or fy < 0 or i >= self.nx - 1 or j >= self.ny - 1 \
+            or self.flags[j*(self.nx - 1) + i]:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return self.interp_cell(j*self.nx + i, fx - i, fy - j)
+
+    def interp_cell(self, k, u, v):
+        '''!
+        @brief      Interpolates all joint options inside one cell
+        @param k    The index of the cell's lower left grid point
+        @param u    The fraction of the way across the cell in x
+        @param v    The fraction of the way across the cell in y
+        @return     A tuple of the six interpolated joint options in degrees
+        '''
+        blocks = self.blocks
+        return (self._interp(blocks[0], k, u, v),
+                self._interp(blocks[1], k, u, v),
+                self._interp(blocks[2], k, u, v),
+                self._interp(blocks[3], k, u, v),
+                self._interp(blocks[4], k, u, v),
+                self._interp(blocks[5], k, u, v))
+
+    def _interp(self, block, k, u, v):
+        '''!
+        @brief          Bilinear interpolation of one joint option in one cell
+        @details        Corner values are unwrapped across 0/360 relative to
+                        the first corner, and the result is wrapped back
+        @param block    The array holding the joint option's values
+        @param k        The index of the cell's lower left grid point
+        @param u        The fraction of the way across the cell in x
+        @param v        The fraction of the way across the cell in y
+        '''
+        a00 = block[k]
+        a10 = _unwrap(block[k + 1], a00)
+        a01 = _unwrap(block[k + self.nx], a00)
+        a11 = _unwrap(block[k + self.nx + 1], a00)
+
+        alpha = (a00*(1 - u) + a10*u)*(1 - v) + (a01*(1 - u) + a11*u)*v
+
+        if alpha < 0:
+            alpha += 360
+        elif alpha >= 360:
+            alpha -= 360
+        return alpha
+
+    def __repr__(self):
+        '''!
+        @brief Puts diagnostic information about the table into a string
+        '''
+        return ('IKTable {:d}x{:d} step {:.3f} in, max err {:.4f} deg, '
+                '{:d} hits, {:d} misses'.format(self.nx, self.ny, self.step,
+                self.max_err, self.hits, self.misses))
+
+
+def _unwrap(alpha, ref):
+    '''!
+    @brief          Moves an angle by a full turn if that brings it closer to ref
+    @param alpha    The angle to unwrap in degrees
+    @param ref      The reference angle in degrees
+    '''
+    if alpha - ref > 180:
+        return alpha - 360
+    if alpha - ref < -180:
+        return alpha + 360
+    return alpha
+
+
+def _spread(a, b, c, d):
+    '''!
+    @brief      Returns how far apart the four corner values of a cell are
+    @details    Values are unwrapped across 0/360 relative to the first one.
+                A nan corner gives an infinite spread.
+    '''
+    b = _unwrap(b, a)
+    c = _unwrap(c, a)
+    d = _unwrap(d, a)
+    if a != a or b != b or c != c or d != d:
+        return float('inf')
+    return max(a, b, c, d) - min(a, b, c, d)
+
+
+def _near_edge(a, b, c, d, edges, margin):
+    '''!
+    @brief          Checks if a cell's corner values reach an option rule edge
+    @param edges    The angles at which the option selection changes
+    @param margin   The margin around each edge in degrees
+    '''
+    b = _unwrap(b, a)
+    c = _unwrap(c, a)
+    d = _unwrap(d, a)
+    low = min(a, b, c, d) - margin
+    high = max(a, b, c, d) + margin
+    for edge in edges:
+        for e in (edge - 360, edge, edge + 360):
+            if low <= e <= high:
+                return True
+    return False
+
+
+def _options(brain, x, y):
+    '''!
+    @brief          Computes the joint options for one position at theta = 0
+    @param brain    The RoboBrain object with the robot geometry
+    @param x        The x-coordinate in inches
+    @param y        The y-coordinate in inches
+    @return         A tuple of six joint options, or nan values if the position
+                    can't be reached
+    '''
+    try:
+        return brain.joint_options(x, y, 0)
+    except (ValueError, ZeroDivisionError):
+        return (float('nan'),)*BLOCKS
+
+
+def build_table(brain, x0, y0, x1, y1, step, seam_deg=SEAM_DEG,
+                tol_deg=TOL_DEG, check_step=CHECK_STEP):
+    '''!
+    @brief          Builds a joint angle table with a RoboBrain's geometry
+    @details        Solves both options of every joint at each grid point, then
+                    checks the table against the closed form solution on a
+                    grid of CELL_SAMPLES parts across every usable cell. Cells
+                    which miss by more than tol_deg anywhere are flagged. The
+                    error saved with the table is measured afterwards by
+                    measure_error() on an independent grid. Meant to be run
+                    on a PC.
+    @param brain    A RoboBrain object with the robot geometry
+    @param x0       The smallest x-coordinate of the table in inches
+    @param y0       The smallest y-coordinate of the table in inches
+    @param x1       The largest x-coordinate of the table in inches
+    @param y1       The largest y-coordinate of the table in inches
+    @param step     The grid spacing in inches
+    @param seam_deg Cells whose corners are farther apart than this are solved
+                    with the closed form solution instead
+    @param tol_deg  Cells with a larger interpolation error than this are
+                    solved with the closed form solution instead
+    @param check_step The spacing in inches of the grid the error is measured on
+    @return         A new IKTable object
+    '''
+    nx = int(round((x1 - x0)/step)) + 1
+    ny = int(round((y1 - y0)/step)) + 1
+
+    blocks = [array.array('f', bytes(4*nx*ny)) for _ in range(BLOCKS)]
+
+    for j in range(ny):
+        for i in range(nx):
+            options = _options(brain, x0 + i*step, y0 + j*step)
+            for n in range(BLOCKS):
+                blocks[n][j*nx + i] = options[n]
+
+    # Flag cells that leave the workspace, cross a joint option seam, or come
+    # close to an edge of the option selection rules
+    flags = bytearray((nx - 1)*(ny - 1))
+    for j in range(ny - 1):
+        for i in range(nx - 1):
+            k = j*nx + i
+            for n in range(BLOCKS):
+                corners = (blocks[n][k], blocks[n][k + 1], blocks[n][k + nx],
+                           blocks[n][k + nx + 1])
+                if _spread(*corners) > seam_deg \
+                    or _near_edge(*corners, RULE_EDGES[n], EDGE_DEG):
+                    flags[j*(nx - 1) + i] = 1
+                    break
+
+    table = IKTable(nx, ny, x0, y0, step, blocks, flags)
+
+    # Compare against the closed form solution inside every usable cell
+    for j in range(ny - 1):
+        for i in range(nx - 1):
+            if flags[j*(nx - 1) + i]:
+                continue
+            k = j*nx + i
+            cell_err = 0.0
+            for m in range(CELL_SAMPLES + 1):
+                for p in range(CELL_SAMPLES + 1):
+                    u = m/CELL_SAMPLES
+                    v = p/CELL_SAMPLES
+                    exact = _options(brain, x0 + (i + u)*step, y0 + (j + v)*step)
+                    approx = table.interp_cell(k, u, v)
+                    for a, b in zip(exact, approx):
+                        err = abs(_unwrap(b, a) - a)
+                        if not err <= cell_err:
+                            cell_err = err
+
+            if cell_err > tol_deg:
+                flags[j*(nx - 1) + i] = 1
+
+    table.max_err = measure_error(table, brain, check_step)
+    return table
+
+
+def measure_error(table, brain, step=CHECK_STEP):
+    '''!
+    @brief          Measures the worst angular error of a table
+    @details        Compares the table with the closed form solution at every
+                    point of a grid over the table, skipping points in cells
+                    which are flagged for the closed form solver. Meant to be
+                    run on a PC.
+    @param table    The IKTable to check
+    @param brain    A RoboBrain object with the robot geometry
+    @param step     The grid spacing in inches
+    @return         The largest difference of any joint option in degrees
+    '''
+    x1 = table.x0 + (table.nx - 1)*table.step
+    y1 = table.y0 + (table.ny - 1)*table.step
+    hits = table.hits
+    misses = table.misses
+
+    max_err = 0.0
+    y = table.y0 + step/2
+    while y < y1:
+        x = table.x0 + step/2
+        while x < x1:
+            approx = table.lookup(x, y)
+            if approx is not None:
+                exact = _options(brain, x, y)
+                for a, b in zip(exact, approx):
+                    err = abs(_unwrap(b, a) - a)
+                    if err > max_err:
+                        max_err = err
+            x += step
+        y += step
+
+    table.hits = hits
+    table.misses = misses
+    return max_err
+
+
+if __name__ == "__main__":
+    import HostShim
+    HostShim.install()
+    import RoboGeometry
+
+    myRoboBrain = RoboGeometry.make_brain()
+    cx, cy = RoboGeometry.DRAW_CENTER
+    hx, hy = RoboGeometry.DRAW_HALF_SIZE
+
+    table = build_table(myRoboBrain, cx - hx, cy - hy, cx + hx, cy + hy, 0.3)
+    table.save("ik_table.bin")
+
+    flagged = sum(1 for flag in table.flags if flag)
+    print(table)
+    print("Table size: {:d} bytes".format(BLOCKS*4*table.nx*table.ny
+                                           + len(table.flags)))
+    print("Cells solved by the closed form solver: {:d}/{:d}".format(flagged,
+          len(table.flags)))
+    print("Worst angular error on a {:.3f} in grid: {:.4f} deg".format(
+          CHECK_STEP, table.max_err))
+    if table.max_err > TOL_DEG:
+        print("The table misses by more than {:.2f} deg; use a smaller step".format(TOL_DEG))
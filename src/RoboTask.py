@@ -23,7 +23,8 @@ class RoboTask:
     This class implements a RoboBrain object to allow multitasking with the robot joints. 
     '''
     
-    def __init__ (self, ready, RoboBrain_obj, queue_x, queue_y, queue_th1, queue_th2, queue_th3):
+    def __init__ (self, ready, RoboBrain_obj, points, queue_th1, queue_th2, queue_th3,
+                  workspace=None, clamp=True, lift_idle=True, blend=None):
         '''! 
         @brief                  Creates a RoboTask object
         @details                Controls operation of the robot with a FSM machine in the
@@ -33,11 +34,22 @@ class RoboTask:
                                 down.
         @param RoboBrain_obj    A RoboBrain object which contains information about the geometry
                                 of the robot.
-        @param queue_x          The task_share.Queue corresponding to finger x value on the touchpad
-        @param queue_y          The task_share.Queue corresponding to finger y value on the touchpad
+        @param points           The task_share.RecordQueue of (x, y, pen) records of the positions
+                                to move to, with the pen state 1 to draw and 0 to move with the
+                                pen lifted
         @param queue_th1        The task_share.Queue corresponding to joint 1 theta value
         @param queue_th2        The task_share.Queue corresponding to joint 2 theta value
         @param queue_th3        The task_share.Queue corresponding to joint 3 theta value
+        @param workspace        An optional RoboWorkspace.WorkspaceIndex used to check
+                                each target before it is solved
+        @param clamp            If True, targets the workspace index marks as unsafe are
+                                moved to the nearest safe point. If False they are dropped.
+        @param lift_idle        If True, the pen is also lifted whenever no positions are
+                                waiting, as when a finger leaves the touchpad. A drawing file
+                                lifts the pen itself, so this should be False for one.
+        @param blend            An optional Blender.LookAhead used to blend the corners between
+                                positions, so the pen keeps moving through them. Without it
+                                each position is sent to the joints as soon as it arrives.
         '''
         self.ready = ready
         pinA8 = pyb.Pin(pyb.Pin.board.PA8, pyb.Pin.OUT_PP)
@@ -50,15 +62,26 @@ class RoboTask:
         # Create RoboBrain object used to calculate inverse kinematics
         self.RoboBrain = RoboBrain_obj
         
-        # Create variables to access queue of position values
-        self.x_queue = queue_x
-        self.y_queue = queue_y
+        # Create variables to access queue of position values, and a buffer
+        # to read each record into
+        self.points = points
+        self.record = [0, 0, 0]
+        self.lift_idle = lift_idle
+        self.blend = blend
         
         # Create variables to access queues of joint angle values
         self.theta1_queue = queue_th1
         self.theta2_queue = queue_th2
         self.theta3_queue = queue_th3
         
+        # Workspace index and what to do with unsafe targets
+        self.workspace = workspace
+        self.clamp = clamp
+        
+        # Number of unsafe targets which were clamped or dropped
+        self.clamped = 0
+        self.dropped = 0
+        
     def run(self):
         '''!
         @brief      Generator FSM which controls operation of the robot
@@ -73,8 +96,7 @@ class RoboTask:
             
             if state == S0_INIT:
                 # Reset all queues
-                self.x_queue.clear()
-                self.y_queue.clear()
+                self.points.clear()
                 self.theta1_queue.clear()
                 self.theta2_queue.clear()
                 self.theta3_queue.clear()
@@ -84,25 +106,23 @@ class RoboTask:
                 if self.ready.get() == 0:
                     self.solenoid.push_down()
                     print("Stop supplying power to solenoid")
+                elif self.blend is not None:
+                    # Fill the look-ahead buffer, then take one step along the blended path
+                    while self.points.any() and not self.blend.full():
+                        target = self.get_target()
+                        if target is not None:
+                            self.blend.add(target[0], target[1], target[2])
+                    if self.blend.step():
+                        self.move_to(self.blend.x, self.blend.y, self.blend.pen)
+                    elif self.lift_idle:
+                        self.solenoid.pull_up()
                 # Update positions and move robot accordingly if there are positions waiting
-                elif self.x_queue.any():
-                    
-                    self.solenoid.push_down()
-                    # Inverse kinematic calculation, arbitrarily set angle to 0 degrees
-                    x = self.x_queue.get()
-                    y = self.y_queue.get()
-                    self.RoboBrain.update_joints(x, y, 0)
-                    
-                    # Update desired joint values for joint tasks
-                    self.theta1_queue.put(self.RoboBrain.get_alpha1())
-                    print("x: " + str(x) + "     y: "+ str(y))
-                    print("theta1:" + str(self.RoboBrain.get_alpha1()))
-                    self.theta2_queue.put(self.RoboBrain.get_alpha2())
-                    print("theta2:" + str(self.RoboBrain.get_alpha2()))
-                    self.theta3_queue.put(self.RoboBrain.get_alpha3())
-                    print("theta3:" + str(self.RoboBrain.get_alpha3()))
+                elif self.points.any():
+                    target = self.get_target()
+                    if target is not None:
+                        self.move_to(target[0], target[1], target[2])
                                         
-                else:
+                elif self.lift_idle:
                     # If no positions are waiting to be moved to, raise the solenoid
                     self.solenoid.pull_up()
                     #pass
@@ -111,6 +131,71 @@ class RoboTask:
             print(state)
             yield(state)
         
+    def get_target(self):
+        '''!
+        @brief      Takes the next target from the queue and checks it
+        @return     A tuple (x, y, pen) of the position to move to and the pen
+                    state, or None if the target was dropped
+        '''
+        
+        x, y, pen = self.points.get_into(self.record)
+        pen = int(pen)
+        
+        # Check the target before paying for the solution
+        target = self.check_target(x, y)
+        if target is None:
+            return None
+        return target[0], target[1], pen
+        
+    def move_to(self, x, y, pen):
+        '''!
+        @brief      Moves the pen and sends the joint angles of a position to the joint tasks
+        @param x    The x-coordinate to move to
+        @param y    The y-coordinate to move to
+        @param pen  1 to draw, 0 to move with the pen lifted
+        '''
+        
+        if pen:
+            self.solenoid.push_down()
+        else:
+            self.solenoid.pull_up()
+        # Inverse kinematic calculation, arbitrarily set angle to 0 degrees
+        self.RoboBrain.update_joints(x, y, 0)
+        
+        # Update desired joint values for joint tasks
+        self.theta1_queue.put(self.RoboBrain.get_alpha1())
+        print("x: " + str(x) + "     y: "+ str(y))
+        print("theta1:" + str(self.RoboBrain.get_alpha1()))
+        self.theta2_queue.put(self.RoboBrain.get_alpha2())
+        print("theta2:" + str(self.RoboBrain.get_alpha2()))
+        self.theta3_queue.put(self.RoboBrain.get_alpha3())
+        print("theta3:" + str(self.RoboBrain.get_alpha3()))
+        
+    def check_target(self, x, y):
+        '''!
+        @brief      Checks a target against the workspace index
+        @details    Targets in unsafe cells are moved to the nearest safe point
+                    or dropped, depending on the clamp setting given when the
+                    RoboTask was created. Every target is accepted if there is
+                    no workspace index.
+        @param x    The desired x-coordinate
+        @param y    The desired y-coordinate
+        @return     A tuple (x, y) of the position to move to, or None if the
+                    target was dropped
+        '''
+        
+        if self.workspace is None or self.workspace.is_safe(x, y):
+            return x, y
+        
+        target = None
+        if self.clamp:
+            target = self.workspace.nearest_safe(x, y)
+        if target is None:
+            self.dropped += 1
+        else:
+            self.clamped += 1
+        return target
+        
 if __name__ == "__main__":
     pass
     
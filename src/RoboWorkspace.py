@@ -0,0 +1,379 @@
+'''!
+@file       roboWorkspace.py
+@brief      Precomputed reachability and conditioning index of the workspace
+@details    Samples the drawing area once on a grid with the orientation fixed
+            at 0 degrees (as used by RoboTask) and saves, for every cell, whether
+            the robot can safely reach it, how well conditioned the kinematics
+            are there, and which safe cell is nearest. A cell is safe when every
+            point checked in it can be reached with no arm nearly straight, no
+            platform attachment point nearly on top of its driven joint, and a
+            Jacobian condition number below a limit. On the board the index is
+            loaded into a bitmap and two arrays of 16 bit integers, so RoboTask
+            can check each target in constant time and clamp or drop it before
+            calling the solver.
+
+            To build an index on a PC, run this file:
+            @code
+            python roboWorkspace.py
+            @endcode
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+import array
+import math
+import struct
+
+## Identifies a workspace index file
+MAGIC = b'WSI1'
+
+## Header layout: magic, grid size in x and y, grid origin, grid step, and the
+#  reach margin and condition number limits the index was built with
+HEADER = '<4sHHfffff'
+
+## Smallest allowed 1 - |sin(alf)| of any joint, where alf is the angle used by
+#  the inverse kinematics. Near 0 an arm is nearly straight.
+MIN_MARGIN = 0.02
+
+## Smallest allowed distance in inches from a platform attachment point to its
+#  driven joint
+MIN_Q = 0.5
+
+## Largest allowed Frobenius condition number of the inverse Jacobian
+MAX_COND = 20.0
+
+## Scale of the stored condition numbers, which are kept as 16 bit integers
+COND_SCALE = 100
+
+## Marks a cell with no safe cell anywhere in the index
+NO_CELL = 0xFFFF
+
+
+class WorkspaceIndex:
+    '''!
+    This class answers reachability questions about the drawing area in
+    constant time.
+    '''
+
+    def __init__ (self, nx, ny, x0, y0, step, bits, cond, nearest,
+                  min_margin=MIN_MARGIN, max_cond=MAX_COND):
+        '''!
+        @brief              Creates a WorkspaceIndex object from grid data
+        @details            Usually created by WorkspaceIndex.load() on the
+                            board or by build_index() on a PC rather than
+                            directly. Cell (i, j) is the square of side step
+                            centered on (x0 + i*step, y0 + j*step).
+        @param nx           The number of cells in the x direction
+        @param ny           The number of cells in the y direction
+        @param x0           The x-coordinate of the first cell's center in inches
+        @param y0           The y-coordinate of the first cell's center in inches
+        @param step         The cell size in inches
+        @param bits         A bytearray with one bit per cell, set if the cell
+                            is safe
+        @param cond         An array('H') holding the condition number of each
+                            cell times COND_SCALE
+        @param nearest      An array('H') holding the index of the nearest safe
+                            cell to each cell, or NO_CELL
+        @param min_margin   The reach margin the index was built with
+        @param max_cond     The condition number limit the index was built with
+        '''
+        self.nx = nx
+        self.ny = ny
+        self.x0 = x0
+        self.y0 = y0
+        self.step = step
+        self.bits = bits
+        self.cond = cond
+        self.nearest = nearest
+        self.min_margin = min_margin
+        self.max_cond = max_cond
+
+    @staticmethod
+    def load(filename):
+        '''!
+        @brief          Loads a workspace index from a file
+        @param filename The name of the index file on the board
+        @return         A new WorkspaceIndex object
+        '''
+        with open(filename, 'rb') as f:
+            magic, nx, ny, x0, y0, step, min_margin, max_cond = struct.unpack(
+                HEADER, f.read(struct.calcsize(HEADER)))
+            if magic != MAGIC:
+                raise ValueError("Not a workspace index: " + filename)
+
+            bits = bytearray((nx*ny + 7)//8)
+            f.readinto(bits)
+            cond = array.array('H', bytes(2*nx*ny))
+            f.readinto(cond)
+            nearest = array.array('H', bytes(2*nx*ny))
+            f.readinto(nearest)
+
+        return WorkspaceIndex(nx, ny, x0, y0, step, bits, cond, nearest,
+                              min_margin, max_cond)
+
+    def save(self, filename):
+        '''!
+        @brief          Saves the workspace index to a file
+        @param filename The name of the file to write
+        '''
+        with open(filename, 'wb') as f:
+            f.write(struct.pack(HEADER, MAGIC, self.nx, self.ny, self.x0,
+                                self.y0, self.step, self.min_margin,
+                                self.max_cond))
+            f.write(self.bits)
+            f.write(self.cond)
+            f.write(self.nearest)
+
+    def cell(self, x, y):
+        '''!
+        @brief      Finds the cell holding a position
+        @param x    The x-coordinate in inches
+        @param y    The y-coordinate in inches
+        @return     The index of the cell, or -1 if the position is outside
+                    of the index
+        '''
+        i = int((x - self.x0)/self.step + 0.5)
+        j = int((y - self.y0)/self.step + 0.5)
+        if x < self.x0 - 0.5*self.step or y < self.y0 - 0.5*self.step \
+            or i >= self.nx or j >= self.ny:
+            return -1
+        return j*self.nx + i
+
+    def is_safe(self, x, y):
+        '''!
+        @brief      Checks if a position can be drawn safely
+        @param x    The x-coordinate in inches
+        @param y    The y-coordinate in inches
+        @return     True if the position is inside a safe cell
+        '''
+        k = self.cell(x, y)
+        return k >= 0 and (self.bits[k >> 3] >> (k & 7)) & 1 == 1
+
+    def condition(self, x, y):
+        '''!
+        @brief      Looks up the condition number of the kinematics at a position
+        @param x    The x-coordinate in inches
+        @param y    The y-coordinate in inches
+        @return     The condition number, or None outside of the index
+        '''
+        k = self.cell(x, y)
+        if k < 0:
+            return None
+        return self.cond[k]/COND_SCALE
+
+    def nearest_safe(self, x, y):
+        '''!
+        @brief      Finds the safe position closest to a position
+        @details    Positions outside of the index are first moved onto its
+                    edge. Returns the center of the nearest safe cell, or the
+                    position itself if it is already safe.
+        @param x    The x-coordinate in inches
+        @param y    The y-coordinate in inches
+        @return     A tuple (x, y) of a safe position, or None if the index
+                    holds no safe cells
+        '''
+        x1 = self.x0 + (self.nx - 1)*self.step
+        y1 = self.y0 + (self.ny - 1)*self.step
+        x = min(max(x, self.x0), x1)
+        y = min(max(y, self.y0), y1)
+
+        k = self.cell(x, y)
+        if (self.bits[k >> 3] >> (k & 7)) & 1:
+            return x, y
+        k = self.nearest[k]
+        if k == NO_CELL:
+            return None
+        return (self.x0 + (k % self.nx)*self.step,
+                self.y0 + (k // self.nx)*self.step)
+
+    def __repr__(self):
+        '''!
+        @brief Puts diagnostic information about the index into a string
+        '''
+        safe = 0
+        for byte in self.bits:
+            while byte:
+                safe += byte & 1
+                byte >>= 1
+        return ('WorkspaceIndex {:d}x{:d} step {:.3f} in, {:d} safe cells, '
+                'max cond {:.1f}'.format(self.nx, self.ny, self.step, safe,
+                self.max_cond))
+
+
+def reach_margin(brain, x, y, theta=0):
+    '''!
+    @brief          Measures how close a pose is to the singular poses of the legs
+    @param brain    The RoboBrain object with the robot geometry
+    @param x        The x-coordinate of the platform in inches
+    @param y        The y-coordinate of the platform in inches
+    @param theta    The orientation of the platform in degrees
+    @return         A tuple (margin, q) of the smallest 1 - |sin(alf)| of any
+                    joint (negative if the pose can't be reached) and the
+                    shortest distance from an attachment point to its joint
+    '''
+    rad = math.radians(theta)
+    cos_th = math.cos(rad)
+    sin_th = math.sin(rad)
+    margin = 1
+    q_min = float('inf')
+    for l, c, a, b in ((brain.l1, brain.c1, brain.a1, brain.b1),
+                       (brain.l2, brain.c2, brain.a2, brain.b2),
+                       (brain.l3, brain.c3, brain.a3, brain.b3)):
+        qx = l[0] - x - c[0]*cos_th + c[1]*sin_th
+        qy = l[1] - y - c[0]*sin_th - c[1]*cos_th
+        q = math.sqrt(qx*qx + qy*qy)
+        q_min = min(q_min, q)
+        if q > 0:
+            margin = min(margin, 1 - abs((b*b - a*a - q*q)/(2*a*q)))
+    return margin, q_min
+
+
+def condition_number(brain, x, y, theta, alphas):
+    '''!
+    @brief          Computes the condition number of the robot's Jacobian
+    @details        Uses the inverse Jacobian which maps the platform velocity
+                    (x, y, and the orientation rate times the mean platform
+                    radius, so all three are in inches) to the joint rates. Its
+                    Frobenius condition number divided by 3 is 1 for a perfectly
+                    isotropic pose and grows without bound near any singularity.
+    @param brain    The RoboBrain object with the robot geometry
+    @param x        The x-coordinate of the platform in inches
+    @param y        The y-coordinate of the platform in inches
+    @param theta    The orientation of the platform in degrees
+    @param alphas   A tuple of the three joint angles in degrees
+    @return         The condition number, or infinity at a singular pose
+    '''
+    rad = math.radians(theta)
+    cos_th = math.cos(rad)
+    sin_th = math.sin(rad)
+    radius = (math.hypot(*brain.c1) + math.hypot(*brain.c2)
+              + math.hypot(*brain.c3))/3
+
+    # Each row is -(gradient of the loop closure error)/(its joint derivative)
+    rows = []
+    for l, c, a, alpha in ((brain.l1, brain.c1, brain.a1, alphas[0]),
+                           (brain.l2, brain.c2, brain.a2, alphas[1]),
+                           (brain.l3, brain.c3, brain.a3, alphas[2])):
+        rx = c[0]*cos_th - c[1]*sin_th
+        ry = c[0]*sin_th + c[1]*cos_th
+        al = math.radians(alpha)
+        dx = x + rx - l[0] - a*math.cos(al)
+        dy = y + ry - l[1] - a*math.sin(al)
+        df_dalpha = 2*a*(dx*math.sin(al) - dy*math.cos(al))
+        if df_dalpha == 0:
+            return float('inf')
+        rows.append((-2*dx/df_dalpha, -2*dy/df_dalpha,
+                     -2*(dy*rx - dx*ry)/df_dalpha/radius))
+
+    (a11, a12, a13), (a21, a22, a23), (a31, a32, a33) = rows
+    cof = (a22*a33 - a23*a32, a23*a31 - a21*a33, a21*a32 - a22*a31,
+           a13*a32 - a12*a33, a11*a33 - a13*a31, a12*a31 - a11*a32,
+           a12*a23 - a13*a22, a13*a21 - a11*a23, a11*a22 - a12*a21)
+    det = a11*cof[0] + a12*cof[1] + a13*cof[2]
+    if det == 0:
+        return float('inf')
+
+    norm = math.sqrt(sum(v*v for row in rows for v in row))
+    norm_inv = math.sqrt(sum(v*v for v in cof))/abs(det)
+    return norm*norm_inv/3
+
+
+def build_index(brain, x0, y0, x1, y1, step, min_margin=MIN_MARGIN,
+                min_q=MIN_Q, max_cond=MAX_COND):
+    '''!
+    @brief              Builds a workspace index with a RoboBrain's geometry
+    @details            Checks the reach margin at the center and corners of
+                        every cell and the condition number at its center, with
+                        the joint options RoboBrain chooses while sweeping the
+                        grid row by row. Then finds the nearest safe cell to
+                        every unsafe one. Meant to be run on a PC.
+    @param brain        A RoboBrain object with the robot geometry
+    @param x0           The smallest x-coordinate of the index in inches
+    @param y0           The smallest y-coordinate of the index in inches
+    @param x1           The largest x-coordinate of the index in inches
+    @param y1           The largest y-coordinate of the index in inches
+    @param step         The cell size in inches
+    @param min_margin   The smallest allowed reach margin of a safe cell
+    @param min_q        The smallest allowed attachment point to joint distance
+                        of a safe cell in inches
+    @param max_cond     The largest allowed condition number of a safe cell
+    @return             A new WorkspaceIndex object
+    '''
+    nx = int(round((x1 - x0)/step)) + 1
+    ny = int(round((y1 - y0)/step)) + 1
+    if nx*ny >= NO_CELL:
+        raise ValueError("Too many cells for a workspace index")
+
+    bits = bytearray((nx*ny + 7)//8)
+    cond = array.array('H', bytes(2*nx*ny))
+    nearest = array.array('H', bytes(2*nx*ny))
+
+    half = 0.5*step
+    for j in range(ny):
+        # Sweep back and forth so the joints move as they would while drawing
+        columns = range(nx) if j % 2 == 0 else range(nx - 1, -1, -1)
+        for i in columns:
+            k = j*nx + i
+            x = x0 + i*step
+            y = y0 + j*step
+
+            safe = True
+            for px, py in ((x, y), (x - half, y - half), (x + half, y - half),
+                           (x - half, y + half), (x + half, y + half)):
+                margin, q_min = reach_margin(brain, px, py)
+                if margin < min_margin or q_min < min_q:
+                    safe = False
+
+            kappa = float('inf')
+            if reach_margin(brain, x, y)[0] >= 0:
+                brain.update_joints(x, y, 0)
+                kappa = condition_number(brain, x, y, 0, (brain.alpha1,
+                                         brain.alpha2, brain.alpha3))
+            if kappa > max_cond:
+                safe = False
+
+            cond[k] = min(int(kappa*COND_SCALE + 0.5), 0xFFFF) \
+                if kappa < float('inf') else 0xFFFF
+            if safe:
+                bits[k >> 3] |= 1 << (k & 7)
+
+    # Nearest safe cell to every cell
+    safe_cells = [k for k in range(nx*ny) if (bits[k >> 3] >> (k & 7)) & 1]
+    for k in range(nx*ny):
+        i = k % nx
+        j = k // nx
+        best = NO_CELL
+        best_dist = float('inf')
+        for s in safe_cells:
+            dist = (s % nx - i)**2 + (s // nx - j)**2
+            if dist < best_dist:
+                best = s
+                best_dist = dist
+        nearest[k] = best
+
+    return WorkspaceIndex(nx, ny, x0, y0, step, bits, cond, nearest,
+                          min_margin, max_cond)
+
+
+if __name__ == "__main__":
+    import HostShim
+    HostShim.install()
+    import RoboGeometry
+
+    myRoboBrain = RoboGeometry.make_brain()
+    cx, cy = RoboGeometry.DRAW_CENTER
+    hx, hy = RoboGeometry.DRAW_HALF_SIZE
+
+    index = build_index(myRoboBrain, cx - hx, cy - hy, cx + hx, cy + hy, 0.2)
+    index.save("workspace.bin")
+
+    print(index)
+    print("Index size: {:d} bytes".format(len(index.bits) + 2*len(index.cond)
+                                          + 2*len(index.nearest)))
+
+    # Draw the index, '#' for safe cells and '.' for the rest, top row first
+    for j in range(index.ny - 1, -1, -1):
+        print(''.join('#' if (index.bits[k >> 3] >> (k & 7)) & 1 else '.'
+                      for k in range(j*index.nx, (j + 1)*index.nx)))
@@ -0,0 +1,142 @@
+'''!
+@file       shareBench.py
+@brief      Benchmarks moving data through the task_share queues on a PC
+@details    Moves bursts of items through a queue, the way a file playback or
+            batched inverse kinematics task would, and compares the time per
+            item of each way of doing it:
+            - @c put/get: one Queue.put() and Queue.get() per item
+            - @c put_many/get_many: one call for the whole burst, copied in at
+              most two slices
+
+            Each method is run with and without thread protection, for a few
+            burst sizes. The time per item is the fastest of a few passes. On
+            a PC the pyb.disable_irq() stand-in costs almost nothing, so the
+            benefit of disabling interrupts once per burst shows up more on
+            the board than here.
+
+            Results are printed, and written as JSON if a file is given so
+            runs can be compared:
+            @code
+            python shareBench.py [results.json]
+            @endcode
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+import array
+import json
+import sys
+import time
+
+import HostShim
+HostShim.install()
+
+import task_share
+
+## Burst sizes moved through the queue at once
+BURSTS = (1, 8, 32, 64)
+
+## Number of items moved through the queue in each timed pass
+ITEMS = 64000
+
+## Number of timed passes, of which the fastest is reported
+REPEATS = 3
+
+## Size of the queue
+QUEUE_SIZE = 128
+
+
+def _single(queue, src, dest, burst):
+    '''!
+    @brief      Moves one burst through a queue an item at a time
+    '''
+    for n in range(burst):
+        queue.put(src[n])
+    for n in range(burst):
+        dest[n] = queue.get()
+
+
+def _bulk(queue, src, dest, burst):
+    '''!
+    @brief      Moves one burst through a queue with one call each way
+    '''
+    queue.put_many(src, burst)
+    queue.get_many(dest, burst)
+
+
+## The methods benchmarked, by name
+METHODS = {'put/get': _single, 'put_many/get_many': _bulk}
+
+
+def run_method(name, burst, protect):
+    '''!
+    @brief          Times one method of moving bursts through a queue
+    @param name     The name of the method in METHODS
+    @param burst    The number of items in each burst
+    @param protect  True to thread protect the queue
+    @return         A dictionary of the results
+    '''
+    move = METHODS[name]
+    queue = task_share.Queue('f', QUEUE_SIZE, thread_protect = protect)
+    src = array.array('f', range(burst))
+    dest = array.array('f', bytes(4*burst))
+    bursts = ITEMS // burst
+
+    # Start the ring part way along so bursts wrap around its end
+    queue.put_many(src, min(burst, QUEUE_SIZE//3))
+    queue.get_many(dest)
+
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter_ns()
+        for _ in range(bursts):
+            move(queue, src, dest, burst)
+        elapsed = time.perf_counter_ns() - start
+        if best is None or elapsed < best:
+            best = elapsed
+
+    if list(dest) != list(src):
+        raise RuntimeError(name + " returned the wrong items")
+    task_share.share_list.remove(queue)
+    return {'method': name, 'burst': burst, 'protect': protect,
+            'ns_per_item': best/(bursts*burst)}
+
+
+def run_all(bursts=BURSTS):
+    '''!
+    @brief          Runs every method for every burst size
+    @param bursts   The burst sizes
+    @return         A dictionary of the results and the conditions of the run
+    '''
+    results = []
+    for protect in (False, True):
+        for burst in bursts:
+            for name in METHODS:
+                results.append(run_method(name, burst, protect))
+    return {'python': sys.version.split()[0],
+            'platform': sys.platform,
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'results': results}
+
+
+if __name__ == "__main__":
+    filename = sys.argv[1] if len(sys.argv) > 1 else None
+    report = run_all()
+
+    print("{:<20s}{:>7s}{:>9s}{:>10s}{:>10s}".format(
+          'method', 'burst', 'protect', 'ns/item', 'speed-up'))
+    single = {}
+    for r in report['results']:
+        key = (r['burst'], r['protect'])
+        if r['method'] == 'put/get':
+            single[key] = r['ns_per_item']
+        print("{:<20s}{:>7d}{:>9s}{:>10.1f}{:>9.1f}x".format(
+              r['method'], r['burst'], 'yes' if r['protect'] else 'no',
+              r['ns_per_item'], single[key]/r['ns_per_item']))
+
+    if filename is not None:
+        with open(filename, 'w') as f:
+            json.dump(report, f, indent = 2)
+        print("Results written to " + filename)
@@ -0,0 +1,515 @@
+'''!
+@file       simRobot.py
+@brief      Runs the task set of main.py on a PC with simulated hardware
+@details    The tasks of main.py are created from the same task table, made by
+            taskSet.py, but the joints drive simulated motors
+            and the scheduler runs on a HostShim.VirtualClock. Time stands
+            still while a task runs and jumps forward when the scheduler
+            sleeps, so minutes of robot time take seconds on a PC, and every
+            run gives the same timing. Each task's run is charged an assumed
+            run time on the board, so the profiles and the idle fraction show
+            roughly how busy the board would be.
+
+            Each simulated joint is both the motor and the encoder of a
+            JointTask: the duty cycle sets the speed the joint heads towards,
+            with a first order lag, and the angle is read back in whole
+            encoder counts. Hardware calibration is skipped and the joints
+            start at the angles of the first position of the drawing, as if
+            they had already moved there. The drawing is read from a drawing
+            file, or from a simulated touchpad which a finger traces the
+            drawing on.
+            Before drawing, the joint speed is measured with the same routine
+            speedCal.py uses on the robot, and the moves are planned with it.
+
+            The run reports robot time against PC time, task runs per PC
+            second, the task profiles, how full each queue got and how often
+            it was found full or empty, the largest joint error while the
+            pen is down, and the share of the processor the task rates would
+            need with the run times assumed in RUN_TIMES. Those are estimates,
+            not measurements; main.py checks the measured run times on the
+            robot with TaskTable.report(). The run fails, exiting with status
+            1, if the joint error is over MAX_ERROR. A benchmark of the
+            schedulers themselves runs many empty tasks and reports task runs
+            per PC second.
+            @code
+            python simRobot.py [drawing.gcode] [seconds]
+            python simRobot.py touch [drawing.gcode] [seconds]
+            python simRobot.py bench
+            @endcode
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+import contextlib
+import math
+import os
+import sys
+import tempfile
+import time
+
+import HostShim
+HostShim.install()
+
+import cotask
+import task_share
+
+import ClosedLoop
+import DrawingFile
+import JointTask
+import RoboEncoderDriver
+import RoboGeometry
+import RoboMotorDriver
+import TaskSet
+import TaskTable
+import TaskTouch
+import Trajectory
+
+## Time constant of the simulated motors in seconds
+MOTOR_LAG = 0.03
+
+## Speed of the simulated joints at full duty cycle in [degree/s]. It differs
+#  from Trajectory.FULL_DUTY_SPEED, as the robot's does until it is measured
+PLANT_SPEED = 300
+
+## Assumed run time of each task on the board in microseconds. These are
+#  estimates; the real ones are reported by main.py on the robot
+RUN_TIMES = {'Task4_B': 3000, 'Task5': 1500, 'Task6_T': 600,
+             'Task1_J1': 300, 'Task1_J2': 300, 'Task1_J3': 300}
+
+## Longest robot time to run a drawing for, in seconds
+MAX_TIME = 600
+
+## Robot time to keep running after the drawing is done, in seconds
+SETTLE_TIME = 1.0
+
+## Speed of the simulated finger on the touchpad in [inch/s]
+FINGER_SPEED = 2.0
+
+## Largest joint error in degrees allowed while the pen is down. With the
+#  planned speeds fed forward, what is left is mostly the lag of the motors,
+#  about MOTOR_LAG times the joint speed on the fastest moves
+MAX_ERROR = 6.0
+
+
+class SimJoint:
+    '''!
+    @brief      A simulated joint motor and encoder
+    @details    Has the methods of RoboMotorDriver and RoboEncoderDriver used by
+                JointTask, so one SimJoint takes the place of both.
+    '''
+
+    def __init__ (self, clock, angle=0, lag=MOTOR_LAG, full_speed=PLANT_SPEED):
+        '''!
+        @brief              Creates a SimJoint
+        @param clock        The HostShim.VirtualClock the joint moves with
+        @param angle        The starting angle in degrees
+        @param lag          The time constant of the motor in seconds
+        @param full_speed   The joint speed at full duty cycle in [degree/s]
+        '''
+        self.clock = clock
+        self.angle = angle
+        self.lag = lag
+        self.full_speed = full_speed
+        self.speed = 0
+        self.duty = 0
+        self.last = clock.now
+        self.counts = RoboEncoderDriver.RoboEncoderDriver.gearRatio*RoboEncoderDriver.RoboEncoderDriver.CPR/180
+
+    def set_duty_cycle(self, duty):
+        '''!
+        @brief      Sets the duty cycle, limited like RoboMotorDriver
+        @param duty The signed duty cycle in percent
+        '''
+        self._move()
+        limit = RoboMotorDriver.RoboMotorDriver.duty_limit
+        self.duty = max(-limit, min(limit, duty))
+
+    def update(self):
+        '''!
+        @brief      Moves the joint up to the present time
+        '''
+        self._move()
+
+    def read(self):
+        '''!
+        @brief      Returns the angle in degrees, in whole encoder counts
+        '''
+        return round(self.angle*self.counts)/self.counts
+
+    def _move(self):
+        '''!
+        @brief      Moves the joint from the last time it moved to now
+        @details    The speed approaches the speed of the duty cycle
+                    exponentially, which can be integrated exactly over any
+                    time step.
+        '''
+        dt = (self.clock.now - self.last)/1000000
+        self.last = self.clock.now
+        if dt <= 0:
+            return
+        target = self.duty*self.full_speed/100
+        decay = math.exp(-dt/self.lag)
+        self.angle += target*dt + (self.speed - target)*self.lag*(1 - decay)
+        self.speed = target + (self.speed - target)*decay
+
+
+def make_joint(ready, clock, angle, kp, ki, setpoint, theta_box, speed_box=None):
+    '''!
+    @brief              Creates a JointTask which drives a SimJoint
+    @details            The JointTask constructor sets up hardware and waits
+                        for calibration, so the object is made without it and
+                        given its parts here. The task's run() is unchanged.
+    @param ready        The task_share.Share which stops the joints
+    @param clock        The HostShim.VirtualClock
+    @param angle        The starting angle of the joint in degrees
+    @param kp           The controller proportional gain
+    @param ki           The controller integral gain
+    @param setpoint     The starting setpoint in degrees
+    @param theta_box    The mailbox of joint setpoints
+    @param speed_box    The mailbox of planned joint speeds, or None
+    @return             The JointTask
+    '''
+    joint = JointTask.JointTask.__new__(JointTask.JointTask)
+    joint.motor_const = 0
+    joint.ready = ready
+    joint.motor = joint.encoder = SimJoint(clock, angle)
+    joint.controller = ClosedLoop.ClosedLoop(kp, ki, setpoint, clock=clock)
+    joint.theta_box = theta_box
+    joint.speed_box = speed_box
+    joint.theta = setpoint
+    return joint
+
+
+def _sim_joint(clock):
+    '''!
+    @brief      Returns a task table 'make' entry which makes simulated joints
+    @details    The function takes the arguments of JointTask.JointTask, as
+                TaskSet.make_table() gives them, and starts each joint at its
+                starting setpoint. The motor and encoder numbers are not used.
+    '''
+    return lambda ready, motor_const, encoder_const, kp, ki, setpoint, theta_box, speed_box=None: \
+        make_joint(ready, clock, setpoint, kp, ki, setpoint, theta_box, speed_box)
+
+
+class SimTouchPanel:
+    '''!
+    @brief      A simulated touch panel, touched by a finger tracing a drawing
+    @details    Has the scan_all() method of TouchDriver used by TaskTouch.
+                Each scan the finger moves a fixed distance along the pen down
+                moves of the drawing, and it is lifted for each pen up move.
+                The positions are given in millimeters from the center of the
+                panel, which TaskTouch turns back into inches.
+    '''
+
+    def __init__ (self, filename, speed=FINGER_SPEED, period=TaskSet.TOUCH_PERIOD):
+        '''!
+        @brief          Creates a SimTouchPanel
+        @param filename The name of the drawing file the finger traces
+        @param speed    The speed of the finger in [inch/s]
+        @param period   The time between scans in milliseconds
+        '''
+        self.moves = list(DrawingFile.read_moves(filename))
+        self.step = speed*period/1000
+        self.index = 0
+        self.x, self.y = self.moves[0][1:]
+        self.touched = False
+
+        ## True once the finger has traced the whole drawing and been lifted
+        self.done = False
+
+    def scan_all(self):
+        '''!
+        @brief      Moves the finger one scan further along the drawing
+        @return     A tuple (x, y, touched) with x and y in millimeters
+        '''
+        if self.index >= len(self.moves):
+            # Lift the finger at the end, so the last stroke is sent
+            self.done = not self.touched
+            self.touched = False
+        else:
+            pen, x, y = self.moves[self.index]
+            if pen == DrawingFile.PEN_UP:
+                # Lift the finger and move it to the start of the next stroke
+                self.touched = False
+                self.x, self.y = x, y
+                self.index += 1
+            elif not self.touched:
+                # Put the finger down where it is before moving it
+                self.touched = True
+            else:
+                dx, dy = x - self.x, y - self.y
+                length = math.sqrt(dx*dx + dy*dy)
+                if length <= self.step:
+                    self.x, self.y = x, y
+                    self.index += 1
+                else:
+                    self.x += dx*self.step/length
+                    self.y += dy*self.step/length
+        return ((self.x - 8.875)*15, (self.y - 5.124)*15, self.touched)
+
+
+def _sim_touch(panel):
+    '''!
+    @brief      Returns a task table 'make' entry which makes a TaskTouch
+                reading a SimTouchPanel
+    '''
+    return lambda *args, **kwargs: TaskTouch.TaskTouch(*args, panel = panel, **kwargs)
+
+
+class Charged:
+    '''!
+    @brief      Runs a task object's generator, moving the clock forward by an
+                assumed run time each time it runs
+    '''
+
+    def __init__ (self, obj, clock, run_time):
+        '''!
+        @brief          Creates a Charged task object
+        @param obj      The task object whose run() is the generator
+        @param clock    The HostShim.VirtualClock
+        @param run_time The run time charged in microseconds
+        '''
+        self.obj = obj
+        self.clock = clock
+        self.run_time = run_time
+
+    def run(self):
+        '''!
+        @brief      Generator which runs the task object's generator
+        '''
+        for state in self.obj.run():
+            self.clock.advance(self.run_time)
+            yield state
+
+
+def _charged(make, clock, run_time):
+    '''!
+    @brief      Wraps a task table 'make' entry so its object is Charged
+    '''
+    return lambda *args, **kwargs: Charged(make(*args, **kwargs), clock, run_time)
+
+
+def write_demo(filename, center=None, radius=2.0):
+    '''!
+    @brief          Writes a drawing file of a five pointed star in a circle
+    @param filename The name of the file to write
+    @param center   The (x, y) center of the drawing. Defaults to the center of
+                    the drawing area
+    @param radius   The radius of the circle in inches
+    '''
+    if center is None:
+        center = RoboGeometry.DRAW_CENTER
+    with open(filename, 'w') as f:
+        f.write("; Star in a circle\n")
+        for n in range(6):
+            a = math.pi/2 + n*4*math.pi/5
+            f.write("G{:d} X{:.4f} Y{:.4f}\n".format(
+                    DrawingFile.PEN_DOWN if n else DrawingFile.PEN_UP,
+                    center[0] + radius*math.cos(a), center[1] + radius*math.sin(a)))
+        for n in range(37):
+            a = math.pi/2 + n*2*math.pi/36
+            f.write("G{:d} X{:.4f} Y{:.4f}\n".format(
+                    DrawingFile.PEN_DOWN if n else DrawingFile.PEN_UP,
+                    center[0] + radius*math.cos(a), center[1] + radius*math.sin(a)))
+
+
+def run_drawing(filename, seconds=MAX_TIME, tick=True, run_times=RUN_TIMES, source='file'):
+    '''!
+    @brief              Draws a drawing with the task set of main.py
+    @details            The tasks are made by TaskSet.make_table(), as in
+                        main.py, with simulated joints and touchpad.
+    @param filename     The name of the drawing file
+    @param seconds      The longest robot time to run for
+    @param tick         True to release the tasks from a timer tick as main.py
+                        does, False to have the scheduler check the time.
+                        Either way the tasks are run by edf_sched()
+    @param run_times    A dictionary from task name to the run time charged to
+                        the task in microseconds
+    @param source       'file' to draw the drawing file with TaskFile, or
+                        'touch' to draw it with TaskTouch from a SimTouchPanel
+                        whose finger traces the drawing
+    @return             A dictionary of results: robot time 'robot_s', PC time
+                        'cpu_s', number of task runs 'runs', whether the drawing
+                        finished 'done', largest joint error in degrees while
+                        drawing 'max_error', the task list 'task_list', and the
+                        task objects 'tasks'
+    '''
+    clock = HostShim.VirtualClock()
+    cotask.set_clock(clock)
+    task_list = cotask.TaskList()
+    total = len(list(DrawingFile.read_moves(filename)))
+
+    shares = TaskSet.make_shares()
+    points = shares[1]
+
+    brain = RoboGeometry.make_brain(kernel = 'native')
+    pen_state, x, y = next(DrawingFile.read_moves(filename))
+    brain.update_joints(x, y, 0)
+    start_angles = (brain.alpha1, brain.alpha2, brain.alpha3)
+
+    panel = SimTouchPanel(filename)
+    table = TaskSet.make_table(shares, brain,
+                               drawing_file = filename if source == 'file' else None,
+                               make_joint = _sim_joint(clock), make_touch = _sim_touch(panel),
+                               start = start_angles)
+    for entry in table:
+        entry['make'] = _charged(entry['make'], clock, run_times.get(entry['name'], 0))
+
+    # RoboTask prints every time it runs, which would swamp the results
+    with open(os.devnull, 'w') as quiet, contextlib.redirect_stdout(quiet):
+        tasks = TaskTable.build(table, task_list)
+        solenoid = tasks['Task4_B'][0].obj.solenoid.ch
+        joints = [tasks['Task1_J' + str(n)][0].obj for n in (1, 2, 3)]
+        source_task = tasks['Task5'][0].obj
+        blend = tasks['Task4_B'][0].obj.blend
+        if tick:
+            task_list.start_tick(clock.timer(6, freq = TaskTable.tick_freq(table)))
+
+        max_error = 0
+        done_at = None
+        start = time.perf_counter()
+        end = seconds*1000000
+        while clock.now < end:
+            task_list.edf_sched()
+            task_list.idle()
+
+            # The solenoid is released to put the pen down
+            if solenoid.pulse_width_percent() == 0:
+                for joint in joints:
+                    error = abs(Trajectory.wrap_delta(joint.encoder.read(),
+                                                      joint.controller.setpoint))
+                    if error > max_error:
+                        max_error = error
+
+            if source == 'file':
+                read_all = source_task.moves > total
+            else:
+                read_all = panel.done
+            if done_at is None and read_all and not points.any() and blend.idle():
+                done_at = clock.now
+            if done_at is not None and clock.now - done_at >= SETTLE_TIME*1000000:
+                break
+        cpu = time.perf_counter() - start
+        task_list.stop_tick()
+
+    runs = sum(prof['runs'] for prof in task_list.get_profiles())
+    cotask.set_clock()
+    return {'robot_s': clock.now/1000000, 'cpu_s': cpu, 'runs': runs,
+            'done': done_at is not None, 'max_error': max_error,
+            'task_list': task_list, 'tasks': tasks}
+
+
+def measure_speed():
+    '''!
+    @brief      Measures a simulated joint's speed as speedCal.py does
+    @details    Runs JointTask.measure_speed() on a SimJoint, to check that it
+                finds the speed of the plant.
+    @return     The measured speed at full duty cycle in [degree/s]
+    '''
+    clock = HostShim.VirtualClock()
+    cotask.set_clock(clock)
+    ready = task_share.Share('i', thread_protect = False, name = "drawing")
+    theta = task_share.Mailbox('f', name = "theta")
+    joint = make_joint(ready, clock, 0, TaskSet.JOINT_KP, TaskSet.JOINT_KI, 0, theta)
+    speed = joint.measure_speed()
+    task_share.share_list.remove(ready)
+    task_share.share_list.remove(theta)
+    cotask.set_clock()
+    return speed
+
+
+def _empty():
+    '''!
+    @brief      Generator of a task which does nothing
+    '''
+    while True:
+        yield 0
+
+
+def bench_scheduler(count=20, seconds=10, mode='edf'):
+    '''!
+    @brief          Measures how fast a scheduler runs tasks
+    @details        Runs tasks which do nothing, with periods of 1 to 10 ms
+                    spread over the tasks, so the time measured is all
+                    scheduler overhead.
+    @param count    The number of tasks
+    @param seconds  The robot time to run for
+    @param mode     'pri' for pri_sched(), 'edf' for edf_sched(), 'tick'
+                    for pri_sched() with a timer tick, or 'edf-tick' for
+                    edf_sched() with a timer tick as main.py runs
+    @return         A tuple (runs, PC seconds) of task runs and the time taken
+    '''
+    clock = HostShim.VirtualClock()
+    cotask.set_clock(clock)
+    task_list = cotask.TaskList()
+    for n in range(count):
+        task_list.append(cotask.Task(_empty, name = "T" + str(n), priority = n % 4,
+                                     period = 1 + n % 10, profile = True))
+    if mode.endswith('tick'):
+        task_list.start_tick(clock.timer(6, freq = 1000))
+    sched = task_list.edf_sched if mode.startswith('edf') else task_list.pri_sched
+
+    end = seconds*1000000
+    start = time.perf_counter()
+    while clock.now < end:
+        sched()
+        task_list.idle()
+    cpu = time.perf_counter() - start
+
+    task_list.stop_tick()
+    cotask.set_clock()
+    return sum(prof['runs'] for prof in task_list.get_profiles()), cpu
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        print("SCHEDULER  TASKS      RUNS   PC TIME   RUNS/S")
+        for mode in ('pri', 'edf', 'tick', 'edf-tick'):
+            for count in (5, 20, 50):
+                runs, cpu = bench_scheduler(count, mode = mode)
+                print("{:<9s}{:7d}{:10d}{:9.2f} s{:9.0f}".format(mode, count, runs, cpu, runs/cpu))
+        sys.exit(0)
+
+    # Plan with the measured joint speed, as main.py does once speedCal.py
+    # has been run
+    Trajectory.FULL_DUTY_SPEED = measure_speed()
+    print("Measured joint speed {:.1f} degree/s at full duty cycle, plant {:.1f}".format(
+          Trajectory.FULL_DUTY_SPEED, PLANT_SPEED))
+
+    # Draw from the simulated touchpad rather than the drawing file if asked
+    args = sys.argv[1:]
+    source = 'file'
+    if args and args[0] == 'touch':
+        source = 'touch'
+        args = args[1:]
+
+    seconds = float(args[1]) if len(args) > 1 else MAX_TIME
+    if args:
+        result = run_drawing(args[0], seconds, source = source)
+    else:
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, "demo.gcode")
+            write_demo(filename)
+            result = run_drawing(filename, seconds, source = source)
+
+    print(result['task_list'])
+    print(task_share.show_all())
+    print("{:.1f} s of robot time in {:.2f} s, {:.0f} times real time".format(
+          result['robot_s'], result['cpu_s'], result['robot_s']/result['cpu_s']))
+    print("{:d} task runs, {:.0f} per second".format(result['runs'], result['runs']/result['cpu_s']))
+    print("Drawing " + ("finished" if result['done'] else "not finished"))
+    print("Largest joint error while drawing: {:.2f} degrees".format(result['max_error']))
+
+    # The load the task rates put on the board, with the assumed run times
+    rows, average, worst = TaskTable.utilization(result['task_list'])
+    print("Task load with the assumed run times {:.1f}% average, {:.1f}% if every task "
+          "takes its longest".format(100*average, 100*worst))
+    if average > TaskTable.MAX_UTILIZATION:
+        print("Tasks use more than {:.0f}% of the processor; lower the task rates".format(
+              100*TaskTable.MAX_UTILIZATION))
+
+    if result['max_error'] > MAX_ERROR:
+        print("FAILED: joint error over {:.1f} degrees while drawing".format(MAX_ERROR))
+        sys.exit(1)
@@ -0,0 +1,36 @@
+'''!
+@file       speedCal.py
+@brief      Measures the speed of the robot's joints at full duty cycle
+@details    Run on the board in place of main.py. Each joint's encoder is
+            calibrated as it is when main.py starts, then each joint is
+            driven a short way and back by JointTask.measure_speed(). The
+            slowest joint's speed is saved to Trajectory.SPEED_FILE, since
+            every joint must be able to keep up with a planned move. main.py
+            then plans its moves with the measured speed.
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+import task_share
+import JointTask
+import Trajectory
+
+
+if __name__ == "__main__":
+
+    ready = task_share.Share('i', thread_protect = False, name = "drawing")
+    theta = task_share.Mailbox('f', name = "theta")
+
+    speeds = []
+    for n in (1, 2, 3):
+        joint = JointTask.JointTask(ready, n, n, 0.9, 0.05, 0, theta)
+        input("Move the links clear of each other and press enter to drive joint " + str(n))
+        speed = joint.measure_speed()
+        print("Joint {:d}: {:.0f} degree/s at full duty cycle".format(n, speed))
+        speeds.append(speed)
+
+    with open(Trajectory.SPEED_FILE, 'w') as f:
+        f.write("{:.1f}".format(min(speeds)))
+    print("Saved {:.1f} degree/s to {:s}".format(min(speeds), Trajectory.SPEED_FILE))
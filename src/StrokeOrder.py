@@ -0,0 +1,231 @@
+'''!
+@file       strokeOrder.py
+@brief      Reorders the strokes of a drawing file to cut down pen up travel
+@details    A drawing file is split into strokes, each a run of pen down moves
+            after a pen up move. The strokes are then put in a new order, each
+            drawn forwards or backwards, so the pen travels as little as
+            possible with the pen lifted. A nearest neighbour tour is built
+            first and then improved with 2-opt moves until no move helps or a
+            time budget runs out. Reversing a run of strokes in the tour also
+            reverses the direction each of them is drawn in.
+
+            The reordered drawing is written as a new drawing file, and the
+            pen up travel and job time before and after are printed. Job times
+            are found with jobCompiler.py.
+            @code
+            python strokeOrder.py drawing.gcode [ordered.gcode] [seconds]
+            @endcode
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+import math
+import sys
+import time
+
+import DrawingFile
+import JobCompiler
+import RoboGeometry
+
+## Default time budget for the 2-opt search in seconds
+TIME_BUDGET = 2.0
+
+## File the reordered drawing is written to unless another is given
+ORDERED_FILE = "ordered.gcode"
+
+
+def split_strokes(moves):
+    '''!
+    @brief          Splits drawing moves into strokes
+    @details        Pen up moves which aren't followed by a pen down move draw
+                    nothing and are left out.
+    @param moves    An iterable of (pen, x, y) moves, as from DrawingFile.read_moves()
+    @return         A list of strokes, each a list of (x, y) points starting
+                    where the pen is lowered
+    '''
+    strokes = []
+    stroke = None
+    position = None
+    for pen, x, y in moves:
+        if pen == DrawingFile.PEN_DOWN:
+            if stroke is None:
+                stroke = [position if position is not None else (x, y)]
+                strokes.append(stroke)
+            stroke.append((x, y))
+        else:
+            stroke = None
+        position = (x, y)
+    return strokes
+
+
+def _ends(stroke, flipped):
+    '''!
+    @brief      Finds where a stroke starts and ends when drawn in a direction
+    @return     A tuple (start, end) of (x, y) points
+    '''
+    if flipped:
+        return stroke[-1], stroke[0]
+    return stroke[0], stroke[-1]
+
+
+def _dist(a, b):
+    '''!
+    @brief      Finds the distance between two points
+    '''
+    return math.hypot(a[0] - b[0], a[1] - b[1])
+
+
+def travel(strokes, tour, start):
+    '''!
+    @brief          Finds the pen up travel of a tour
+    @param strokes  The list of strokes
+    @param tour     A list of (stroke index, flipped) pairs in drawing order
+    @param start    The (x, y) point the pen starts at
+    @return         The pen up travel in inches
+    '''
+    total = 0
+    position = start
+    for index, flipped in tour:
+        first, last = _ends(strokes[index], flipped)
+        total += _dist(position, first)
+        position = last
+    return total
+
+
+def nearest_neighbour(strokes, start):
+    '''!
+    @brief          Builds a tour by always drawing the closest stroke next
+    @param strokes  The list of strokes
+    @param start    The (x, y) point the pen starts at
+    @return         A list of (stroke index, flipped) pairs in drawing order
+    '''
+    left = set(range(len(strokes)))
+    tour = []
+    position = start
+    while left:
+        best = None
+        for index in left:
+            stroke = strokes[index]
+            for flipped in (False, True):
+                d = _dist(position, stroke[-1] if flipped else stroke[0])
+                if best is None or d < best[0]:
+                    best = (d, index, flipped)
+        d, index, flipped = best
+        left.remove(index)
+        tour.append((index, flipped))
+        position = _ends(strokes[index], flipped)[1]
+    return tour
+
+
+def two_opt(strokes, tour, start, budget=TIME_BUDGET):
+    '''!
+    @brief          Improves a tour by reversing runs of strokes
+    @details        Reversing the run from i to j draws those strokes in the
+                    opposite order and direction, which only changes the pen
+                    up moves into and out of the run. A run of one stroke just
+                    flips its direction. Improving reversals are made until
+                    none is left or the time budget runs out.
+    @param strokes  The list of strokes
+    @param tour     A list of (stroke index, flipped) pairs, changed in place
+    @param start    The (x, y) point the pen starts at
+    @param budget   The time budget in seconds
+    @return         The improved tour
+    '''
+    deadline = time.monotonic() + budget
+    n = len(tour)
+    improved = True
+    while improved and time.monotonic() < deadline:
+        improved = False
+        for i in range(n):
+            # Point the pen comes from before the run
+            before = start if i == 0 else _ends(strokes[tour[i - 1][0]], tour[i - 1][1])[1]
+            first_i = _ends(strokes[tour[i][0]], tour[i][1])[0]
+            for j in range(i, n):
+                last_j = _ends(strokes[tour[j][0]], tour[j][1])[1]
+                old = _dist(before, first_i)
+                new = _dist(before, last_j)
+                if j + 1 < n:
+                    after = _ends(strokes[tour[j + 1][0]], tour[j + 1][1])[0]
+                    old += _dist(last_j, after)
+                    new += _dist(first_i, after)
+                if new < old - 1e-9:
+                    tour[i:j + 1] = [(index, not flipped) for index, flipped in reversed(tour[i:j + 1])]
+                    first_i = _ends(strokes[tour[i][0]], tour[i][1])[0]
+                    improved = True
+            if time.monotonic() >= deadline:
+                break
+    return tour
+
+
+def tour_moves(strokes, tour):
+    '''!
+    @brief          Turns a tour back into drawing moves
+    @param strokes  The list of strokes
+    @param tour     A list of (stroke index, flipped) pairs in drawing order
+    @return         A list of (pen, x, y) moves
+    '''
+    moves = []
+    for index, flipped in tour:
+        points = strokes[index][::-1] if flipped else strokes[index]
+        moves.append((DrawingFile.PEN_UP,) + tuple(points[0]))
+        for x, y in points[1:]:
+            moves.append((DrawingFile.PEN_DOWN, x, y))
+    return moves
+
+
+def write_moves(filename, moves):
+    '''!
+    @brief          Writes drawing moves to a drawing file
+    @param filename The name of the file to write
+    @param moves    A list of (pen, x, y) moves
+    '''
+    with open(filename, 'w') as f:
+        for pen, x, y in moves:
+            f.write("G{:d} X{:.4f} Y{:.4f}\n".format(pen, x, y))
+
+
+def order_moves(moves, start=None, budget=TIME_BUDGET):
+    '''!
+    @brief          Reorders drawing moves to cut down pen up travel
+    @param moves    An iterable of (pen, x, y) moves
+    @param start    The (x, y) point the pen starts at. Defaults to the center
+                    of the drawing area
+    @param budget   The time budget of the 2-opt search in seconds
+    @return         A tuple (moves, before, after) of the reordered moves and
+                    the pen up travel in inches before and after
+    '''
+    if start is None:
+        start = tuple(RoboGeometry.DRAW_CENTER)
+    strokes = split_strokes(moves)
+    before = travel(strokes, [(n, False) for n in range(len(strokes))], start)
+    tour = two_opt(strokes, nearest_neighbour(strokes, start), start, budget)
+    return tour_moves(strokes, tour), before, travel(strokes, tour, start)
+
+
+def job_time(moves):
+    '''!
+    @brief          Estimates how long drawing moves take to play back
+    @param moves    A list of (pen, x, y) moves
+    @return         The job time in seconds
+    '''
+    frames = JobCompiler.compile_moves(moves)
+    return frames[-1][0]/1000 if frames else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python strokeOrder.py drawing.gcode [ordered.gcode] [seconds]")
+        sys.exit(1)
+    filename = sys.argv[2] if len(sys.argv) > 2 else ORDERED_FILE
+    budget = float(sys.argv[3]) if len(sys.argv) > 3 else TIME_BUDGET
+
+    original = list(DrawingFile.read_moves(sys.argv[1]))
+    ordered, before, after = order_moves(original, budget = budget)
+    write_moves(filename, ordered)
+
+    print("Pen up travel: {:.2f} in before, {:.2f} in after".format(before, after))
+    print("Job time: {:.1f} s before, {:.1f} s after".format(
+          job_time(original), job_time(ordered)))
+    print("Written to " + filename)
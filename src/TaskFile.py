@@ -0,0 +1,75 @@
+'''!
+@file       taskFile.py
+@brief      Plays back a drawing file from the board's filesystem
+@details    Takes the place of TaskTouch when the robot draws on its own. The
+            moves of a drawing file are read one line at a time with
+            drawingFile.py and put into the same queue of (x, y, pen) records
+            the touchpad task uses. A move is only read when there is room for
+            it in the queue, so the file is never read further ahead than the
+            queue can hold.
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+import DrawingFile
+
+S0_PLAY = 0
+S1_DONE = 1
+
+class TaskFile:
+    '''!
+    @brief This class implements a task that streams a drawing file into the position queue
+    '''
+
+    def __init__ (self, ready, filename, points):
+        '''!
+        @brief              Creates a TaskFile object
+        @param ready        A task_share.Share used to stop playback when the robot is shut down
+        @param filename     The name of the drawing file
+        @param points       The task_share.RecordQueue of (x, y, pen) records read by RoboTask
+        '''
+        self.ready = ready
+        self.filename = filename
+        self.points = points
+
+        # Record put into the queue for each move, made once so putting a move
+        # doesn't allocate memory
+        self.record = [0, 0, 0]
+
+        # Number of moves put into the queue, and number of runs spent waiting for room
+        self.moves = 0
+        self.waits = 0
+
+    def run(self):
+        '''!
+        @brief      Generator which puts the moves of the drawing file into the queue
+        @details    Puts at most one move each time it runs. When the file ends,
+                    the pen is lifted where the drawing finished.
+        '''
+
+        state = S0_PLAY
+        moves = DrawingFile.read_moves(self.filename)
+        x = 0
+        y = 0
+
+        while True:
+
+            if state == S0_PLAY and self.ready.get():
+                if self.points.full():
+                    self.waits += 1
+                else:
+                    try:
+                        pen, x, y = next(moves)
+                    except StopIteration:
+                        pen = DrawingFile.PEN_UP
+                        state = S1_DONE
+                        print("Drawing complete")
+                    self.record[0] = x
+                    self.record[1] = y
+                    self.record[2] = pen
+                    self.points.put_from(self.record)
+                    self.moves += 1
+
+            yield(state)
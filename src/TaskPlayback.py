@@ -0,0 +1,151 @@
+'''!
+@file       taskPlayback.py
+@brief      Plays back a drawing compiled ahead of time into joint angles
+@details    A job file written by jobCompiler.py holds timestamped frames of
+            the three joint angles and the pen state, so the board doesn't
+            need to solve any kinematics while drawing. This task takes the
+            place of RoboTask and the trajectory task: it reads the file in
+            fixed size chunks into a buffer allocated once, puts each frame's
+            joint angles straight into the theta mailboxes when its time comes,
+            and raises or lowers the pen.
+
+            A job file starts with a header followed by one record per frame:
+            | Field   | Type | Meaning |
+            |:--------|:-----|:--------|
+            | time    | I    | Time of the frame since the start in milliseconds |
+            | alpha1  | H    | Joint 1 angle, 65536 counts per revolution |
+            | alpha2  | H    | Joint 2 angle, 65536 counts per revolution |
+            | alpha3  | H    | Joint 3 angle, 65536 counts per revolution |
+            | pen     | B    | 1 with the pen down, 0 with the pen up |
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+import struct
+import cotask
+
+## Identifies a job file
+MAGIC = b'JOB1'
+
+## Header layout: magic, number of frames, and frame period in milliseconds
+HEADER = '<4sIH'
+
+## Layout of one frame
+RECORD = '<IHHHBx'
+
+## Size of one frame in bytes
+RECORD_SIZE = struct.calcsize(RECORD)
+
+## Joint angle counts per degree
+ANGLE_SCALE = 65536/360
+
+## Default number of frames read from the file at a time
+CHUNK_FRAMES = 32
+
+S0_START = 0
+S1_PLAY = 1
+S2_DONE = 2
+
+class TaskPlayback:
+    '''!
+    @brief This class implements a task that streams a compiled job to the joint tasks
+    '''
+
+    def __init__ (self, ready, filename, solenoid, queue_th1, queue_th2, queue_th3,
+                  chunk=CHUNK_FRAMES):
+        '''!
+        @brief              Creates a TaskPlayback object
+        @param ready        A task_share.Share used to stop playback when the robot is shut down
+        @param filename     The name of the job file
+        @param solenoid     The RoboSolenoidDriver object which moves the pen
+        @param queue_th1    The task_share.Mailbox of setpoints for joint 1
+        @param queue_th2    The task_share.Mailbox of setpoints for joint 2
+        @param queue_th3    The task_share.Mailbox of setpoints for joint 3
+        @param chunk        The number of frames read from the file at a time
+        '''
+        self.ready = ready
+        self.filename = filename
+        self.solenoid = solenoid
+        self.theta1_queue = queue_th1
+        self.theta2_queue = queue_th2
+        self.theta3_queue = queue_th3
+
+        # Buffer the file is read into
+        self.buf = bytearray(chunk*RECORD_SIZE)
+
+        # Number of frames in the job, frames played, and frames skipped for running late
+        self.frames = 0
+        self.played = 0
+        self.skipped = 0
+
+    def run(self):
+        '''!
+        @brief      Generator which plays back the job file
+        @details    Each time it runs, puts the newest frame whose time has come
+                    into the theta mailboxes. Frames passed over because the task
+                    ran late are counted as skipped.
+        '''
+
+        state = S0_START
+        f = None
+        pen = 0
+
+        while True:
+
+            if self.ready.get() == 0:
+                self.solenoid.push_down()
+                print("Stop supplying power to solenoid")
+
+            elif state == S0_START:
+                f = open(self.filename, 'rb')
+                magic, self.frames, period = struct.unpack(HEADER,
+                    f.read(struct.calcsize(HEADER)))
+                if magic != MAGIC:
+                    raise ValueError("Not a job file: " + self.filename)
+                self.solenoid.pull_up()
+
+                # Nothing is buffered yet
+                count = 0
+                index = 0
+                start = cotask.clock.ticks_ms()
+                state = S1_PLAY
+
+            elif state == S1_PLAY:
+                now = cotask.clock.ticks_diff(cotask.clock.ticks_ms(), start)
+                frame = None
+                while True:
+                    if index == count:
+                        count = f.readinto(self.buf)//RECORD_SIZE
+                        index = 0
+                        if count == 0:
+                            break
+                    record = struct.unpack_from(RECORD, self.buf, index*RECORD_SIZE)
+                    if record[0] > now:
+                        break
+                    if frame is not None:
+                        self.skipped += 1
+                    frame = record
+                    index += 1
+
+                if frame is not None:
+                    self.played += 1
+                    t, a1, a2, a3, pen_down = frame
+                    self.theta1_queue.put(a1/ANGLE_SCALE)
+                    self.theta2_queue.put(a2/ANGLE_SCALE)
+                    self.theta3_queue.put(a3/ANGLE_SCALE)
+                    if pen_down != pen:
+                        pen = pen_down
+                        if pen:
+                            self.solenoid.push_down()
+                        else:
+                            self.solenoid.pull_up()
+
+                if count == 0:
+                    f.close()
+                    self.solenoid.pull_up()
+                    print("Job complete")
+                    state = S2_DONE
+
+            yield(state)
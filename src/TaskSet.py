@@ -0,0 +1,151 @@
+'''!
+@file       taskSet.py
+@brief      Creates the shares and the task table of the drawing robot
+@details    main.py and simRobot.py build the robot's tasks from the same
+            functions here, so the simulation runs the task set of the robot
+            rather than a copy of it. The hardware dependent parts, the joint
+            tasks and the touchpad task, are made by functions which can be
+            given: main.py uses the real tasks, and simRobot.py gives
+            functions which make the same tasks around simulated hardware.
+
+            The robot draws from one of three sources, checked in order:
+            - a compiled job, played straight into the joints by taskPlayback.py
+            - a drawing file, read by taskFile.py
+            - the touchpad, read by taskTouch.py
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+import pyb
+import task_share
+
+import Blender
+import JointTask
+import RoboMotorDriver
+import RoboSolenoidDriver
+import RoboTask
+import TaskFile
+import TaskPlayback
+import TaskTouch
+import TaskTrajectory
+
+## Period of the joint control loops, and of the trajectory task and job
+#  playback which set their setpoints, in milliseconds. jobCompiler.py
+#  samples jobs at this period
+JOINT_PERIOD = 10
+## Period of the touchpad scan in milliseconds
+TOUCH_PERIOD = 10
+## Period in milliseconds of the tasks which sample the drawing: inverse
+#  kinematics and file playback
+PATH_PERIOD = 50
+
+## Proportional gain of the joint controllers in [% duty cycle/degree]
+JOINT_KP = 0.9
+## Integral gain of the joint controllers in [% duty cycle * sec/degree]
+JOINT_KI = 0.05
+
+## Tolerance in inches of the touchpad path filter and the corner blending
+TOLERANCE = 0.02
+
+
+def make_shares():
+    '''!
+    @brief      Creates the shares and queues which connect the tasks
+    @return     A tuple (ready, points, targets, thetas, speeds): the share
+                which is 1 while the robot runs, the queue of (x, y, pen)
+                records of the positions to draw, a tuple of the three queues
+                of joint target angles from the inverse kinematics, and tuples
+                of the three mailboxes of joint setpoints and of joint speeds
+                from the trajectory task
+    '''
+    # Queue of (x, y, pen) records of the positions to draw, from the
+    # touchpad or a drawing file
+    points = task_share.RecordQueue('f', 3, 100, thread_protect = False, name = "points")
+
+    # Share to synchronize start, stop of drawing
+    ready = task_share.Share('i', thread_protect = False, name = "drawing")
+    ready.put(1)
+
+    # Queues for joint target angles from the inverse kinematics
+    targets = tuple(task_share.Queue('f', 100, thread_protect = False, name = "target_" + str(n),
+                                     overwrite = True) for n in (1, 2, 3))
+
+    # Mailboxes for joint setpoints from the trajectory task, so the joint
+    # tasks always use the newest setpoint
+    thetas = tuple(task_share.Mailbox('f', name = "theta_" + str(n)) for n in (1, 2, 3))
+
+    # Mailboxes for the joint speeds along the planned moves, which the joint
+    # tasks feed forward
+    speeds = tuple(task_share.Mailbox('f', name = "speed_" + str(n)) for n in (1, 2, 3))
+
+    return ready, points, targets, thetas, speeds
+
+
+def make_table(shares, brain, job_file=None, drawing_file=None, workspace=None,
+               make_joint=JointTask.JointTask, make_touch=TaskTouch.TaskTouch,
+               start=JointTask.HOME):
+    '''!
+    @brief              Creates the task table of the robot
+    @details            The table is in the order the task objects are created,
+                        to be given to TaskTable.build(). The joint control
+                        loops and the trajectory which feeds them setpoints run
+                        fastest; the inverse kinematics and file playback run
+                        at the rate the drawing is sampled.
+    @param shares       The tuple returned by make_shares()
+    @param brain        The RoboBrain object used for the inverse kinematics
+    @param job_file     The name of a compiled job to play back, or None
+    @param drawing_file The name of a drawing file to draw, or None to draw
+                        from the touchpad. Not used if a job is given
+    @param workspace    An optional RoboWorkspace.WorkspaceIndex given to RoboTask
+    @param make_joint   The function which makes each joint task, called with
+                        the arguments of JointTask.JointTask
+    @param make_touch   The function which makes the touchpad task, called with
+                        the arguments of TaskTouch.TaskTouch
+    @param start        The joint setpoints when the tasks start, in degrees.
+                        Defaults to where calibration leaves the joints
+    @return             A list of task description dictionaries
+    '''
+    ready, points, targets, thetas, speeds = shares
+    table = []
+    # Played back jobs have no planned speeds to feed forward
+    joint_speeds = (None, None, None)
+    if job_file is not None:
+        # A compiled job feeds the joints directly, without inverse kinematics
+        pinA8 = pyb.Pin(pyb.Pin.board.PA8, pyb.Pin.OUT_PP)
+        pinB10 = pyb.Pin(pyb.Pin.board.PB10, pyb.Pin.OUT_PP)
+        solenoid = RoboSolenoidDriver.RoboSolenoidDriver(pinA8, pinB10, 2, 3)
+        table.append({'name': 'Task4_B', 'make': TaskPlayback.TaskPlayback,
+                      'args': (ready, job_file, solenoid) + thetas,
+                      'priority': 3, 'period': JOINT_PERIOD})
+    else:
+        # Blend the corners between positions, stepping once per task period
+        blend = Blender.LookAhead(PATH_PERIOD/1000, tolerance = TOLERANCE)
+        table.append({'name': 'Task4_B', 'make': RoboTask.RoboTask,
+                      'args': (ready, brain, points) + targets,
+                      'kwargs': {'workspace': workspace, 'lift_idle': drawing_file is None,
+                                 'blend': blend},
+                      'priority': 3, 'period': PATH_PERIOD})
+        if drawing_file is None:
+            table.append({'name': 'Task5', 'make': make_touch,
+                          'args': (ready, points),
+                          'kwargs': {'tolerance': TOLERANCE},
+                          'priority': 4, 'period': TOUCH_PERIOD})
+        else:
+            table.append({'name': 'Task5', 'make': TaskFile.TaskFile,
+                          'args': (ready, drawing_file, points),
+                          'priority': 4, 'period': PATH_PERIOD})
+        table.append({'name': 'Task6_T', 'make': TaskTrajectory.TaskTrajectory,
+                      'args': (ready,) + targets + thetas + (JOINT_PERIOD,),
+                      'kwargs': {'target_period': PATH_PERIOD, 'speeds': speeds,
+                                 'duty_limit': RoboMotorDriver.RoboMotorDriver.duty_limit,
+                                 'start': tuple(start)},
+                      'priority': 3, 'period': JOINT_PERIOD})
+        joint_speeds = speeds
+    for n in (1, 2, 3):
+        table.append({'name': 'Task1_J' + str(n), 'make': make_joint,
+                      'args': (ready, n, n, JOINT_KP, JOINT_KI, start[n - 1], thetas[n - 1]),
+                      'kwargs': {'speed_box': joint_speeds[n - 1]},
+                      'priority': 2, 'period': JOINT_PERIOD})
+    return table
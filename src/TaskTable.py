@@ -0,0 +1,169 @@
+'''!
+@file       taskTable.py
+@brief      Builds the cotask task list from a table of task descriptions
+@details    Each task is described by a dictionary rather than by code, so the
+            rate of every task is set in one place:
+            @code
+            table = [{'name': 'Task1_J1', 'make': JointTask.JointTask,
+                      'args': (ready, 1, 1, 0.9, 0.05, 0, theta_1),
+                      'priority': 2, 'period': 10},
+                     ...]
+            tasks = TaskTable.build(table)
+            @endcode
+            | Key      | Meaning |
+            |:---------|:--------|
+            | name     | Name of the cotask.Task |
+            | make     | Class or function which creates the task object, whose run() method is the task's generator |
+            | args     | Tuple of positional arguments for make (optional) |
+            | kwargs   | Dictionary of keyword arguments for make (optional) |
+            | priority | Task priority |
+            | period   | Task period in milliseconds |
+            | profile  | True to profile the task (optional, default True) |
+            | trace    | Passed to cotask.Task (optional, default False) |
+
+            Task objects are created in the order of the table, so tasks which
+            calibrate hardware when they are created do so in that order.
+
+            report() compares the measured run times in the task profiles
+            with the task periods, to show how far the task rates can be
+            raised before the processor can't keep up. It only reads the
+            profiles, so main.py runs it on the robot once the tasks have run
+            for a few seconds. check() runs the tasks for a short time first
+            and then reports; since it runs the real tasks, it is meant for
+            simRobot.py, where the hardware is simulated.
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+import cotask
+
+## Largest total of average run time over period accepted by check() and report()
+MAX_UTILIZATION = 0.7
+
+## Time in seconds main.py lets the tasks run before checking their run times
+CHECK_SECONDS = 3
+
+
+def build(table, task_list=None):
+    '''!
+    @brief              Creates the task objects and tasks of a table
+    @param table        A list of task description dictionaries
+    @param task_list    The cotask.TaskList to add the tasks to. Defaults to
+                        cotask.task_list
+    @return             A dictionary from each task's name to a tuple
+                        (task object, cotask.Task)
+    '''
+    if task_list is None:
+        task_list = cotask.task_list
+    tasks = {}
+    for entry in table:
+        obj = entry['make'](*entry.get('args', ()), **entry.get('kwargs', {}))
+        task = cotask.Task(obj.run, name = entry['name'],
+                           priority = entry['priority'],
+                           period = entry['period'],
+                           profile = entry.get('profile', True),
+                           trace = entry.get('trace', False))
+        task_list.append(task)
+        tasks[entry['name']] = (obj, task)
+    return tasks
+
+
+def tick_freq(table):
+    '''!
+    @brief          Finds the timer tick frequency which fits every period
+    @details        The tick period is the greatest common divisor of the task
+                    periods, so every task runs on a whole number of ticks.
+    @param table    A list of task description dictionaries
+    @return         The tick frequency in Hz
+    '''
+    tick = 0
+    for entry in table:
+        period = int(entry['period'])
+        while period:
+            tick, period = period, tick % period
+    return 1000 // tick if tick else 0
+
+
+def utilization(task_list=None):
+    '''!
+    @brief              Compares each task's measured run time with its period
+    @param task_list    The cotask.TaskList to check. Defaults to cotask.task_list
+    @return             A tuple (rows, average, worst) where rows is a list of
+                        (name, period, average run time, longest run time)
+                        tuples in milliseconds, average is the sum of average
+                        run time over period, and worst is the sum of longest
+                        run time over period
+    '''
+    if task_list is None:
+        task_list = cotask.task_list
+    rows = []
+    average = 0
+    worst = 0
+    for prof in task_list.get_profiles():
+        if prof['period'] is None or not prof['runs'] or prof['avg_dur'] is None:
+            continue
+        period = prof['period']/1000
+        avg = prof['avg_dur']/1000
+        longest = prof['max_dur']/1000
+        rows.append((prof['name'], period, avg, longest))
+        average += avg/period
+        worst += longest/period
+    return rows, average, worst
+
+
+def check(seconds=2.0, limit=MAX_UTILIZATION, task_list=None):
+    '''!
+    @brief              Runs the tasks for a while and checks the processor can keep up
+    @details            Runs the scheduler for the given time the way main.py
+                        does, prints each task's share of the processor, and
+                        resets the profiles so the measurement doesn't carry
+                        into later running. This runs the real tasks; call it
+                        from simRobot.py, and use report() on the robot.
+                        The processor can keep up if the sum of average run
+                        time over period is below the limit; the sum of the
+                        longest run times shows how much the tasks may be late
+                        when they all run at once.
+    @param seconds      How long to run the tasks in seconds
+    @param limit        The largest acceptable sum of average run time over period
+    @param task_list    The cotask.TaskList to check. Defaults to cotask.task_list
+    @return             True if the tasks fit within the limit
+    '''
+    if task_list is None:
+        task_list = cotask.task_list
+    task_list.reset_profiles()
+    start = cotask.clock.ticks_ms()
+    while cotask.clock.ticks_diff(cotask.clock.ticks_ms(), start) < seconds*1000:
+        task_list.edf_sched()
+        task_list.idle()
+
+    ok = report(limit, task_list)
+    task_list.reset_profiles()
+    return ok
+
+
+def report(limit=MAX_UTILIZATION, task_list=None):
+    '''!
+    @brief              Prints each task's share of the processor from its profile
+    @details            Only reads the profiles the scheduler has gathered, so
+                        it is safe to call while the robot runs. main.py calls
+                        it once the tasks have run for CHECK_SECONDS, to warn
+                        if the measured run times don't fit the task periods.
+    @param limit        The largest acceptable sum of average run time over period
+    @param task_list    The cotask.TaskList to check. Defaults to cotask.task_list
+    @return             True if the tasks fit within the limit
+    '''
+    rows, average, worst = utilization(task_list)
+    print("TASK            PERIOD  AVG DUR  MAX DUR    SHARE")
+    for name, period, avg, longest in rows:
+        print("{:<16s}{:6.1f}{:9.3f}{:9.3f}{:8.1f}%".format(
+              name, period, avg, longest, 100*avg/period))
+    print("Total {:.1f}% average, {:.1f}% if every task takes its longest".format(
+          100*average, 100*worst))
+
+    if average > limit:
+        print("WARNING: tasks use more than {:.0f}% of the processor; lower the task rates".format(
+              100*limit))
+        return False
+    return True
@@ -13,33 +13,54 @@
 import pyb
 import utime
 import TouchDriver
+import PathFilter
 
 class TaskTouch:
     '''!
         @brief       instantiates self object of Touch Panel tasks
     '''
 
-    def __init__(self, ready, touchpad_x, touchpad_y):
+    def __init__(self, ready, points, tolerance=None, panel=None):
         '''!
             @brief Assigns shared communication variables to be accessible locally and instantiates
                    touch panel driver for touch panel interfacing.
             @param ready       The task_share.Share corresponding to whether or not the touchpanel
                                should be recording data because the robot is READY to draw
-            @param touchpad_x  The task_share.Queue corresponding to x_coordinate in inches on the
-                               coordinate system of the drawing area of the 3RRR robot
-            @param touchpad_y  The task_share.Queue corresponding to y_coordinate in inches on the
-                               coordinate system of the drawing area of the 3RRR robot
+            @param points      The task_share.RecordQueue of (x, y, pen) records, with x and y
+                               in inches on the coordinate system of the drawing area of the
+                               3RRR robot
+            @param tolerance   If given, points are passed through a PathFilter with this
+                               tolerance in inches, so points along straight lines or
+                               from a resting finger are dropped
+            @param panel       The touch panel driver, anything with a scan_all() method like
+                               TouchDriver's. If not given, the touch panel of the robot is
+                               set up and calibrated
         '''
         self.ready = ready
-        self.touchpad_x = touchpad_x
-        self.touchpad_y = touchpad_y
-        self.TouchPanel = TouchDriver.TouchDriver(pyb.Pin.board.PC3, pyb.Pin.board.PC0, pyb.Pin.board.PC2, pyb.Pin.board.PB0)
-        self.TouchPanel.calibrate()
+        self.points = points
+        if panel is None:
+            panel = TouchDriver.TouchDriver(pyb.Pin.board.PC3, pyb.Pin.board.PC0, pyb.Pin.board.PC2, pyb.Pin.board.PB0)
+            panel.calibrate()
+        self.TouchPanel = panel
+        
+        if tolerance is None:
+            self.filter = None
+        else:
+            self.filter = PathFilter.PathFilter(tolerance)
+        
+        # Record put into the queue for each point, made once so putting a
+        # point doesn't allocate memory. The pen draws wherever the finger
+        # touches, but the pen is moved up to the first point of each stroke,
+        # so the move from the end of the last stroke isn't drawn
+        self.record = [0, 0, 0]
+        
+        # Number of points dropped because the queue was full
+        self.overflow = 0
 
     def run(self):
         '''!
             @brief    Used by the task scheduler to run continuously while robot operates
-            @details  Constantly scans the touchpad for user input, transforms coordinates, and places in queues
+            @details  Constantly scans the touchpad for user input, transforms coordinates, and places in a queue
                       which the brain uses to compute inverse kinematics
         '''
         
@@ -48,8 +69,35 @@ class TaskTouch:
         while True:
             # scans the touch panel contact is tuple: (x_coordinate (mm), y_coordinate (mm), touched or not? (binary))
             contact = self.TouchPanel.scan_all()
-            # if touch panel is being touched, add x and y coordinates to their respective queues
+            # if touch panel is being touched, add the x and y coordinates to the queue
             if contact[2]:
-                self.touchpad_x.put(contact[0]/15 + 8.875)
-                self.touchpad_y.put(contact[1]/15 + 5.124)
+                x = contact[0]/15 + 8.875
+                y = contact[1]/15 + 5.124
+                if self.filter is None:
+                    self.put(x, y)
+                elif self.filter.add(x, y):
+                    self.put(self.filter.x, self.filter.y)
+            else:
+                # when the finger is lifted, send the last point of the stroke
+                if self.filter is not None and self.filter.flush():
+                    self.put(self.filter.x, self.filter.y)
+                # the next stroke starts with a pen up move
+                self.record[2] = 0
             yield(0)
+
+    def put(self, x, y):
+        '''!
+            @brief    Puts a point into the queue unless it is full
+            @details  Waiting for room would stop every task, so points that arrive
+                      faster than the robot can draw them are dropped and counted.
+                      The first point put after the finger touches down is moved
+                      to with the pen up, and the points after it with the pen down
+            @param x  The x_coordinate in inches
+            @param y  The y_coordinate in inches
+        '''
+        self.record[0] = x
+        self.record[1] = y
+        if self.points.try_put_from(self.record):
+            self.record[2] = 1
+        else:
+            self.overflow += 1
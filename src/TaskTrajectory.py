@@ -0,0 +1,146 @@
+'''!
+@file       taskTrajectory.py
+@brief      Turns target joint angles into smooth setpoints for the joint tasks
+@details    RoboTask puts the joint angles of each new target into a set of
+            target queues. This task plans a synchronized, acceleration limited
+            move to each target with trajectory.py and samples it every time
+            it runs, putting the setpoints into the theta mailboxes read by the
+            joint tasks. The targets come once per period of the inverse
+            kinematics task, so moves short enough to finish before the next
+            target comes are ramped in at a steady speed over that time, and a
+            stream of close targets is followed smoothly rather than in steps.
+            A target which is waiting when a move ends starts where that move
+            ended, so the stream keeps its pace. The joint speeds along the
+            move are put into a set of speed mailboxes, which the joint tasks
+            feed forward.
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+import cotask
+import Trajectory
+
+S0_IDLE = 0
+S1_MOVE = 1
+
+class TaskTrajectory:
+    '''!
+    @brief This class implements a task that streams planned joint setpoints
+    '''
+
+    def __init__ (self, ready, target_1, target_2, target_3, queue_th1, queue_th2, queue_th3,
+                  period, target_period=None, speeds=None, duty_limit=100,
+                  accel=Trajectory.MAX_ACCEL, start=(0, 0, 0)):
+        '''!
+        @brief              Creates a TaskTrajectory object
+        @param ready        A task_share.Share used to stop motion when the robot is shut down
+        @param target_1     The task_share.Queue of target angles for joint 1
+        @param target_2     The task_share.Queue of target angles for joint 2
+        @param target_3     The task_share.Queue of target angles for joint 3
+        @param queue_th1    The task_share.Mailbox of setpoints for joint 1
+        @param queue_th2    The task_share.Mailbox of setpoints for joint 2
+        @param queue_th3    The task_share.Mailbox of setpoints for joint 3
+        @param period       The period the task is run at in milliseconds
+        @param target_period The time between targets in milliseconds, the period
+                            of the task putting them. Defaults to period
+        @param speeds       An optional tuple of the three task_share.Mailbox
+                            objects the joint speeds in [degree/s] are put into
+        @param duty_limit   The motor duty cycle limit in percent, used to find
+                            the joint speed limit
+        @param accel        The joint acceleration limit in [degree/s^2]
+        @param start        The joint setpoints when the task starts, in degrees
+        '''
+        self.ready = ready
+        self.targets = (target_1, target_2, target_3)
+        self.thetas = (queue_th1, queue_th2, queue_th3)
+        self.speeds = speeds
+
+        self.profile = Trajectory.Trapezoid(Trajectory.max_speed(duty_limit), accel)
+
+        # Moves no longer than this many degrees are ramped in over the time
+        # until the next target, in seconds
+        if target_period is None:
+            target_period = period
+        self.ramp_time = target_period/1000
+        self.small_move = self.profile.speed*self.ramp_time
+
+        # Current setpoints, joint speeds, and the next target
+        self.setpoint = list(start)
+        self.speed = [0, 0, 0]
+        self.target = [0, 0, 0]
+
+        # Time the current move started and its duration in microseconds
+        self.move_start = 0
+        self.move_time = 0
+
+        # Number of planned moves and moves ramped in
+        self.moves = 0
+        self.ramps = 0
+
+    def run(self):
+        '''!
+        @brief      Generator which streams setpoints to the joint tasks
+        @details    Waits for a target, plans a move to it, and puts a setpoint
+                    for each joint every time it runs until the move is done.
+        '''
+
+        clock = cotask.clock
+        state = S0_IDLE
+
+        while True:
+
+            if self.ready.get() == 0:
+                state = S0_IDLE
+
+            else:
+                now = clock.ticks_us()
+                ended = False
+                if state == S1_MOVE and clock.ticks_diff(now, self.move_start) >= self.move_time:
+                    self._put(self.target)
+                    self.move_start = clock.ticks_add(self.move_start, self.move_time)
+                    ended = True
+                    state = S0_IDLE
+
+                if state == S0_IDLE and self.targets[0].any():
+                    for n in range(3):
+                        self.target[n] = self.targets[n].get()
+
+                    self.profile.plan(self.setpoint, self.target)
+                    if self.profile.length <= self.small_move:
+                        self.ramps += 1
+                        self.profile.ramp(self.setpoint, self.target, self.ramp_time)
+                    else:
+                        self.moves += 1
+                    if not ended:
+                        self.move_start = now
+                    self.move_time = int(self.profile.duration*1000000)
+                    state = S1_MOVE
+
+                if state == S1_MOVE:
+                    t = clock.ticks_diff(now, self.move_start)/1000000
+                    self._put(self.profile.sample(t, self.setpoint))
+                    self._put_speed(self.profile.velocity(t, self.speed))
+                elif ended:
+                    self._put_speed((0, 0, 0))
+
+            yield(state)
+
+    def _put(self, angles):
+        '''!
+        @brief          Puts a setpoint for each joint into the theta mailboxes
+        @param angles   A sequence of the three joint angles in degrees
+        '''
+        for n in range(3):
+            self.setpoint[n] = angles[n]
+            self.thetas[n].put(angles[n])
+
+    def _put_speed(self, speeds):
+        '''!
+        @brief          Puts a speed for each joint into the speed mailboxes, if given
+        @param speeds   A sequence of the three joint speeds in [degree/s]
+        '''
+        if self.speeds is not None:
+            for n in range(3):
+                self.speeds[n].put(speeds[n])
@@ -14,9 +14,17 @@
 
 from pyb import Pin, ADC
 import utime
-from ulab import numpy as np
 import os
 
+# Array math for calibration: ulab on the board, NumPy on a PC
+try:
+    from ulab import numpy as np
+except ImportError:
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+
 class TouchDriver:
     
     '''!
@@ -0,0 +1,115 @@
+'''!
+@file       traceDecode.py
+@brief      Turns a binary task trace dump into a timeline on a PC
+@details    Reads a file written by cotask.TaskList.dump_trace(), puts each
+            task's records back in order, and finds the time of every state
+            transition. All tasks' traces end at the time of their newest
+            record, measured with the same microsecond timer, and every
+            header holds the time the dump was written. The timer wraps
+            around, so each newest record is taken to be the last time its
+            timer value came before the dump, and the transitions of every
+            task can be merged into one timeline. Times are shown in
+            milliseconds, counted from the first transition in the dump.
+            @code
+            python traceDecode.py trace.bin
+            @endcode
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+import array
+import struct
+import sys
+
+import HostShim
+HostShim.install()
+
+import cotask
+
+## Period of the board's microsecond timer, which wraps around
+TICKS_PERIOD = 1 << 30
+
+
+def read_traces(filename):
+    '''!
+    @brief          Reads every task trace in a dump
+    @param filename The name of the dump file
+    @return         A list of (name, records, lost) tuples, where records is
+                    a list of (time, from_state, to_state) tuples in order with
+                    times in microseconds, unwrapped so that the dump was
+                    written at the board's timer value in its header, and lost
+                    is the number of older records which were overwritten
+    @throws ValueError  If the file isn't a trace dump
+    '''
+    size_header = struct.calcsize(cotask.TRACE_HEADER)
+    traces = []
+    with open(filename, 'rb') as f:
+        while True:
+            header = f.read(size_header)
+            if not header:
+                break
+            if len(header) < size_header:
+                raise ValueError("Dump ends in the middle of a trace")
+            magic, name_len, size, next_index, count, last, now = struct.unpack(
+                cotask.TRACE_HEADER, header)
+            if magic != cotask.TRACE_MAGIC:
+                raise ValueError("Not a trace dump: " + filename)
+            name = f.read(name_len).decode()
+
+            times = array.array('I', f.read(4*size))
+            froms = array.array('H', f.read(2*size))
+            tos = array.array('H', f.read(2*size))
+            if sys.byteorder != 'little':
+                for a in (times, froms, tos):
+                    a.byteswap()
+
+            if count <= size:
+                order = list(range(count))
+            else:
+                order = list(range(next_index, size)) + list(range(next_index))
+
+            # The newest record came at most one timer period before the dump.
+            # Work backwards from it to find each time
+            records = []
+            t = now - (now - last) % TICKS_PERIOD
+            for index in reversed(order):
+                records.append((t, froms[index], tos[index]))
+                t -= times[index]
+            records.reverse()
+            traces.append((name, records, max(count - size, 0)))
+    return traces
+
+
+def timeline(traces):
+    '''!
+    @brief          Merges task traces into one timeline
+    @param traces   A list of traces from read_traces()
+    @return         A list of (time, name, from_state, to_state) tuples sorted
+                    by time, with times in milliseconds from the first
+                    transition
+    '''
+    # Times were unwrapped against the one time the dump was written
+    events = []
+    for name, records, lost in traces:
+        for t, from_state, to_state in records:
+            events.append((t, name, from_state, to_state))
+    if not events:
+        return []
+    events.sort(key=lambda e: e[0])
+    start = events[0][0]
+    return [((t - start)/1000, name, a, b) for t, name, a, b in events]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python traceDecode.py trace.bin")
+        sys.exit(1)
+    traces = read_traces(sys.argv[1])
+    for name, records, lost in traces:
+        print("{:<16s}{:6d} transitions, {:d} overwritten".format(
+              name, len(records), lost))
+    print()
+    for t, name, from_state, to_state in timeline(traces):
+        print("{:12.3f} ms  {:<16s}{:3d} -> {:d}".format(t, name, from_state, to_state))
@@ -0,0 +1,240 @@
+'''!
+@file       trajectory.py
+@brief      Plans synchronized joint motions between target poses
+@details    A move from one set of joint angles to the next is planned as a
+            trapezoidal velocity profile: the joints speed up at a limited
+            acceleration, coast at a limited speed, and slow down to stop at
+            the target. The profile is planned for the joint with the longest
+            move and the other joints are scaled to it, so all three joints
+            start and finish together and the platform moves along a straight
+            line in joint space. Each joint turns the short way around to its
+            new angle.
+
+            The speed limit is found from RoboMotorDriver.duty_limit and the
+            joint speed at full duty cycle, leaving some duty cycle for the
+            controller to correct errors with. The joint speeds along the
+            profile are fed forward to the joint controllers, as the duty
+            cycle which would turn the joint at that speed. The joint speed is measured on
+            the robot by speedCal.py, which saves it to SPEED_FILE, and
+            main.py loads it with load_speed() before the tasks are made.
+@author     Jonathan Cederquist
+@author     Tim Jain
+@author     Philip Pang
+@date       Last Modified 3/15/22
+'''
+
+import math
+
+## Joint speed at 100% duty cycle in [degree/s], used until load_speed()
+#  reads a measured speed. This default is not measured: the motors are
+#  rated at 83 rpm (498 degree/s) with no load, and the loaded joints are
+#  guessed to run at about 70% of that.
+FULL_DUTY_SPEED = 360
+
+## File holding the joint speed at 100% duty cycle measured by speedCal.py
+SPEED_FILE = "joint_speed.txt"
+
+## Fraction of the duty cycle limit used for planned motion. The rest is
+#  left for the controller.
+SPEED_MARGIN = 0.6
+
+## Joint acceleration limit in [degree/s^2]
+MAX_ACCEL = 1200
+
+
+def load_speed(filename=SPEED_FILE):
+    '''!
+    @brief          Loads the joint speed measured by speedCal.py
+    @details        Sets FULL_DUTY_SPEED, which every speed limit found by
+                    max_speed() afterwards is based on. If the file hasn't
+                    been written, the default is kept.
+    @param filename The name of the file written by speedCal.py
+    @return         True if a measured speed was loaded
+    '''
+    global FULL_DUTY_SPEED
+    try:
+        with open(filename, 'r') as f:
+            FULL_DUTY_SPEED = float(f.read())
+    except OSError:
+        return False
+    return True
+
+
+def max_speed(duty_limit=100):
+    '''!
+    @brief              Finds the joint speed limit used for planning
+    @param duty_limit   The motor duty cycle limit in percent, normally
+                        RoboMotorDriver.RoboMotorDriver.duty_limit
+    @return             The speed limit in [degree/s]
+    '''
+    return SPEED_MARGIN*FULL_DUTY_SPEED*duty_limit/100
+
+
+def wrap_delta(start, end):
+    '''!
+    @brief          Finds the short way around from one angle to another
+    @param start    The starting angle in degrees
+    @param end      The ending angle in degrees
+    @return         The signed change in angle, between -180 and 180 degrees
+    '''
+    return (end - start + 180) % 360 - 180
+
+
+class Trapezoid:
+    '''!
+    @brief This class holds a synchronized trapezoidal profile for the three joints
+    '''
+
+    def __init__ (self, speed, accel):
+        '''!
+        @brief          Creates a Trapezoid object with no motion planned
+        @param speed    The joint speed limit in [degree/s]
+        @param accel    The joint acceleration limit in [degree/s^2]
+        '''
+        self.speed = speed
+        self.accel = accel
+
+        # Starting angles and signed changes in angle of the move
+        self.start = [0, 0, 0]
+        self.delta = [0, 0, 0]
+
+        # Length of the longest joint move in degrees
+        self.length = 0
+
+        # Acceleration time, coasting time, total time [s], and peak speed [degree/s]
+        self.t_accel = 0
+        self.t_coast = 0
+        self.duration = 0
+        self.peak = 0
+
+    def plan(self, start, end):
+        '''!
+        @brief          Plans a move between two sets of joint angles
+        @param start    A sequence of the three starting joint angles in degrees
+        @param end      A sequence of the three target joint angles in degrees
+        @return         The duration of the move in seconds
+        '''
+        return self.plan_length(self._set_move(start, end))
+
+    def ramp(self, start, end, duration):
+        '''!
+        @brief          Plans a move between two sets of joint angles at a steady speed
+        @details        Used for moves short enough to finish before the next
+                        target comes, so a stream of close targets is followed
+                        at the speed the targets move rather than in steps.
+        @param start    A sequence of the three starting joint angles in degrees
+        @param end      A sequence of the three target joint angles in degrees
+        @param duration The duration of the move in seconds
+        @return         The duration of the move in seconds
+        '''
+        self.length = self._set_move(start, end)
+        self.t_accel = 0
+        self.t_coast = duration
+        self.peak = self.length/duration
+        self.duration = duration
+        return duration
+
+    def _set_move(self, start, end):
+        '''!
+        @brief          Sets the starting angles and changes in angle of a move
+        @param start    A sequence of the three starting joint angles in degrees
+        @param end      A sequence of the three target joint angles in degrees
+        @return         The length of the longest joint move in degrees
+        '''
+        length = 0
+        for n in range(3):
+            self.start[n] = start[n]
+            self.delta[n] = wrap_delta(start[n], end[n])
+            if abs(self.delta[n]) > length:
+                length = abs(self.delta[n])
+        return length
+
+    def plan_length(self, length):
+        '''!
+        @brief          Plans the profile of a move of a given length
+        @details        Used by plan(), and on its own to time moves along
+                        other paths, using fraction() to find how far along
+                        the path to be.
+        @param length   The length of the move, in the units of the limits
+        @return         The duration of the move in seconds
+        '''
+        self.length = length
+
+        # Moves too short to reach full speed have no coasting part
+        if length*self.accel >= self.speed*self.speed:
+            self.t_accel = self.speed/self.accel
+            self.t_coast = length/self.speed - self.t_accel
+            self.peak = self.speed
+        else:
+            self.t_accel = math.sqrt(length/self.accel)
+            self.t_coast = 0
+            self.peak = self.accel*self.t_accel
+        self.duration = 2*self.t_accel + self.t_coast
+        return self.duration
+
+    def fraction(self, t):
+        '''!
+        @brief      Finds how far along the move the joints are
+        @param t    The time since the start of the move in seconds
+        @return     The fraction of the move completed, from 0 to 1
+        '''
+        if self.length == 0 or t >= self.duration:
+            return 1
+        if t <= 0:
+            return 0
+        if t < self.t_accel:
+            s = 0.5*self.accel*t*t
+        elif t < self.t_accel + self.t_coast:
+            s = 0.5*self.peak*self.t_accel + self.peak*(t - self.t_accel)
+        else:
+            left = self.duration - t
+            s = self.length - 0.5*self.accel*left*left
+        return s/self.length
+
+    def sample(self, t, out):
+        '''!
+        @brief      Finds the joint angles at a time along the move
+        @param t    The time since the start of the move in seconds
+        @param out  A list which the three joint angles, between 0 and 360
+                    degrees, are written into
+        @return     The list given as out
+        '''
+        f = self.fraction(t)
+        for n in range(3):
+            out[n] = (self.start[n] + f*self.delta[n]) % 360
+        return out
+
+    def velocity(self, t, out):
+        '''!
+        @brief      Finds the joint speeds at a time along the move
+        @details    Used as the velocity feedforward of the joint controllers,
+                    so the controllers only have to correct errors.
+        @param t    The time since the start of the move in seconds
+        @param out  A list which the three signed joint speeds in [degree/s]
+                    are written into
+        @return     The list given as out
+        '''
+        if self.length == 0 or t <= 0 or t >= self.duration:
+            speed = 0
+        elif t < self.t_accel:
+            speed = self.accel*t
+        elif t < self.t_accel + self.t_coast:
+            speed = self.peak
+        else:
+            speed = self.accel*(self.duration - t)
+        for n in range(3):
+            out[n] = speed*self.delta[n]/self.length if speed else 0
+        return out
+
+
+if __name__ == "__main__":
+    profile = Trapezoid(max_speed(), MAX_ACCEL)
+    print("Speed limit: {:.1f} deg/s".format(profile.speed))
+    duration = profile.plan((350, 120, 240), (30, 100, 250))
+    print("Move takes {:.3f} s".format(duration))
+    angles = [0, 0, 0]
+    t = 0
+    while t < duration + 0.05:
+        profile.sample(t, angles)
+        print("{:6.3f} s: {:8.3f} {:8.3f} {:8.3f}".format(t, *angles))
+        t += 0.05
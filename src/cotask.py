@@ -28,9 +28,138 @@ ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
 SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
 
-import gc                              # Memory allocation garbage collector
+import array                           # Preallocated trace buffers
+import struct                          # Binary trace dumps
 import utime                           # Micropython version of time library
 import micropython                     # This shuts up incorrect warnings
+import machine                         # Used to sleep while no task is due
+
+
+## The number of state transitions kept by a task created with 
+#  @c trace=True
+TRACE_SIZE = 128
+
+## Identifies a task's transition trace in a binary dump
+TRACE_MAGIC = b'TRC2'
+
+## Layout of the header before each task's trace in a binary dump: magic, 
+#  length of the task name, number of records the buffer holds, index of the
+#  next record to be written, number of records written in all, the time of
+#  the newest record in microseconds, and the time the dump was written, 
+#  which is the same for every task in a dump. The name follows, then the 
+#  time since the previous transition of each record as @c I, then the 
+#  from-states and to-states as @c H
+TRACE_HEADER = '<4sBHHIII'
+
+## The number of bins in each run time and latency histogram. Bins are a 
+#  half power of two wide: bin 0 counts 0 us, bin 1 counts 1 us, and bins
+#  2n - 2 and 2n - 1 split the values from 2^(n - 1) to 2^n - 1 us. The 
+#  last bin also counts every longer time, from about 12 seconds up
+HIST_BINS = 48
+
+## The clock used for all task timing. It is @c utime unless another clock
+#  has been given to @c set_clock()
+clock = utime
+
+# The function which sleeps until the next interrupt, used by
+# @c TaskList.idle()
+_sleep = machine.idle
+
+
+def set_clock (new_clock = None):
+    """!
+    Change the clock used to time tasks.
+
+    Tasks are normally timed with @c utime and the scheduler sleeps with
+    @c machine.idle(). On a PC, a clock which only moves forward when the
+    scheduler sleeps, such as a @c HostShim.VirtualClock, lets a whole set
+    of tasks run for minutes of robot time in seconds, with the same timing
+    on every run. The clock should be set before tasks are created. Tasks
+    which read the time themselves should use @c cotask.clock rather than
+    @c utime so that they see the same time as the scheduler.
+    @param new_clock An object with the @c ticks_us(), @c ticks_ms(),
+           @c ticks_diff() and @c ticks_add() functions of @c utime and an
+           @c idle() function which waits like @c machine.idle(), or
+           @c None to go back to @c utime
+    """
+    global clock, _sleep
+    if new_clock is None:
+        clock = utime
+        _sleep = machine.idle
+    else:
+        clock = new_clock
+        _sleep = new_clock.idle
+
+
+@micropython.native
+def hist_bin (value):
+    """!
+    Find the histogram bin which counts a time. This takes the same few 
+    comparisons for any time, and allocates no memory.
+    @param value A time in microseconds
+    @return The index of the bin
+    """
+    if value < 2:
+        return value if value > 0 else 0
+    # Find n, the number of bits in the value
+    v = value
+    n = 1
+    if v >= 0x10000:
+        v >>= 16
+        n += 16
+    if v >= 0x100:
+        v >>= 8
+        n += 8
+    if v >= 0x10:
+        v >>= 4
+        n += 4
+    if v >= 0x4:
+        v >>= 2
+        n += 2
+    if v >= 0x2:
+        n += 1
+    # The bit after the highest picks the half of the octave
+    index = 2 * n - 2 + ((value >> (n - 2)) & 1)
+    if index >= HIST_BINS:
+        return HIST_BINS - 1
+    return index
+
+
+def bin_range (index):
+    """!
+    Find the times counted by a histogram bin.
+    @param index The index of the bin
+    @return A tuple (low, high) of the shortest and longest times in 
+            microseconds counted by the bin
+    """
+    if index < 2:
+        return index, index
+    n = index // 2 + 1
+    low = (2 + (index & 1)) << (n - 2)
+    return low, low + (1 << (n - 2)) - 1
+
+
+def percentile (hist, fraction):
+    """!
+    Estimate a percentile of the times counted in a histogram.
+    @param hist A histogram array of @c HIST_BINS counts
+    @param fraction The fraction of times which should be at or below the 
+           result, such as 0.95 for the 95th percentile
+    @return The longest time in microseconds counted by the bin holding the
+            percentile, or @c None if the histogram is empty
+    """
+    total = 0
+    for count in hist:
+        total += count
+    if total == 0:
+        return None
+    needed = fraction * total
+    running = 0
+    for index in range (HIST_BINS):
+        running += hist[index]
+        if running >= needed:
+            return bin_range (index)[1]
+    return bin_range (HIST_BINS - 1)[1]
 
 
 class Task:
@@ -88,8 +217,11 @@ class Task:
                The time can be given in a @c float or @c int; it will be 
                converted to microseconds for internal use by the scheduler.
         @param profile Set to @c True to enable run-time profiling 
-        @param trace Set to @c True to generate a list of transitions between
-               states. @b Note: This slows things down and allocates memory.
+        @param trace Set to @c True to record transitions between states in
+               a buffer of @c TRACE_SIZE records, or to a number of records
+               to use a buffer of that size. The buffer is allocated here 
+               and the oldest records are overwritten when it is full, so no
+               memory is allocated while the task runs.
         """
         # The function which is run to implement this task's code. Since it 
         # is a generator, we "run" it here, which doesn't actually run it but
@@ -110,30 +242,57 @@ class Task:
         #  @c go() method. 
         if period != None:
             self.period = int (period * 1000)
-            self._next_run = utime.ticks_us () + self.period
+            self._next_run = clock.ticks_us () + self.period
         else:
             self.period = period
             self._next_run = None
 
         # Flag which causes the task to be profiled, in which the execution
         #  time of the @c run() method is measured and basic statistics kept. 
+        #  Histograms of run times and latencies are allocated here so that
+        #  profiling doesn't allocate memory while running
         self._prof = profile
+        bins = HIST_BINS if profile else 0
+        self._dur_hist = array.array ('I', bytes (4 * bins))
+        self._late_hist = array.array ('I', bytes (4 * bins))
         self.reset_profile ()
 
         # The previous state in which the task last ran. It is used to watch
         # for and track state transitions.
         self._prev_state = 0
 
-        # If transition tracing has been enabled, create an empty list in 
-        # which to store transition (time, to-state) stamps
-        self._trace = trace
-        self._tr_data = []
-        self._prev_time = utime.ticks_us ()
+        # If transition tracing has been enabled, create a ring buffer in 
+        # which to store (time since the last transition, from-state, 
+        # to-state) records. States are stored as 16 bit numbers
+        if trace is True:
+            trace = TRACE_SIZE
+        self._trace = bool (trace)
+        size = int (trace) if trace else 0
+        self._tr_time = array.array ('I', bytes (4 * size))
+        self._tr_from = array.array ('H', bytes (2 * size))
+        self._tr_to = array.array ('H', bytes (2 * size))
+        self._tr_size = size
+        self._tr_next = 0
+        self._tr_count = 0
+        self._prev_time = clock.ticks_us ()
 
         ## Flag which is set true when the task is ready to be run by the
         #  scheduler
         self.go_flag = False
 
+        # Used when a hardware timer tick releases the task instead of the
+        # scheduler checking the time: whether the tick is in use, the number
+        # of ticks between runs, the ticks left until the next run, the time
+        # at which the tick last released the task, the deadline of that 
+        # release, and whether the task is in the task list's heap of
+        # released tasks
+        self._ticked = False
+        self._reload = 0
+        self._countdown = 0
+        self._released = 0
+        self._deadline = 0
+        self._queued = False
+
 
     def schedule (self) -> bool:
         """!
@@ -144,46 +303,47 @@ class Task:
 
         @return @c True if the task ran or @c False if it did not
         """
+        # Checking if the task is ready also takes its go flag
         if self.ready ():
 
-            # Reset the go flag for the next run
-            self.go_flag = False
-
             # If profiling, save the start time
             if self._prof:
-                stime = utime.ticks_us ()
+                stime = clock.ticks_us ()
 
             # Run the method belonging to the state which should be run next
             curr_state = next (self._run_gen)
 
             # If profiling or tracing, save timing data
             if self._prof or self._trace:
-                etime = utime.ticks_us ()
+                etime = clock.ticks_us ()
 
             # If profiling, save timing data
             if self._prof:
                 self._runs += 1
-                runt = utime.ticks_diff (etime, stime)
+                runt = clock.ticks_diff (etime, stime)
                 if self._runs > 2:
                     self._run_sum += runt
                     if runt > self._slowest:
                         self._slowest = runt
+                    self._dur_hist[hist_bin (runt)] += 1
 
-            # If transition logic tracing is on, record a transition; if not,
-            # ignore the state. If out of memory, switch tracing off and 
-            # run the memory allocation garbage collector
+            # If transition logic tracing is on, record a transition in the
+            # ring buffer, overwriting the oldest record if it is full
             if self._trace:
-                try:
-                    if curr_state != self._prev_state:
-                        self._tr_data.append (
-                            (utime.ticks_diff (etime, self._prev_time),
-                             curr_state))
-                except MemoryError:
-                    self._trace = False
-                    gc.collect ()
+                if curr_state != self._prev_state:
+                    index = self._tr_next
+                    self._tr_time[index] = clock.ticks_diff (etime, 
+                                                             self._prev_time)
+                    self._tr_from[index] = self._prev_state & 0xFFFF
+                    self._tr_to[index] = curr_state & 0xFFFF
+                    index += 1
+                    if index >= self._tr_size:
+                        index = 0
+                    self._tr_next = index
+                    self._tr_count += 1
+                    self._prev_time = etime
 
                 self._prev_state = curr_state
-                self._prev_time = etime
 
             return True
 
@@ -197,16 +357,29 @@ class Task:
         This method checks if the task is ready to run.
         If the task runs on a timer, this method checks what time it is; if not,
         this method checks the flag which indicates that the task is ready to
-        go. This method may be overridden in descendent classes to implement
-        some other behavior.
+        go. If the task is ready, the go flag is cleared with interrupts 
+        disabled, so that a release by an interrupt can't come between 
+        checking and clearing the flag and be lost. This method may be 
+        overridden in descendent classes to implement some other behavior.
         """
         # If this task uses a timer, check if it's time to run run() again. If
         # so, set go flag and set the timer to go off at the next run time
-        if self.period != None:
-            late = utime.ticks_diff (utime.ticks_us (), self._next_run)
+        if self._ticked:
+            # The timer tick sets the go flag; only the latency is measured
+            if not self.go_flag:
+                return False
+            if self._prof:
+                late = clock.ticks_diff (clock.ticks_us (), self._released)
+                self._late_sum += late
+                if late > self._latest:
+                    self._latest = late
+                self._late_hist[hist_bin (late)] += 1
+
+        elif self.period != None:
+            late = clock.ticks_diff (clock.ticks_us (), self._next_run)
             if late > 0:
                 self.go_flag = True
-                self._next_run = utime.ticks_diff (self.period, 
+                self._next_run = clock.ticks_diff (self.period, 
                                                    -self._next_run)
 
                 # If keeping a latency profile, record the data
@@ -214,9 +387,18 @@ class Task:
                     self._late_sum += late
                     if late > self._latest:
                         self._latest = late
-
-        # If the task doesn't use a timer, we rely on go_flag to signal ready
-        return self.go_flag
+                    self._late_hist[hist_bin (late)] += 1
+
+        # If the task doesn't use a timer, we rely on go_flag to signal ready.
+        # The flag is taken with interrupts off; a tick which comes before
+        # then finds the flag still set and counts an overrun
+        if self.go_flag:
+            irq_state = machine.disable_irq ()
+            go = self.go_flag
+            self.go_flag = False
+            machine.enable_irq (irq_state)
+            return go
+        return False
 
 
     def set_period (self, new_period):
@@ -242,30 +424,112 @@ class Task:
         self._slowest = 0
         self._late_sum = 0
         self._latest = 0
+        self._overruns = 0
+        for index in range (len (self._dur_hist)):
+            self._dur_hist[index] = 0
+            self._late_hist[index] = 0
+
+
+    def percentile (self, fraction, late = False):
+        """!
+        This method estimates a percentile of the task's run time or 
+        latency from its histogram. The estimate is the top of the histogram
+        bin holding the percentile, so it is high by up to a third.
+        @param fraction The fraction of runs which should take at most the
+               result, such as 0.99 for the 99th percentile
+        @param late @c True for latency, @c False for run time
+        @return The time in microseconds, or @c None if the task hasn't been
+                profiled
+        """
+        return percentile (self._late_hist if late else self._dur_hist, 
+                           fraction)
+
+
+    def get_profile (self):
+        """!
+        This method returns the task's profile as a dictionary so it can be 
+        saved or compared between runs. Times are in microseconds. 
+        Percentiles are @c None until the task has been profiled. The 
+        histograms are lists of counts, one for each bin; @c bin_range() 
+        gives the times each bin counts.
+        @return A dictionary of profiling results
+        """
+        prof = {'name': self.name,
+                'priority': self.priority,
+                'period': self.period,
+                'runs': self._runs,
+                'avg_dur': self._run_sum / self._runs if self._runs else None,
+                'max_dur': self._slowest,
+                'avg_late': self._late_sum / self._runs if self._runs else None,
+                'max_late': self._latest,
+                'overruns': self._overruns,
+                'dur_hist': list (self._dur_hist),
+                'late_hist': list (self._late_hist)}
+        for fraction, key in ((0.5, 'p50'), (0.95, 'p95'), (0.99, 'p99')):
+            prof['dur_' + key] = self.percentile (fraction)
+            prof['late_' + key] = self.percentile (fraction, late = True)
+        return prof
 
 
     def get_trace (self):
         """!
         This method returns a string containing the task's transition trace.
         The trace is a set of tuples, each of which contains a time and the
-        states from and to which the system transitioned. 
+        states from and to which the system transitioned. Only the records
+        still in the ring buffer are shown; times are counted from the 
+        oldest of them.
         @return A possibly quite large string showing state transitions
         """
         tr_str = 'Task ' + self.name + ':'
         if self._trace:
             tr_str += '\n'
-            last_state = 0
             total_time = 0.0
-            for item in self._tr_data:
-                total_time += item[0] / 1000000.0
+            for index in self._trace_order ():
+                total_time += self._tr_time[index] / 1000000.0
                 tr_str += '{: 12.6f}: {: 2d} -> {:d}\n'.format (total_time, 
-                    last_state, item[1])
-                last_state = item[1]
+                    self._tr_from[index], self._tr_to[index])
         else:
             tr_str += ' not traced'
         return (tr_str)
 
 
+    def _trace_order (self):
+        """!
+        Find the indices of the records in the trace buffer, oldest first.
+        @return A range of indices, or two joined ranges if the buffer has 
+                wrapped around
+        """
+        if self._tr_count <= self._tr_size:
+            return range (self._tr_count)
+        return list (range (self._tr_next, self._tr_size)) \
+            + list (range (self._tr_next))
+
+
+    def dump_trace (self, stream, now = None):
+        """!
+        This method writes the task's transition trace to a stream in binary.
+        The ring buffer is written as it is along with a header; the 
+        @c traceDecode.py program puts the records in order on a PC. Nothing 
+        is written if the task isn't traced.
+        @param stream A file or other stream opened for binary writing
+        @param now The time the dump is written in microseconds, the same 
+               for every task in one dump, against which the decoder 
+               unwraps the times of the records. Defaults to the present time
+        """
+        if not self._trace:
+            return
+        if now is None:
+            now = clock.ticks_us ()
+        name = self.name.encode ()[:255]
+        stream.write (struct.pack (TRACE_HEADER, TRACE_MAGIC, len (name), 
+                                   self._tr_size, self._tr_next, 
+                                   self._tr_count, self._prev_time, now))
+        stream.write (name)
+        stream.write (self._tr_time)
+        stream.write (self._tr_from)
+        stream.write (self._tr_to)
+
+
     def go (self):
         """!
         Method to set a flag so that this task indicates that it's ready to run.
@@ -296,6 +560,8 @@ class Task:
             if self.period != None:
                 rst += '{: 10.3f}{: 10.3f}'.format (avg_late, 
                                             self._latest / 1000.0)
+        if self._overruns:
+            rst += '  {:d} overruns'.format (self._overruns)
         return rst
 
 
@@ -327,6 +593,29 @@ class TaskList:
         #  that priority. 
         self.pri_list = []
 
+        ## A binary heap of the tasks which run on a timer, used by
+        #  @c edf_sched(). The task which should run soonest is first.
+        self.heap = []
+
+        ## The tasks which are run when their @c go() method is called
+        #  rather than on a timer, used by @c edf_sched()
+        self.triggered = []
+
+        ## The hardware timer whose interrupt releases timed tasks, or 
+        #  @c None if the scheduler checks the time instead
+        self.tick_timer = None
+
+        ## A binary heap of the tasks released by the timer tick, used by
+        #  @c edf_sched(). The task whose deadline comes first is first. The
+        #  list is made when the tick is started, with room for every timed
+        #  task, so the interrupt can add tasks without allocating memory
+        self.released = []
+        self._released_count = 0
+
+        # Time spent sleeping in @c idle() and total time measured, both in
+        # microseconds, and the time at which @c idle() last returned
+        self.reset_idle ()
+
 
     def append (self, task):
         """!
@@ -354,6 +643,15 @@ class TaskList:
         # Make sure the main list (of lists at each priority) is sorted
         self.pri_list.sort (key=lambda pri: pri[0], reverse=True)
 
+        # Also keep the task where the earliest deadline first scheduler 
+        # can find it
+        if task.period is None:
+            self.triggered.append (task)
+            self.triggered.sort (key=lambda t: t.priority, reverse=True)
+        else:
+            self.heap.append (task)
+            self._sift_up (len (self.heap) - 1)
+
 
     @micropython.native
     def rr_sched (self):
@@ -400,6 +698,390 @@ class TaskList:
                     return
 
 
+    @micropython.native
+    def edf_sched (self):
+        """!
+        Run tasks according to their deadlines.
+
+        This scheduler runs the task whose next run time came first, using
+        priorities only to choose between tasks due at the same time. Tasks
+        which run on a timer are kept in a binary heap sorted by their next
+        run times, so each call only checks the time of the first task in the
+        heap, and running a task takes time proportional to the logarithm of
+        the number of tasks rather than to the number of tasks. Tasks without
+        a period are run first whenever their go flag is set. 
+
+        With the timer tick running, the tick's interrupt puts each task it
+        releases into a second heap sorted by deadline, the release time 
+        plus the period. Each call takes the task whose deadline comes first
+        from that heap and runs it, again in time proportional to the 
+        logarithm of the number of tasks.
+
+        Tasks' periods should not be changed with @c set_period() while this
+        scheduler is in use, as a task's place in the heap would not be
+        updated.
+        """
+        for task in self.triggered:
+            if task.go_flag:
+                task.schedule ()
+                return
+
+        # With the timer tick running, run the released task whose deadline
+        # comes first. It is taken from the heap with interrupts off, as the
+        # tick adds to the heap. A task whose go flag has already been taken
+        # by another scheduler is passed over
+        if self.tick_timer is not None:
+            while self._released_count:
+                irq_state = machine.disable_irq ()
+                task = self._pop_released ()
+                machine.enable_irq (irq_state)
+                if task.schedule ():
+                    return
+            return
+
+        heap = self.heap
+        if heap:
+            task = heap[0]
+            if clock.ticks_diff (clock.ticks_us (), task._next_run) > 0:
+                # Running the task moves its next run time forward
+                task.schedule ()
+                self._sift_down (0)
+
+
+    def idle (self):
+        """!
+        Sleep until the next task is due to run.
+
+        This method finds the earliest time at which a task which runs on a
+        timer is next due, then sleeps with @c machine.idle() until that time.
+        The processor wakes from @c machine.idle() at every interrupt, so the
+        sleep also ends early if an interrupt service routine calls a
+        triggered task's @c go() method. This method should be called after
+        each call to the scheduler; it returns at once if a task is already
+        due. The time spent sleeping is kept so that @c idle_fraction() can
+        show how much of the processor's time the tasks leave unused. If a
+        clock has been given to @c set_clock(), its @c idle() function is
+        used in place of @c machine.idle().
+        """
+        start = clock.ticks_us ()
+        self._idle_total += clock.ticks_diff (start, self._idle_last)
+
+        # With the timer tick running, sleep until the tick releases a task
+        # or a triggered task's go flag is set. Tasks whose go flags have
+        # been taken by pri_sched() rather than edf_sched() are dropped from
+        # the heap of released tasks first
+        if self.tick_timer is not None:
+            while self._released_count and not self.released[0].go_flag:
+                irq_state = machine.disable_irq ()
+                self._pop_released ()
+                machine.enable_irq (irq_state)
+            now = start
+            while not self._released_count:
+                woken = False
+                for task in self.triggered:
+                    if task.go_flag:
+                        woken = True
+                if woken:
+                    break
+                _sleep ()
+                now = clock.ticks_us ()
+
+            slept = clock.ticks_diff (now, start)
+            self._idle_sum += slept
+            self._idle_total += slept
+            self._idle_last = now
+            return
+
+        # Every timed task is checked because pri_sched() doesn't keep the
+        # heap in order; there are only a few tasks and this runs once a sleep
+        deadline = None
+        for task in self.heap:
+            if deadline is None or clock.ticks_diff (task._next_run, 
+                                                     deadline) < 0:
+                deadline = task._next_run
+
+        # A task is ready once its run time has passed, so sleep until then
+        now = start
+        if deadline is not None:
+            while clock.ticks_diff (now, deadline) <= 0:
+                woken = False
+                for task in self.triggered:
+                    if task.go_flag:
+                        woken = True
+                if woken:
+                    break
+                _sleep ()
+                now = clock.ticks_us ()
+
+        slept = clock.ticks_diff (now, start)
+        self._idle_sum += slept
+        self._idle_total += slept
+        self._idle_last = now
+
+
+    def start_tick (self, timer):
+        """!
+        Release timed tasks from a hardware timer interrupt.
+
+        Once the tick is started, the timer's interrupt counts down the number
+        of ticks until each timed task's next run and calls the task's 
+        @c go() method when it reaches zero. The scheduler then only checks
+        go flags rather than the time, and tasks are released at the moment
+        of the interrupt rather than whenever the scheduler next looks. Each
+        task's period is rounded to a whole number of ticks. The latency 
+        reported by the task profiles is measured from the interrupt.
+
+        Example:
+          @code
+              cotask.task_list.start_tick (pyb.Timer (6, freq = 100))
+          @endcode
+        On a PC, a @c HostShim.SimTimer can be given in place of the 
+        hardware timer.
+
+        @param timer A timer object, such as a @c pyb.Timer, which has been
+               set to a frequency and has @c freq() and @c callback() methods
+        """
+        tick_us = 1000000 / timer.freq ()
+        for task in self.heap:
+            task._reload = max (1, int (task.period / tick_us + 0.5))
+            task._countdown = task._reload
+            task._released = clock.ticks_us ()
+            task._queued = False
+            task._ticked = True
+        self.released = [None] * len (self.heap)
+        self._released_count = 0
+
+        # The bound method is made once here so the interrupt doesn't need to
+        # allocate memory
+        self._tick_cb = self._tick
+        self.tick_timer = timer
+        timer.callback (self._tick_cb)
+
+
+    def stop_tick (self):
+        """!
+        Stop the timer tick and go back to checking the time for each task.
+        """
+        if self.tick_timer is None:
+            return
+        self.tick_timer.callback (None)
+        self.tick_timer = None
+        self._released_count = 0
+        # Carry on from the last time each task was released. A sorted list
+        # is also a heap
+        now = clock.ticks_us ()
+        for task in self.heap:
+            task._ticked = False
+            task._queued = False
+            task._next_run = clock.ticks_add (task._released, task.period)
+        self.heap.sort (key=lambda t: (clock.ticks_diff (t._next_run, now), 
+                                       -t.priority))
+
+
+    def _tick (self, timer):
+        """!
+        Interrupt callback of the timer tick. It counts down to each timed
+        task's next run and releases the tasks which are due, putting them
+        into the heap of released tasks. A task whose last release hasn't 
+        been taken yet has overrun; the releases can't be queued, so the
+        overrun is counted. It must not allocate memory.
+        @param timer The timer which caused the interrupt
+        """
+        for task in self.heap:
+            task._countdown -= 1
+            if task._countdown <= 0:
+                task._countdown = task._reload
+                if task.go_flag:
+                    task._overruns += 1
+                else:
+                    now = clock.ticks_us ()
+                    task._released = now
+                    task._deadline = clock.ticks_add (now, task.period)
+                    task.go_flag = True
+                    if not task._queued:
+                        task._queued = True
+                        self._push_released (task)
+
+
+    def dump_trace (self, filename):
+        """!
+        Write the transition traces of all traced tasks to a binary file.
+        The file can be turned into a timeline of all the tasks on a PC 
+        with @c traceDecode.py. Every task's trace is written with the same
+        time of writing, so the decoder can put the traces in order even when
+        the microsecond timer has wrapped around between them.
+        @param filename The name of the file to write
+        """
+        now = clock.ticks_us ()
+        with open (filename, 'wb') as stream:
+            for pri in self.pri_list:
+                for task in pri[2:]:
+                    task.dump_trace (stream, now)
+
+
+    def get_profiles (self):
+        """!
+        Get the profiles of all tasks as a list of dictionaries, as returned
+        by @c Task.get_profile().
+        @return A list of dictionaries, one for each task
+        """
+        profiles = []
+        for pri in self.pri_list:
+            for task in pri[2:]:
+                profiles.append (task.get_profile ())
+        return profiles
+
+
+    def reset_profiles (self):
+        """!
+        Reset the profiles of all tasks and the idle time measurement, to 
+        start a new window of measurements.
+        """
+        for pri in self.pri_list:
+            for task in pri[2:]:
+                task.reset_profile ()
+        self.reset_idle ()
+
+
+    def idle_fraction (self):
+        """!
+        Find the fraction of time spent sleeping in @c idle() since the
+        measurement was last reset.
+        @return The idle fraction from 0 to 1, or @c None if no time has
+                been measured
+        """
+        if self._idle_total <= 0:
+            return None
+        return self._idle_sum / self._idle_total
+
+
+    def reset_idle (self):
+        """!
+        Reset the measurement of the time spent sleeping in @c idle().
+        """
+        self._idle_sum = 0
+        self._idle_total = 0
+        self._idle_last = clock.ticks_us ()
+
+
+    def _before (self, a, b):
+        """!
+        Check if one task should run before another. Run times are
+        compared with @c ticks_diff() so the comparison still works when the
+        microsecond timer wraps around.
+        @param a The first task
+        @param b The second task
+        @return @c True if task @c a should run before task @c b
+        """
+        diff = clock.ticks_diff (a._next_run, b._next_run)
+        if diff == 0:
+            return a.priority > b.priority
+        return diff < 0
+
+
+    def _due_before (self, a, b):
+        """!
+        Check if one task released by the timer tick is due before another.
+        A task is due one period after the tick released it.
+        @param a The first task
+        @param b The second task
+        @return @c True if task @c a should run before task @c b
+        """
+        diff = clock.ticks_diff (a._deadline, b._deadline)
+        if diff == 0:
+            return a.priority > b.priority
+        return diff < 0
+
+
+    def _push_released (self, task):
+        """!
+        Add a task to the heap of released tasks. Called by the timer tick's
+        interrupt; it doesn't allocate memory, as the heap has room for every
+        timed task and each task is in it at most once.
+        @param task The task released by the tick
+        """
+        heap = self.released
+        index = self._released_count
+        self._released_count = index + 1
+        while index > 0:
+            parent = (index - 1) >> 1
+            if not self._due_before (task, heap[parent]):
+                break
+            heap[index] = heap[parent]
+            index = parent
+        heap[index] = task
+
+
+    def _pop_released (self):
+        """!
+        Take the task whose deadline comes first from the heap of released
+        tasks. Must be called with interrupts disabled and the heap not empty.
+        @return The task taken from the heap
+        """
+        heap = self.released
+        first = heap[0]
+        first._queued = False
+        length = self._released_count - 1
+        self._released_count = length
+        task = heap[length]
+        heap[length] = None
+        if length:
+            index = 0
+            while True:
+                child = 2 * index + 1
+                if child >= length:
+                    break
+                if child + 1 < length and self._due_before (heap[child + 1],
+                                                            heap[child]):
+                    child += 1
+                if not self._due_before (heap[child], task):
+                    break
+                heap[index] = heap[child]
+                index = child
+            heap[index] = task
+        return first
+
+
+    def _sift_up (self, index):
+        """!
+        Move a task up the heap until it is after every task which should
+        run before it.
+        @param index The index in the heap of the task to move
+        """
+        heap = self.heap
+        task = heap[index]
+        while index > 0:
+            parent = (index - 1) >> 1
+            if not self._before (task, heap[parent]):
+                break
+            heap[index] = heap[parent]
+            index = parent
+        heap[index] = task
+
+
+    def _sift_down (self, index):
+        """!
+        Move a task down the heap until it is before every task which should
+        run after it.
+        @param index The index in the heap of the task to move
+        """
+        heap = self.heap
+        length = len (heap)
+        task = heap[index]
+        while True:
+            child = 2 * index + 1
+            if child >= length:
+                break
+            if child + 1 < length and self._before (heap[child + 1], 
+                                                    heap[child]):
+                child += 1
+            if not self._before (heap[child], task):
+                break
+            heap[index] = heap[child]
+            index = child
+        heap[index] = task
+
+
     def __repr__ (self):
         """!
         Create some diagnostic text showing the tasks in the task list.
@@ -410,6 +1092,10 @@ class TaskList:
             for task in pri[2:]:
                 ret_str += str (task) + '\n'
 
+        fraction = self.idle_fraction ()
+        if fraction is not None:
+            ret_str += 'Idle {:.1f}%\n'.format (fraction * 100)
+
         return ret_str
 
 
@@ -12,66 +12,78 @@ This is the script to run the 3RRR robot while prompting user in the console for
 """
 
 import gc
-import math
+import micropython
+import pyb
 import utime
 import cotask
-import task_share
 
-import JointTask
-import TaskTouch
+import RoboGeometry
+import RoboTable
+import RoboWorkspace
+import TaskSet
+import TaskTable
+import Trajectory
 
-import RoboBrain
-import RoboTask
+## True to answer the inverse kinematics from the joint angle table built by
+#  roboTable.py. It isn't faster than the native kernel in roboBench.py, so
+#  the table is only loaded if this is set
+USE_IK_TABLE = False
         
 
 if __name__ == "__main__":    
     
-    # Create queues for x and y touchpad positions
-    touchpad_x = task_share.Queue('f', 100, thread_protect = False, name = "touchpad_x")
-    touchpad_y = task_share.Queue('f', 100, thread_protect = False, name = "touchpad_y")
+    # Create the shares and queues which connect the tasks. The ready share
+    # synchronizes start, stop of drawing
+    shares = TaskSet.make_shares()
+    ready = shares[0]
     
-    # Create share to synchronize start, stop of drawing
-    ready = task_share.Share('i', thread_protect = False, name = "drawing")
-    ready.put(1)
-
+    # Play back a compiled job if one has been uploaded
+    job_file = "job.bin"
+    try:
+        open(job_file, 'rb').close()
+    except OSError:
+        job_file = None
     
-    # Create queues for joint positions
-    theta_1 = task_share.Queue('f', 100, thread_protect = False, name = "theta_1", overwrite = True)
-    theta_2 = task_share.Queue('f', 100, thread_protect = False, name = "theta_2", overwrite = True)
-    theta_3 = task_share.Queue('f', 100, thread_protect = False, name = "theta_3", overwrite = True)
-        
-    # Create RoboBrain with robot geometry
-    myRoboBrain = RoboBrain.RoboBrain([0,0], [17.75, 0], [8.875, 15.375], 7.25, 7.25, [-1.985, -1.089],
-                                    [1.829, -1.089], [-0.244, 2.144])
-    # Create task objects
-    Brain = RoboTask.RoboTask(ready, myRoboBrain, touchpad_x, touchpad_y, theta_1, theta_2, theta_3)   
-    Touch = TaskTouch.TaskTouch(ready, touchpad_x, touchpad_y)
-    Joint1 = JointTask.JointTask(ready, 1, 1, 0.9, 0.05, 0, theta_1)
-    Joint2 = JointTask.JointTask(ready, 2, 2, 0.9, 0.05, 0, theta_2)
-    Joint3 = JointTask.JointTask(ready, 3, 3, 0.9, 0.05, 0, theta_3)
-    Brain = RoboTask.RoboTask(ready, myRoboBrain, touchpad_x, touchpad_y, theta_1, theta_2, theta_3)   
+    # Play back a drawing file if one has been uploaded, otherwise draw from the touchpad
+    drawing_file = "drawing.gcode"
+    try:
+        open(drawing_file, 'r').close()
+    except OSError:
+        drawing_file = None
     
-    # Putting task objects in cotask run list
-    task1_J1 = cotask.Task(Joint1.run, name = 'Task1_J1', priority = 2,
-                             period = 50, profile = True, trace = False)
+    # Load the joint speed if it has been measured with speedCal.py, so the
+    # trajectory speed limit matches the robot
+    if Trajectory.load_speed():
+        print("Joint speed {:.0f} degree/s at full duty cycle".format(Trajectory.FULL_DUTY_SPEED))
+    else:
+        print("Joint speed not measured; run speedCal.py")
     
-    task2_J2 = cotask.Task(Joint2.run, name = 'Task1_J2', priority = 2, 
-                              period = 50, profile = True, trace = False)
+    # Load the joint angle lookup table if it is used and has been built with
+    # roboTable.py
+    ik_table = None
+    if USE_IK_TABLE:
+        try:
+            ik_table = RoboTable.IKTable.load("ik_table.bin")
+            print(ik_table)
+        except OSError:
+            pass
     
-    task3_J3 = cotask.Task(Joint3.run, name = 'Task1_J3', priority = 2, 
-                              period = 50, profile = True, trace = False)
-            
-    task4_B = cotask.Task(Brain.run, name = 'Task4_B', priority = 3,
-                              period = 50, profile = True, trace = False)
+    # Load the workspace index if one has been built with roboWorkspace.py
+    try:
+        workspace = RoboWorkspace.WorkspaceIndex.load("workspace.bin")
+        print(workspace)
+    except OSError:
+        workspace = None
     
-    task5 = cotask.Task(Touch.run, name = 'Task5', priority = 4,
-                              period = 50, profile = True, trace = False)
+    # Create RoboBrain with robot geometry
+    myRoboBrain = RoboGeometry.make_brain(table = ik_table, kernel = 'native')
+    
+    # Task table, shared with simRobot.py so the simulation runs these tasks
+    table = TaskSet.make_table(shares, myRoboBrain, job_file = job_file,
+                               drawing_file = drawing_file, workspace = workspace)
     
-    cotask.task_list.append(task1_J1)
-    cotask.task_list.append(task2_J2)
-    cotask.task_list.append(task3_J3)
-    cotask.task_list.append(task4_B)
-    cotask.task_list.append(task5)
+    # Create the task objects and put the tasks in the cotask run list
+    tasks = TaskTable.build(table)
     
     # Run the memory garbage collector to ensure memory is as defragmented as
     # possible before the real-time scheduler is started
@@ -79,23 +91,40 @@ if __name__ == "__main__":
 
     input("Press enter to start")
     
+    # Release the timed tasks from a hardware timer tick which fits every task
+    # period. Timer 6 is a basic timer not used by the motors, encoders, or solenoid
+    micropython.alloc_emergency_exception_buf(100)
+    cotask.task_list.start_tick(pyb.Timer(6, freq = TaskTable.tick_freq(table)))
+    
+    # Check the measured run times against the task periods once the tasks
+    # have run for a while, and warn if the processor can't keep up
+    check_at = utime.ticks_add(utime.ticks_ms(), TaskTable.CHECK_SECONDS*1000)
+    checked = False
+    
     while True:
         try:
-            cotask.task_list.pri_sched()
+            cotask.task_list.edf_sched()
+            if not checked and utime.ticks_diff(utime.ticks_ms(), check_at) >= 0:
+                TaskTable.report()
+                checked = True
+            # Sleep until the next task is due rather than polling the time
+            cotask.task_list.idle()
                 
         except KeyboardInterrupt:
             print("End Program")
+            cotask.task_list.stop_tick()
+            print(cotask.task_list)
+            if job_file is None and drawing_file is None:
+                print(tasks['Task5'][0].filter)
             # set ready shared variable to low (false)
             ready.put(0)
             # wait for one period of all tasks being run
-            utime.sleep_ms(50)
+            utime.sleep_ms(max(entry['period'] for entry in table))
             
             # run joint (which command the motors) and brain (which command the solenoid) tasks
             # so they can turn the motors and solenoids off when shutting robot down.
-            task1_J1.schedule()
-            task2_J2.schedule()
-            task3_J3.schedule()
-            task4_B.schedule()
+            for name in ('Task1_J1', 'Task1_J2', 'Task1_J3', 'Task4_B'):
+                tasks[name][1].schedule()
 
             break
         
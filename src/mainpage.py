@@ -19,7 +19,7 @@
 # S0 is the initialization state where all shared variables are reset. After this has
 # been completed, the roboTask immediately transitions to S3 DRAWING, which runs the
 # normal drawing operation for the robot. In this state, the brain checks whether any
-# positions have been added to the x and y queues, then runs the inverse kinematics
+# positions have been added to the points queue, then runs the inverse kinematics
 # and updates the joint angles accordingly. If there are no positions to move to, the
 # robot lifts the solenoid and waits until the queue is populated. The ready flag controls
 # the end of the robot motion. When the program is exited, the ready flag is flippped,
@@ -12,8 +12,10 @@ of data corruption by interrupts.
 
 import array
 import gc
+import struct
 import pyb
 import micropython
+import cotask
 
 
 ## This is a system-wide list of all the queues and shared variables. It is
@@ -141,6 +143,9 @@ class Queue (BaseShare):
             self._buffer = None
             raise
 
+        # A view of the buffer through which slices are copied in bulk
+        self._view = memoryview (self._buffer)
+
         # Initialize pointers to be used for reading and writing data
         self.clear ()
 
@@ -156,10 +161,12 @@ class Queue (BaseShare):
 
         If there isn't room for the item, wait (blocking the calling process)
         until room becomes available, unless the @c overwrite constructor
-        parameter was set to @c True to allow old data to be clobbered. If
-        non-blocking behavior without overwriting is needed, one should call
-        @c full() to ensure that the queue is not full before putting data
-        into it:
+        parameter was set to @c True to allow old data to be clobbered. In a
+        cooperative task the task which would make room can't run while this
+        method waits, so the wait never ends; @c try_put() or @c wait_put() 
+        should be used instead. If non-blocking behavior without overwriting
+        is needed, one can also call @c full() to ensure that the queue is 
+        not full before putting data into it:
         @code
         |   def some_task ():
         |       # Setup
@@ -179,6 +186,7 @@ class Queue (BaseShare):
 
             # Wait (if needed) until there's room in the buffer for the data
             if not self._overwrite:
+                self.put_blocked += 1
                 while self.full ():
                     pass
 
@@ -192,8 +200,10 @@ class Queue (BaseShare):
         if self._wr_idx >= self._size:
             self._wr_idx = 0
         self._num_items += 1
-        if self._num_items >= self._size:        # Can't be fuller than full
+        if self._num_items > self._size:         # Can't be fuller than full
+            # The oldest item was overwritten, so reading starts after it
             self._num_items = self._size
+            self._rd_idx = self._wr_idx
         if self._num_items > self._max_full:     # Record maximum fillage
             self._max_full = self._num_items
 
@@ -208,9 +218,10 @@ class Queue (BaseShare):
         Read an item from the queue.
 
         If there isn't anything in there, wait (blocking the calling process)
-        until something becomes available. If non-blocking reads are needed,
-        one should call @c any() to check for items before attempting to read
-        from the queue. This is usually done in a low priority task:
+        until something becomes available. As with @c put(), that wait never
+        ends in a cooperative task, so @c try_get() or @c wait_get() should be
+        used instead, or @c any() called to check for items before attempting
+        to read from the queue. This is usually done in a low priority task:
         @code
         |   def some_task ():
         |       # Setup
@@ -224,8 +235,10 @@ class Queue (BaseShare):
         @param in_ISR Set this to @c True if calling from within an ISR
         """
         # Wait until there's something in the queue to be returned
-        while self.empty ():
-            pass
+        if self.empty ():
+            self.get_blocked += 1
+            while self.empty ():
+                pass
 
         # Prevent data corruption by blocking interrupts during data transfer
         if self._thread_protect and not in_ISR:
@@ -249,6 +262,308 @@ class Queue (BaseShare):
         return (to_return)
 
 
+    @micropython.native
+    def try_put (self, item, in_ISR = False):
+        """!
+        Put an item into the queue if there is room for it, without waiting.
+
+        A queue created with @c overwrite set always has room, as the oldest
+        item is overwritten. Each time there isn't room, @c put_blocked is 
+        counted.
+        @param item The item to be placed into the queue
+        @param in_ISR Set this to @c True if calling from within an ISR
+        @return @c True if the item was put, @c False if the queue was full
+        """
+        if self.full () and not self._overwrite:
+            self.put_blocked += 1
+            return False
+        self.put (item, in_ISR)
+        return True
+
+
+    @micropython.native
+    def try_get (self, default = None, in_ISR = False):
+        """!
+        Read an item from the queue if there is one, without waiting.
+
+        Each time the queue is empty, @c get_blocked is counted.
+        @param default The value returned if the queue is empty
+        @param in_ISR Set this to @c True if calling from within an ISR
+        @return The item, or @c default if the queue was empty
+        """
+        if self.empty ():
+            self.get_blocked += 1
+            return default
+        return self.get (in_ISR)
+
+
+    def wait_put (self, item, timeout = None, state = 0):
+        """!
+        Put an item into the queue from a task, letting other tasks run while
+        waiting for room.
+
+        This is a generator which is run from a task's generator with 
+        @c yield @c from. While the queue is full it yields, so the scheduler
+        can run the task which takes items out, until there is room or the
+        timeout has passed. The time is read from @c cotask.clock.
+        @code
+        |   def some_task ():
+        |       while True:
+        |           sent = yield from my_queue.wait_put (data, timeout = 100)
+        |           if not sent:
+        |               print ('Nobody is reading my_queue')
+        |           yield 0
+        @endcode
+        @param item The item to be placed into the queue
+        @param timeout The longest time to wait in milliseconds, or @c None 
+               to wait as long as it takes
+        @param state The state yielded to the scheduler while waiting
+        @return @c True if the item was put, @c False if the timeout passed
+        """
+        if self.full () and not self._overwrite:
+            self.put_blocked += 1
+            if timeout is not None:
+                deadline = cotask.clock.ticks_add (cotask.clock.ticks_ms (), 
+                                                   timeout)
+            while self.full ():
+                if timeout is not None and cotask.clock.ticks_diff (
+                        cotask.clock.ticks_ms (), deadline) >= 0:
+                    return False
+                yield state
+        self.put (item)
+        return True
+
+
+    def wait_get (self, timeout = None, default = None, state = 0):
+        """!
+        Read an item from the queue in a task, letting other tasks run while
+        waiting for one.
+
+        This is a generator which is run from a task's generator with 
+        @c yield @c from, as for @c wait_put(). It yields until an item is
+        in the queue or the timeout has passed.
+        @code
+        |   def some_task ():
+        |       while True:
+        |           item = yield from my_queue.wait_get (timeout = 50)
+        |           if item is not None:
+        |               do_something_with (item)
+        |           yield 0
+        @endcode
+        @param timeout The longest time to wait in milliseconds, or @c None 
+               to wait as long as it takes
+        @param default The value returned if the timeout passes
+        @param state The state yielded to the scheduler while waiting
+        @return The item, or @c default if the timeout passed
+        """
+        if self.empty ():
+            self.get_blocked += 1
+            if timeout is not None:
+                deadline = cotask.clock.ticks_add (cotask.clock.ticks_ms (), 
+                                                   timeout)
+            while self.empty ():
+                if timeout is not None and cotask.clock.ticks_diff (
+                        cotask.clock.ticks_ms (), deadline) >= 0:
+                    return default
+                yield state
+        return self.get ()
+
+
+    @micropython.native
+    def put_many (self, buf, count = -1):
+        """!
+        Put a number of items into the queue at once.
+
+        The items are copied from the caller's array in at most two slices,
+        one up to the end of the ring buffer and one from its start, rather
+        than one at a time, and interrupts are disabled once for all of them.
+        This method doesn't wait for room: if the queue doesn't have room for
+        all the items, only as many as fit are put, unless the @c overwrite 
+        constructor parameter was set to @c True, in which case the oldest 
+        items are overwritten. 
+
+        The slices are small @c memoryview objects made on each call, so this
+        method must not be called from an interrupt service routine, which
+        can't allocate memory; an ISR should use @c put().
+        @code
+        |   samples = array.array ('f', range (16))
+        |   # ...fill the samples...
+        |   put = my_queue.put_many (samples)
+        @endcode
+        @param buf An @c array.array or @c memoryview of items of the queue's
+               type
+        @param count The number of items to put from the start of @c buf, or
+               -1 to put all of them
+        @return The number of items put into the queue
+        """
+        if count < 0 or count > len (buf):
+            count = len (buf)
+        size = self._size
+        first = 0
+        if count > size - self._num_items:
+            if not self._overwrite:
+                count = size - self._num_items
+            elif count > size:
+                # Only the newest items fit
+                first = count - size
+                count = size
+        if count <= 0:
+            return 0
+
+        # Prevent data corruption by blocking interrupts during data transfer
+        if self._thread_protect:
+            _irq_state = pyb.disable_irq ()
+
+        # Copy up to the end of the buffer, then the rest from its start
+        src = memoryview (buf)
+        view = self._view
+        wr = self._wr_idx
+        part = size - wr
+        if part > count:
+            part = count
+        view[wr:wr + part] = src[first:first + part]
+        if count > part:
+            view[0:count - part] = src[first + part:first + count]
+        wr += count
+        if wr >= size:
+            wr -= size
+        self._wr_idx = wr
+
+        num = self._num_items + count
+        if num > size:
+            # The oldest items were overwritten, so reading starts after them
+            num = size
+            self._rd_idx = wr
+        self._num_items = num
+        if num > self._max_full:                 # Record maximum fillage
+            self._max_full = num
+
+        # Re-enable interrupts
+        if self._thread_protect:
+            pyb.enable_irq (_irq_state)
+
+        return count
+
+
+    @micropython.native
+    def get_many (self, buf, count = -1):
+        """!
+        Read a number of items from the queue at once.
+
+        The items are copied into the caller's array in at most two slices,
+        with interrupts disabled once for all of them. This method doesn't 
+        wait for items: if fewer are in the queue than were asked for, all 
+        those which are in the queue are read. Like @c put_many(), this 
+        method allocates small @c memoryview objects and must not be called
+        from an interrupt service routine.
+        @param buf An @c array.array or @c memoryview of the queue's type
+               into which the items are copied, starting at its beginning
+        @param count The largest number of items to read, or -1 to read as
+               many as @c buf can hold
+        @return The number of items read into @c buf
+        """
+        if count < 0 or count > len (buf):
+            count = len (buf)
+        if count > self._num_items:
+            count = self._num_items
+        if count <= 0:
+            return 0
+
+        # Prevent data corruption by blocking interrupts during data transfer
+        if self._thread_protect:
+            irq_state = pyb.disable_irq ()
+
+        # Copy up to the end of the buffer, then the rest from its start
+        size = self._size
+        dest = memoryview (buf)
+        view = self._view
+        rd = self._rd_idx
+        part = size - rd
+        if part > count:
+            part = count
+        dest[0:part] = view[rd:rd + part]
+        if count > part:
+            dest[part:count] = view[0:count - part]
+        rd += count
+        if rd >= size:
+            rd -= size
+        self._rd_idx = rd
+        self._num_items -= count
+
+        # Re-enable interrupts
+        if self._thread_protect:
+            pyb.enable_irq (irq_state)
+
+        return count
+
+
+    @micropython.native
+    def peek (self, index = 0):
+        """!
+        Read an item from the queue without removing it.
+
+        This lets a task such as a look-ahead planner see items which are 
+        waiting before it decides to take them.
+        @param index The place of the item in the queue, 0 for the item which
+               @c get() would return next
+        @return The item
+        @throws IndexError If the queue doesn't hold that many items
+        """
+        if index < 0 or index >= self._num_items:
+            raise IndexError ('Queue holds only ' + str (self._num_items) 
+                              + ' items')
+        index += self._rd_idx
+        if index >= self._size:
+            index -= self._size
+        return self._buffer[index]
+
+
+    @micropython.native
+    def peek_many (self, buf, count = -1):
+        """!
+        Read a number of items from the front of the queue without removing
+        them.
+
+        The items which @c get_many() would return are copied into the 
+        caller's array in at most two slices, in the same way, so a task can
+        look ahead at what is waiting. Like @c get_many(), this method 
+        allocates small @c memoryview objects and must not be called from an
+        interrupt service routine.
+        @param buf An @c array.array or @c memoryview of the queue's type
+               into which the items are copied, starting at its beginning
+        @param count The largest number of items to read, or -1 to read as
+               many as @c buf can hold
+        @return The number of items copied into @c buf
+        """
+        if count < 0 or count > len (buf):
+            count = len (buf)
+        if count > self._num_items:
+            count = self._num_items
+        if count <= 0:
+            return 0
+
+        # Prevent the items from changing while they are copied
+        if self._thread_protect:
+            irq_state = pyb.disable_irq ()
+
+        # Copy up to the end of the buffer, then the rest from its start
+        dest = memoryview (buf)
+        view = self._view
+        rd = self._rd_idx
+        part = self._size - rd
+        if part > count:
+            part = count
+        dest[0:part] = view[rd:rd + part]
+        if count > part:
+            dest[part:count] = view[0:count - part]
+
+        # Re-enable interrupts
+        if self._thread_protect:
+            pyb.enable_irq (irq_state)
+
+        return count
+
+
     @micropython.native
     def any (self):
         """!
@@ -306,16 +621,576 @@ class Queue (BaseShare):
         self._num_items = 0
         self._max_full = 0
 
+        ## The number of times a put found the queue full and waited, or 
+        #  would have waited, for room
+        self.put_blocked = 0
+
+        ## The number of times a get found the queue empty and waited, or 
+        #  would have waited, for an item
+        self.get_blocked = 0
+
+
+    def __repr__ (self):
+        """!
+        This method puts diagnostic information about the queue into a string.
+
+        It shows the queue's name and type, the maximum number of items and
+        queue size, and how many times puts and gets found the queue full or
+        empty. A queue whose puts are often blocked may be too small. 
+        """
+        return ('{:<12s} Queue<{:s}> Max Full {:d}/{:d} Blocked {:d}/{:d}'
+                .format (self._name, type_code_strings[self._type_code], 
+                         self._max_full, self._size, self.put_blocked, 
+                         self.get_blocked))
+
+
+# ============================================================================
+
+class RecordQueue (BaseShare):
+    """!
+    A queue of records, each of which is a fixed number of fields which are
+    put into and taken from the queue together.
+
+    Data which belongs together, such as the x and y coordinates and pen state
+    of a position, can be sent through one record queue rather than through a
+    queue for each field. The fields can't get out of step with each other, 
+    and when the queue is thread protected, interrupts are disabled once for
+    each record rather than once for each field. All the fields have the same
+    type. The records are stored one after another in a single array which 
+    is allocated when the queue is created.
+
+    An example of the creation and use of a record queue is as follows:
+
+    @code
+    import task_share
+
+    # This queue holds up to 100 records of three floats: x, y, and pen
+    points = task_share.RecordQueue ('f', 3, 100, name="Points")
+
+    # Somewhere in one task, put a record from a buffer made once beforehand
+    out = array.array ('f', [0, 0, 0])
+    out[0] = x
+    out[1] = y
+    out[2] = pen
+    points.put_from (out)
+
+    # In another task, read a record into a buffer made once beforehand
+    record = array.array ('f', [0, 0, 0])
+    points.get_into (record)
+    @endcode
+
+    The records are copied out of and into the callers' buffers, so neither
+    side allocates memory. @c put() takes the fields as arguments, which is
+    handy but packs them into a new tuple each time.
+    """
+    ## A counter used to give serial numbers to record queues for diagnostic 
+    #  use.
+    ser_num = 0
+
+    def __init__ (self, type_code, fields, size, thread_protect = True, 
+                  overwrite = False, name = None):
+        """!
+        Initialize a record queue to carry and buffer records between tasks.
+
+        The type codes are the same as for class @c Queue.
+        @param type_code The type of every field of the records
+        @param fields The number of fields in each record
+        @param size The maximum number of records which the queue can hold
+        @param thread_protect @c True if mutual exclusion protection is used
+        @param overwrite If @c True, the oldest record will be overwritten 
+               with a new one if the queue becomes full 
+        @param name A short name for the queue, default @c RecordQueueN where
+               @c N is a serial number for the queue
+        """
+        # First call the parent class initializer
+        super ().__init__ (type_code, thread_protect, name)
+
+        self._fields = fields
+        self._size = size
+        self._overwrite = overwrite
+        self._name = str (name) if name != None \
+            else 'RecordQueue' + str (RecordQueue.ser_num)
+        RecordQueue.ser_num += 1
+
+        # Allocate memory in which all the records will be stored, one after
+        # another
+        self._length = size * fields
+        self._buffer = array.array (type_code, range (self._length))
+
+        # Initialize pointers to be used for reading and writing data
+        self.clear ()
+
+        # Since we may have allocated a bunch of memory, call the garbage
+        # collector to neaten up what memory is left for future use
+        gc.collect ()
+
+
+    @micropython.native
+    def put (self, *fields, in_ISR = False):
+        """!
+        Put a record into the queue, given as one argument for each field.
+
+        This works as @c put_from() does, but the fields are packed into a new
+        tuple each time, so it allocates memory and can't be used in an 
+        interrupt service routine.
+        @param fields The fields of the record, as many as the queue was 
+               created with
+        @param in_ISR Set this to @c True if calling from within an ISR
+        """
+        if len (fields) != self._fields:
+            raise ValueError ('Record needs ' + str (self._fields) + ' fields')
+        self.put_from (fields, in_ISR)
+
+
+    @micropython.native
+    def put_from (self, buf, in_ISR = False):
+        """!
+        Put a record into the queue from a buffer.
+
+        If there isn't room for the record, wait until room becomes available
+        or overwrite the oldest record, just as @c Queue.put() does; 
+        @c try_put_from() doesn't wait. The buffer is made by the caller, so
+        no memory is allocated.
+        @param buf A list or array holding the fields of the record, of 
+               which the first as many as the queue was created with are put
+        @param in_ISR Set this to @c True if calling from within an ISR
+        """
+        if len (buf) < self._fields:
+            raise ValueError ('Record needs ' + str (self._fields) + ' fields')
+
+        if self.full ():
+            if in_ISR and not self._overwrite:
+                return
+
+            # Wait (if needed) until there's room in the buffer for the data
+            if not self._overwrite:
+                self.put_blocked += 1
+                while self.full ():
+                    pass
+
+        # Prevent data corruption by blocking interrupts during data transfer
+        if self._thread_protect and not in_ISR:
+            _irq_state = pyb.disable_irq ()
+
+        # Write the fields and advance the counts and pointers
+        data = self._buffer
+        index = self._wr_idx
+        for n in range (self._fields):
+            data[index] = buf[n]
+            index += 1
+        if index >= self._length:
+            index = 0
+        self._wr_idx = index
+        if self._num_items >= self._size:
+            # The oldest record was overwritten, so reading starts after it
+            self._rd_idx = index
+        else:
+            self._num_items += 1
+        if self._num_items > self._max_full:     # Record maximum fillage
+            self._max_full = self._num_items
+
+        # Re-enable interrupts
+        if self._thread_protect and not in_ISR:
+            pyb.enable_irq (_irq_state)
+
+
+    @micropython.native
+    def get_into (self, buf, in_ISR = False):
+        """!
+        Read a record from the queue into a buffer.
+
+        If there isn't a record in the queue, wait until one becomes available;
+        @c any() should be called first if waiting isn't wanted. The buffer is
+        made by the caller, so no memory is allocated.
+        @param buf A list or array with room for the fields of a record
+        @param in_ISR Set this to @c True if calling from within an ISR
+        @return The buffer, holding the fields of the record
+        """
+        # Wait until there's something in the queue to be returned
+        if self.empty ():
+            self.get_blocked += 1
+            while self.empty ():
+                pass
+
+        # Prevent data corruption by blocking interrupts during data transfer
+        if self._thread_protect and not in_ISR:
+            irq_state = pyb.disable_irq ()
+
+        # Copy the fields and move the read pointer
+        data = self._buffer
+        index = self._rd_idx
+        for n in range (self._fields):
+            buf[n] = data[index]
+            index += 1
+        if index >= self._length:
+            index = 0
+        self._rd_idx = index
+        self._num_items -= 1
+        if self._num_items < 0:
+            self._num_items = 0
+
+        # Re-enable interrupts
+        if self._thread_protect and not in_ISR:
+            pyb.enable_irq (irq_state)
+
+        return buf
+
+
+    @micropython.native
+    def try_put (self, *fields, in_ISR = False):
+        """!
+        Put a record into the queue if there is room for it, without waiting.
+
+        This works as @c try_put_from() does, but like @c put() it packs the
+        fields into a new tuple each time.
+        @param fields The fields of the record
+        @param in_ISR Set this to @c True if calling from within an ISR
+        @return @c True if the record was put, @c False if the queue was full
+        """
+        return self.try_put_from (fields, in_ISR)
+
+
+    @micropython.native
+    def try_put_from (self, buf, in_ISR = False):
+        """!
+        Put a record from a buffer into the queue if there is room for it,
+        without waiting.
+
+        Each time there isn't room, @c put_blocked is counted.
+        @param buf A list or array holding the fields of the record
+        @param in_ISR Set this to @c True if calling from within an ISR
+        @return @c True if the record was put, @c False if the queue was full
+        """
+        if self.full () and not self._overwrite:
+            self.put_blocked += 1
+            return False
+        self.put_from (buf, in_ISR)
+        return True
+
+
+    @micropython.native
+    def try_get_into (self, buf, in_ISR = False):
+        """!
+        Read a record into a buffer if there is one, without waiting.
+
+        Each time the queue is empty, @c get_blocked is counted.
+        @param buf A list or array with room for the fields of a record
+        @param in_ISR Set this to @c True if calling from within an ISR
+        @return @c True if a record was read, @c False if the queue was empty
+        """
+        if self.empty ():
+            self.get_blocked += 1
+            return False
+        self.get_into (buf, in_ISR)
+        return True
+
+
+    @micropython.native
+    def any (self):
+        """!
+        Check if there are any records in the queue.
+        @return @c True if records are in the queue, @c False if not
+        """
+        return (self._num_items > 0)
+
+
+    @micropython.native
+    def empty (self):
+        """!
+        Check if the queue is empty.
+        @return @c True if queue is empty, @c False if it's not empty
+        """
+        return (self._num_items <= 0)
+
+
+    @micropython.native
+    def full (self):
+        """!
+        Check if the queue is full.
+        @return @c True if the queue is full
+        """
+        return (self._num_items >= self._size)
+
+
+    @micropython.native
+    def num_in (self):
+        """!
+        Check how many records are in the queue.
+        @return The number of records in the queue
+        """
+        return (self._num_items)
+
+
+    def clear (self):
+        """!
+        Remove all contents from the queue.
+        """
+        self._rd_idx = 0
+        self._wr_idx = 0
+        self._num_items = 0
+        self._max_full = 0
+
+        ## The number of times a put found the queue full and waited, or 
+        #  would have waited, for room
+        self.put_blocked = 0
+
+        ## The number of times a get found the queue empty and waited, or 
+        #  would have waited, for an item
+        self.get_blocked = 0
+
 
     def __repr__ (self):
         """!
         This method puts diagnostic information about the queue into a string.
 
-        It shows the queue's name and type as well as the maximum number of
-        items and queue size. 
+        It shows the queue's name, field type and number of fields, the
+        maximum number of records and queue size, and how many times puts
+        and gets found the queue full or empty. 
+        """
+        return ('{:<12s} RecordQueue<{:s} x{:d}> Max Full {:d}/{:d} '
+                'Blocked {:d}/{:d}'.format (
+                self._name, type_code_strings[self._type_code], self._fields,
+                self._max_full, self._size, self.put_blocked, 
+                self.get_blocked))
+
+
+# ============================================================================
+
+@micropython.viper
+def _copy8 (dest: ptr8, src: ptr8, start: int, count: int, mask: int):
+    """!
+    Copy items of one byte out of a ring buffer, wrapping with a mask.
+    @param dest The array the items are copied to, from its start
+    @param src The ring buffer
+    @param start The index of the first item in the ring buffer
+    @param count The number of items to copy
+    @param mask The ring buffer size less one, a power of two less one
+    """
+    for n in range (count):
+        dest[n] = src[(start + n) & mask]
+
+
+@micropython.viper
+def _copy16 (dest: ptr16, src: ptr16, start: int, count: int, mask: int):
+    """!
+    Copy items of two bytes out of a ring buffer, as @c _copy8() does.
+    """
+    for n in range (count):
+        dest[n] = src[(start + n) & mask]
+
+
+@micropython.viper
+def _copy32 (dest: ptr32, src: ptr32, start: int, count: int, mask: int):
+    """!
+    Copy items of four bytes out of a ring buffer, as @c _copy8() does. 
+    Floats are copied as their bit patterns.
+    """
+    for n in range (count):
+        dest[n] = src[(start + n) & mask]
+
+
+## Copy functions used by @c SPSCRing.drain(), by item size in bytes
+_ring_copy = {1 : _copy8, 2 : _copy16, 4 : _copy32}
+
+
+class SPSCRing (BaseShare):
+    """!
+    A ring buffer which carries data from one producer to one consumer 
+    without disabling interrupts.
+
+    A @c Queue which is thread protected disables interrupts for every put
+    and get, because both sides change its count of items. In this ring the
+    producer only ever changes the head index and the consumer only ever
+    changes the tail index, so an interrupt service routine can put data in
+    while a task is taking it out, and neither has to disable interrupts.
+    The indices count up to twice the size and wrap around, and the number
+    of items is the difference between them, so the ring can tell full from
+    empty. The size must be a power of two so that indices wrap with a mask.
+
+    There must be only one producer and one consumer. The producer may be an
+    interrupt service routine, which can't allocate memory, so it should put
+    integers such as encoder counts or ADC readings rather than floats. The
+    consumer can take every waiting item at once with @c drain(), which 
+    copies them in a viper function.
+
+    @code
+    import task_share
+
+    # Interrupt callback puts encoder counts, a task takes them
+    counts = task_share.SPSCRing ('h', 64, name="Counts")
+
+    def sample (timer):
+        counts.push (encoder_timer.counter ())
+
+    readings = array.array ('h', range (64))
+    def some_task ():
+        while True:
+            got = counts.drain (readings)
+            # Use readings[0:got]
+            yield 0
+    @endcode
+    """
+    ## A counter used to give serial numbers to rings for diagnostic use.
+    ser_num = 0
+
+    def __init__ (self, type_code, size, name = None):
+        """!
+        Create a ring buffer.
+
+        The type codes are the same as for class @c Queue, except that items
+        of 8 bytes (@c q, @c Q, and @c d) can't be drained.
+        @param type_code The type of data items which the ring can hold
+        @param size The maximum number of items which the ring can hold, a 
+               power of two
+        @param name A short name for the ring, default @c SPSCRingN where 
+               @c N is a serial number for the ring
+        @throws ValueError If the size isn't a power of two or the items 
+                are too large
+        """
+        if size < 1 or size & (size - 1):
+            raise ValueError ('Ring size must be a power of two')
+        item_size = struct.calcsize (type_code)
+        if item_size not in _ring_copy:
+            raise ValueError ('Ring items must be 1, 2, or 4 bytes')
+
+        # The ring is never thread protected; it doesn't need to be
+        super ().__init__ (type_code, False, name)
+
+        self._size = size
+        self._mask = size - 1
+        self._wrap = 2 * size - 1
+        self._copy = _ring_copy[item_size]
+        self._name = str (name) if name != None \
+            else 'SPSCRing' + str (SPSCRing.ser_num)
+        SPSCRing.ser_num += 1
+
+        # Allocate memory in which the ring's data will be stored, and the
+        # head index, written only by the producer, and tail index, written
+        # only by the consumer
+        self._buffer = array.array (type_code, range (size))
+        self._idx = array.array ('i', [0, 0])
+        self.clear ()
+
+        # Since we may have allocated a bunch of memory, call the garbage
+        # collector to neaten up what memory is left for future use
+        gc.collect ()
+
+
+    @micropython.native
+    def push (self, item):
+        """!
+        Put an item into the ring. Only the producer may call this method.
+
+        If the ring is full the item is dropped and counted in @c dropped, 
+        as an interrupt service routine can't wait for room.
+        @param item The item to be placed into the ring
+        @return @c True if the item was put, @c False if the ring was full
+        """
+        idx = self._idx
+        head = idx[0]
+        if ((head - idx[1]) & self._wrap) >= self._size:
+            self.dropped += 1
+            return False
+        self._buffer[head & self._mask] = item
+        # The item is written before the consumer can see the new head
+        idx[0] = (head + 1) & self._wrap
+        return True
+
+
+    @micropython.native
+    def pop (self, default = None):
+        """!
+        Take one item from the ring. Only the consumer may call this method.
+        @param default The value returned if the ring is empty
+        @return The item, or @c default if the ring was empty
+        """
+        idx = self._idx
+        tail = idx[1]
+        if idx[0] == tail:
+            return default
+        item = self._buffer[tail & self._mask]
+        # The item is read before the producer can reuse its place
+        idx[1] = (tail + 1) & self._wrap
+        return item
+
+
+    @micropython.native
+    def drain (self, dest, count = -1):
+        """!
+        Take every waiting item from the ring at once. Only the consumer may
+        call this method.
+
+        The items are copied into the caller's array by a viper function, so
+        no memory is allocated.
+        @param dest An @c array.array of the ring's type into which the items
+               are copied, starting at its beginning
+        @param count The largest number of items to take, or -1 to take as
+               many as @c dest can hold
+        @return The number of items taken
         """
-        return ('{:<12s} Queue<{:s}> Max Full {:d}/{:d}'.format (self._name,
-                type_code_strings[self._type_code], self._max_full, self._size))
+        if count < 0 or count > len (dest):
+            count = len (dest)
+        idx = self._idx
+        tail = idx[1]
+        waiting = (idx[0] - tail) & self._wrap
+        if count > waiting:
+            count = waiting
+        if count > 0:
+            self._copy (dest, self._buffer, tail & self._mask, count, 
+                        self._mask)
+            idx[1] = (tail + count) & self._wrap
+        return count
+
+
+    @micropython.native
+    def any (self):
+        """!
+        Check if there are any items in the ring.
+        @return @c True if items are in the ring, @c False if not
+        """
+        return self._idx[0] != self._idx[1]
+
+
+    @micropython.native
+    def num_in (self):
+        """!
+        Check how many items are in the ring.
+        @return The number of items in the ring
+        """
+        return (self._idx[0] - self._idx[1]) & self._wrap
+
+
+    @micropython.native
+    def full (self):
+        """!
+        Check if the ring is full.
+        @return @c True if the ring is full
+        """
+        return ((self._idx[0] - self._idx[1]) & self._wrap) >= self._size
+
+
+    def clear (self):
+        """!
+        Remove all contents from the ring. This must not be called while the
+        producer might be putting data in.
+        """
+        self._idx[0] = 0
+        self._idx[1] = 0
+
+        ## The number of items dropped because the ring was full
+        self.dropped = 0
+
+
+    def __repr__ (self):
+        """!
+        This method puts diagnostic information about the ring into a string.
+
+        It shows the ring's name and type, the number of items in it and its
+        size, and the number of items dropped because it was full.
+        """
+        return ('{:<12s} SPSCRing<{:s}> In {:d}/{:d} Dropped {:d}'.format (
+                self._name, type_code_strings[self._type_code], 
+                self.num_in (), self._size, self.dropped))
 
 
 # ============================================================================
@@ -437,3 +1312,159 @@ class Share (BaseShare):
         return ("{:<12s} Share<{:s}>".format (self._name,
                 type_code_strings[self._type_code]))
 
+
+# ============================================================================
+
+## Sequence numbers of a @c Mailbox wrap around at this mask, which is even
+#  so that a sequence number stays odd while a write is under way
+_SEQ_MASK = 0x3FFFFFFF
+
+
+class Mailbox (BaseShare):
+    """!
+    A share which holds only the newest value, with a sequence number which
+    tells a reader whether the value is new and how many values it missed.
+
+    A @c Queue of setpoints which a task reads one item each time it runs 
+    falls behind when the writer runs more often than the reader, and the
+    reader then works through old values. A mailbox keeps only the newest. 
+    The writer counts up a sequence number before and after each write, so 
+    the number is odd while a write is under way, and a reader which finds
+    the number changed while it read the value tries again. Neither side 
+    disables interrupts, and a reader never gets half of an old value and 
+    half of a new one. 
+
+    There should be only one writer and one reader. The reader keeps the
+    sequence number of the last value it read in order to tell if a value
+    is new.
+
+    @code
+    import task_share
+
+    setpoint = task_share.Mailbox ('f', name="Setpoint")
+
+    # In the writing task
+    setpoint.put (angle)
+
+    # In the reading task
+    angle, new, skipped = setpoint.read ()
+    if new:
+        controller.change_setpoint (angle)
+    @endcode
+    """
+    ## A counter used to give serial numbers to mailboxes for diagnostic use.
+    ser_num = 0
+
+    def __init__ (self, type_code, name = None):
+        """!
+        Create a mailbox.
+
+        The type codes are the same as for class @c Share.
+        @param type_code The type of data item which the mailbox can hold
+        @param name A short name for the mailbox, default @c MailboxN where 
+               @c N is a serial number for the mailbox
+        """
+        # The sequence number protects the data; interrupts aren't disabled
+        super ().__init__ (type_code, False, name)
+
+        self._buffer = array.array (type_code, [0])
+        self._seq = array.array ('i', [0])
+
+        self._name = str (name) if name != None \
+            else 'Mailbox' + str (Mailbox.ser_num)
+        Mailbox.ser_num += 1
+
+        self.clear ()
+
+
+    @micropython.native
+    def put (self, data, in_ISR = False):
+        """!
+        Write a new value into the mailbox, replacing the old one.
+        @param data The data to be put into the mailbox
+        @param in_ISR Not needed, as interrupts are never disabled; kept so 
+               that a mailbox can be used where a share or queue was
+        """
+        seq = self._seq
+        seq[0] = (seq[0] + 1) & _SEQ_MASK
+        self._buffer[0] = data
+        seq[0] = (seq[0] + 1) & _SEQ_MASK
+
+
+    @micropython.native
+    def read (self):
+        """!
+        Read the newest value in the mailbox.
+
+        If the writer interrupts the read, the value is read again. If this
+        reader has interrupted the writer part way through a write, the value
+        which was there before the write is returned, as the new one isn't 
+        there yet.
+        @return A tuple (value, new, skipped) where @c new is @c True if the
+                value has been written since the last read, and @c skipped is
+                the number of values written since the last read and never 
+                read
+        """
+        seq = self._seq
+        while True:
+            start = seq[0]
+            if start & 1:
+                return (self._last, False, 0)
+            value = self._buffer[0]
+            if seq[0] == start:
+                break
+
+        writes = ((start - self._read_seq) & _SEQ_MASK) >> 1
+        self._read_seq = start
+        self._last = value
+        if writes == 0:
+            return (value, False, 0)
+        self.skipped += writes - 1
+        return (value, True, writes - 1)
+
+
+    @micropython.native
+    def get (self, in_ISR = False):
+        """!
+        Read the newest value in the mailbox, as @c read() does.
+        @param in_ISR Not needed, as interrupts are never disabled
+        @return The newest value
+        """
+        return self.read ()[0]
+
+
+    @micropython.native
+    def any (self):
+        """!
+        Check if a value has been written since the last read.
+        @return @c True if there is a new value to read
+        """
+        return self._seq[0] & ~1 != self._read_seq
+
+
+    def clear (self):
+        """!
+        Empty the mailbox, so it holds zero and nothing new until the next
+        write. This must not be called while the writer might be writing.
+        """
+        self._buffer[0] = 0
+        self._seq[0] = 0
+        self._read_seq = 0
+        self._last = self._buffer[0]
+
+        ## The total number of values written and never read
+        self.skipped = 0
+
+
+    def __repr__ (self):
+        """!
+        This method puts diagnostic information about the mailbox into a 
+        string.
+
+        It shows the mailbox's name and type, the number of values written,
+        and the number of values written and never read.
+        """
+        return ('{:<12s} Mailbox<{:s}> Writes {:d} Skipped {:d}'.format (
+                self._name, type_code_strings[self._type_code], 
+                self._seq[0] >> 1, self.skipped))
+